@@ -66,6 +66,7 @@ setup(
         'importlib_resources',
         'lxml',
         'networkx',
+        'numpy',
         'openpyxl',
         'pandas',
         'python-dotenv',
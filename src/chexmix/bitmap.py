@@ -0,0 +1,285 @@
+"""Compressed bitmap of non-negative integers, in the layout of Roaring bitmaps.
+
+Integers are split by their high 16 bits into containers of their low 16 bits. A container with few values is a
+sorted uint16 array, and a container with more than 4096 values is a bitset of 1024 uint64 words, so a container
+never takes more than 8 KiB. Values added one by one are buffered and merged into the containers in one vectorized
+pass on the next read.
+"""
+from typing import Dict, Iterable, Iterator, List, Union
+
+import numpy as np
+
+ARRAY_LIMIT = 4096
+BITSET_WORDS = 1024
+# number of values in an array above which it is merged into the containers at once instead of buffered
+MERGE_LIMIT = 256
+
+Container = np.ndarray
+
+
+def _popcount(words: np.ndarray) -> int:
+    if hasattr(np, 'bitwise_count'):
+        return int(np.bitwise_count(words).sum())
+    return int(np.unpackbits(words.view(np.uint8)).sum())
+
+
+def _is_bitset(container: Container) -> bool:
+    return container.dtype == np.uint64
+
+
+def _cardinality(container: Container) -> int:
+    return _popcount(container) if _is_bitset(container) else len(container)
+
+
+def _to_bitset(lows: np.ndarray) -> Container:
+    bits = np.zeros(BITSET_WORDS * 64, dtype=bool)
+    bits[lows] = True
+    return np.packbits(bits, bitorder='little').view(np.uint64)
+
+
+def _to_array(bitset: Container) -> Container:
+    return np.flatnonzero(np.unpackbits(bitset.view(np.uint8), bitorder='little')).astype(np.uint16)
+
+
+def _lows(container: Container) -> np.ndarray:
+    return _to_array(container) if _is_bitset(container) else container
+
+
+def _has_bits(bitset: Container, lows: np.ndarray) -> np.ndarray:
+    lows = lows.astype(np.uint64)
+    return ((bitset[lows >> np.uint64(6)] >> (lows & np.uint64(63))) & np.uint64(1)).astype(bool)
+
+
+def _sorted_unique(values: np.ndarray) -> np.ndarray:
+    # cheaper than np.unique for values that are mostly sorted already
+    values = np.sort(values.astype(np.int64))
+    if len(values) > 1:
+        values = values[np.concatenate(([True], values[1:] != values[:-1]))]
+    return values
+
+
+def _optimize(container: Container) -> Container:
+    # keep the smaller layout for the number of values
+    if _is_bitset(container):
+        return _to_array(container) if _cardinality(container) <= ARRAY_LIMIT else container
+    return _to_bitset(container) if len(container) > ARRAY_LIMIT else container
+
+
+def _union(container1: Container, container2: Container) -> Container:
+    if not _is_bitset(container1) and not _is_bitset(container2):
+        return _optimize(np.union1d(container1, container2).astype(np.uint16))
+    bitset1 = container1 if _is_bitset(container1) else _to_bitset(container1)
+    bitset2 = container2 if _is_bitset(container2) else _to_bitset(container2)
+    return bitset1 | bitset2
+
+
+def _intersection(container1: Container, container2: Container) -> Container:
+    if _is_bitset(container1) and _is_bitset(container2):
+        return _optimize(container1 & container2)
+    if _is_bitset(container1):
+        container1, container2 = container2, container1
+    if _is_bitset(container2):
+        return container1[_has_bits(container2, container1)]
+    return np.intersect1d(container1, container2, assume_unique=True).astype(np.uint16)
+
+
+def _difference(container1: Container, container2: Container) -> Container:
+    if _is_bitset(container1):
+        bitset2 = container2 if _is_bitset(container2) else _to_bitset(container2)
+        return _optimize(container1 & ~bitset2)
+    if _is_bitset(container2):
+        return container1[~_has_bits(container2, container1)]
+    pos = np.minimum(np.searchsorted(container2, container1), len(container2) - 1)
+    return container1[container2[pos] != container1]
+
+
+def _intersection_cardinality(container1: Container, container2: Container) -> int:
+    if _is_bitset(container1) and _is_bitset(container2):
+        return _popcount(container1 & container2)
+    if _is_bitset(container1):
+        container1, container2 = container2, container1
+    if _is_bitset(container2):
+        return int(_has_bits(container2, container1).sum())
+    return len(np.intersect1d(container1, container2, assume_unique=True))
+
+
+class Bitmap:
+    """Set of non-negative integers (ex. dense publication ids) stored as a compressed bitmap."""
+
+    __slots__ = ('_containers', '_pending')
+
+    def __init__(self, values: Iterable[int] = ()):
+        """Constructor method.
+
+        :param values: initial values
+        """
+        self._containers: Dict[int, Container] = {}
+        self._pending: List[int] = []
+        if not (isinstance(values, tuple) and len(values) == 0):
+            self.update(values)
+
+    @classmethod
+    def _from_containers(cls, containers: Dict[int, Container]) -> 'Bitmap':
+        bitmap = cls.__new__(cls)
+        bitmap._containers = containers
+        bitmap._pending = []
+        return bitmap
+
+    def _merge(self, values: np.ndarray):
+        # values are sorted and unique
+        if len(values) == 0:
+            return
+        if values[0] < 0:
+            raise ValueError(f'bitmap values must be non-negative, not {values[0]}')
+        highs = values >> 16
+        starts = np.flatnonzero(np.diff(highs, prepend=-1))
+        for high, lows in zip(highs[starts].tolist(), np.split((values & 0xFFFF).astype(np.uint16), starts[1:])):
+            container = self._containers.get(high)
+            self._containers[high] = _optimize(lows) if container is None else _union(container, lows)
+
+    def _flush(self) -> Dict[int, Container]:
+        if len(self._pending) > 0:
+            values = _sorted_unique(np.asarray(self._pending, dtype=np.int64))
+            self._pending = []
+            self._merge(values)
+        return self._containers
+
+    def add(self, value: int):
+        """Add a value.
+
+        :param value: non-negative integer
+        """
+        self._pending.append(value)
+
+    def update(self, values: Union[Iterable[int], 'Bitmap']):
+        """Add many values.
+
+        :param values: non-negative integers or a bitmap
+        """
+        if isinstance(values, Bitmap):
+            self |= values
+        elif isinstance(values, np.ndarray) and len(values) > MERGE_LIMIT:
+            self._merge(_sorted_unique(values))
+        elif isinstance(values, np.ndarray):
+            self._pending.extend(values.tolist())
+        else:
+            self._pending.extend(values)
+
+    def discard(self, value: int):
+        """Remove a value if it is present.
+
+        :param value: non-negative integer
+        """
+        high = value >> 16
+        container = self._flush().get(high)
+        if container is None or value not in self:
+            return
+        low = value & 0xFFFF
+        if _is_bitset(container):
+            container = container.copy()
+            container[low >> 6] &= ~np.uint64(1 << (low & 63))
+            self._containers[high] = _optimize(container)
+        elif len(container) > 1:
+            self._containers[high] = container[container != low]
+        else:
+            del self._containers[high]
+
+    def __contains__(self, value) -> bool:
+        if not isinstance(value, (int, np.integer)) or value < 0:
+            return False
+        container = self._flush().get(int(value) >> 16)
+        if container is None:
+            return False
+        low = int(value) & 0xFFFF
+        if _is_bitset(container):
+            return bool((int(container[low >> 6]) >> (low & 63)) & 1)
+        pos = np.searchsorted(container, low)
+        return bool(pos < len(container) and container[pos] == low)
+
+    def __len__(self) -> int:
+        return sum(_cardinality(container) for container in self._flush().values())
+
+    def __bool__(self) -> bool:
+        return len(self._pending) > 0 or len(self._containers) > 0
+
+    def __iter__(self) -> Iterator[int]:
+        for high in sorted(self._flush()):
+            yield from (_lows(self._containers[high]).astype(np.int64) | (high << 16)).tolist()
+
+    def to_array(self) -> np.ndarray:
+        """Get all values at once.
+
+        :return: sorted int64 array
+        """
+        containers = self._flush()
+        arrays = [_lows(containers[high]).astype(np.int64) | (high << 16) for high in sorted(containers)]
+        return np.concatenate(arrays) if len(arrays) > 0 else np.zeros(0, dtype=np.int64)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Bitmap):
+            return NotImplemented
+        containers1, containers2 = self._flush(), other._flush()
+        return containers1.keys() == containers2.keys() and all(
+            np.array_equal(_lows(container), _lows(containers2[high])) for high, container in containers1.items()
+        )
+
+    def __or__(self, other: 'Bitmap') -> 'Bitmap':
+        containers = dict(self._flush())
+        for high, container in other._flush().items():
+            containers[high] = _union(containers[high], container) if high in containers else container
+        return Bitmap._from_containers(containers)
+
+    def __ior__(self, other: 'Bitmap') -> 'Bitmap':
+        containers = self._flush()
+        for high, container in other._flush().items():
+            containers[high] = _union(containers[high], container) if high in containers else container
+        return self
+
+    def __and__(self, other: 'Bitmap') -> 'Bitmap':
+        containers1, containers2 = self._flush(), other._flush()
+        containers = {}
+        for high in containers1.keys() & containers2.keys():
+            container = _intersection(containers1[high], containers2[high])
+            if _cardinality(container) > 0:
+                containers[high] = container
+        return Bitmap._from_containers(containers)
+
+    def __sub__(self, other: 'Bitmap') -> 'Bitmap':
+        containers1, containers2 = self._flush(), other._flush()
+        containers = {}
+        for high, container in containers1.items():
+            if high in containers2:
+                container = _difference(container, containers2[high])
+            if _cardinality(container) > 0:
+                containers[high] = container
+        return Bitmap._from_containers(containers)
+
+    def intersection_len(self, other: 'Bitmap') -> int:
+        """Count the values in both bitmaps without building their intersection.
+
+        :param other: bitmap
+        :return: number of common values
+        """
+        containers1, containers2 = self._flush(), other._flush()
+        return sum(
+            _intersection_cardinality(containers1[high], containers2[high])
+            for high in containers1.keys() & containers2.keys()
+        )
+
+    def union_len(self, other: 'Bitmap') -> int:
+        """Count the values in any of the bitmaps without building their union.
+
+        :param other: bitmap
+        :return: number of values in the union
+        """
+        return len(self) + len(other) - self.intersection_len(other)
+
+    def copy(self) -> 'Bitmap':
+        """Copy the bitmap. Containers are never changed in place, so they are shared.
+
+        :return: bitmap
+        """
+        return Bitmap._from_containers(dict(self._flush()))
+
+    def __repr__(self) -> str:
+        return f'Bitmap(<{len(self)} values>)'
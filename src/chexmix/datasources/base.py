@@ -1,87 +1,268 @@
+import itertools
 import logging
 
+import numpy as np
+import pandas as pd
+
+from chexmix import stats
+
 log = logging.getLogger(__name__)
 
 
+SUM = 'sum'
+UNION = 'union'
+ARRAY = 'array'
+COUNT_DISTINCT = 'count_distinct'
+
+
+def flatten_tree(root):
+    # nodes reachable from root, each once even if it has several parents, and their children as index arrays:
+    # the children of nodes[i] are nodes[child_idx[child_ptr[i]:child_ptr[i + 1]]]
+    positions = {id(root): 0}
+    nodes, children = [root], []
+    pos = 0
+    while pos < len(nodes):
+        node = nodes[pos]
+        child_positions = []
+        for c in node['children']:
+            if c is node:
+                continue
+            child_pos = positions.get(id(c))
+            if child_pos is None:
+                child_pos = positions[id(c)] = len(nodes)
+                nodes.append(c)
+            child_positions.append(child_pos)
+        children.append(child_positions)
+        pos += 1
+
+    child_ptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+    np.cumsum([len(c) for c in children], out=child_ptr[1:])
+    child_idx = np.fromiter((c for cs in children for c in cs), dtype=np.int64, count=int(child_ptr[-1]))
+    return nodes, child_ptr, child_idx
+
+
+def node_depths(child_ptr, child_idx):
+    # length of the longest path from the root (node 0) to every node, so children are always deeper than parents
+    n_nodes = len(child_ptr) - 1
+    depths = np.zeros(n_nodes, dtype=np.int64)
+    frontier = np.zeros(1, dtype=np.int64)
+    depth = 0
+    while len(frontier) > 0:
+        if depth > n_nodes:
+            raise ValueError('the tree has a cycle')
+        depths[frontier] = depth
+        lengths = child_ptr[frontier + 1] - child_ptr[frontier]
+        starts = np.repeat(child_ptr[frontier] - np.cumsum(lengths) + lengths, lengths)
+        frontier = np.unique(child_idx[starts + np.arange(lengths.sum())])
+        depth += 1
+    return depths
+
+
+def _array_union(value, child_totals):
+    # the totals of children are sorted, so the stable sort (a merge sort) joins them in about linear time
+    if isinstance(value, np.ndarray):
+        value = value.astype(np.int64, copy=False)
+    else:
+        value = np.fromiter(value if value is not None else (), dtype=np.int64)
+    values = np.concatenate([value] + child_totals)
+    values = np.sort(values, kind='stable')
+    if len(values) > 1:
+        values = values[np.concatenate(([True], values[1:] != values[:-1]))]
+    return values
+
+
+def _set_union(value, child_totals):
+    return set(value or ()).union(*child_totals)
+
+
+def rollup(root, key, total_key, aggregate=SUM):
+    # aggregate the values of every node and its descendants into node[total_key], deepest nodes first, without
+    # recursion. aggregate is "sum" (of numbers), "union" (of collections, into sets), "array" (of integers, into
+    # sorted unique int64 arrays), "count_distinct" (size of the array union, each array dropped once the parents of
+    # its node are done) or a function of the value of a node (None if missing) and the totals of its children
+    nodes, child_ptr, child_idx = flatten_tree(root)
+    depths = node_depths(child_ptr, child_idx)
+    order = np.argsort(-depths, kind='stable')
+
+    if aggregate == SUM:
+        totals = np.array([node.get(key, 0) for node in nodes])
+        # links grouped by the depth of the parent, so the children of a depth are summed after their own children
+        parents = np.repeat(np.arange(len(nodes)), np.diff(child_ptr))
+        link_order = np.argsort(-depths[parents], kind='stable')
+        parents, children = parents[link_order], child_idx[link_order]
+        bounds = np.flatnonzero(np.diff(depths[parents], prepend=-1, append=-1))
+        for start, end in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+            np.add.at(totals, parents[start:end], totals[children[start:end]])
+        totals = totals.tolist()
+    else:
+        aggregate_funcs = {UNION: _set_union, ARRAY: _array_union, COUNT_DISTINCT: _array_union}
+        aggregate_func = aggregate_funcs.get(aggregate, aggregate)
+        counts_only = aggregate == COUNT_DISTINCT
+        n_parents = np.bincount(child_idx, minlength=len(nodes)).tolist()
+        counts = [0] * len(nodes)
+
+        totals = [None] * len(nodes)
+        child_ptr, child_idx = child_ptr.tolist(), child_idx.tolist()
+        for pos in order.tolist():
+            children = child_idx[child_ptr[pos]:child_ptr[pos + 1]]
+            totals[pos] = aggregate_func(nodes[pos].get(key), [totals[c] for c in children])
+            if counts_only:
+                for c in children:
+                    n_parents[c] -= 1
+                    if n_parents[c] == 0:
+                        counts[c], totals[c] = len(totals[c]), None
+        if counts_only:
+            counts[0] = len(totals[0])
+            totals = counts
+
+    for node, total in zip(nodes, totals):
+        node[total_key] = total
+    return totals[0]
+
+
 def add_total_count(node):
-    total_count = node.get('count', 0)
-    total_count += sum(add_total_count(c) for c in node['children'] if c is not node)
-    node['total_count'] = total_count
-    return total_count
+    return rollup(node, 'count', 'total_count', SUM)
+
+
+def explode_annotations(annotation_table, prefix):
+    # one (pmid, id) row per annotation id that starts with prefix, the prefix cut off. ids that start with a digit are
+    # parsed to int, and the ones that fail to parse are left out and reported at once. ids repeat over publications,
+    # so they are filtered and parsed once per distinct id
+    pmids = np.repeat(
+        np.array(list(annotation_table), dtype=object),
+        np.fromiter(map(len, annotation_table.values()), dtype=np.int64, count=len(annotation_table)),
+    )
+    codes, ids = pd.factorize(np.array(list(itertools.chain.from_iterable(annotation_table.values())), dtype=object))
+    ids = pd.Series(ids, dtype=object)
+    matched = ids.str.startswith(prefix, na=False).to_numpy(dtype=bool)
+    ids = ids.str.slice(len(prefix))
+
+    is_number = ids.str.match(r'[0-9]', na=False).to_numpy(dtype=bool) & matched
+    is_int = ids.str.fullmatch(r'[0-9]+', na=False).to_numpy(dtype=bool) & matched
+    values = ids.to_numpy(dtype=object, copy=True)
+    values[is_int] = ids[is_int].astype(np.int64).tolist()
+    not_parsed = is_number & ~is_int
+    if not_parsed.any():
+        log.warning(f'error in parsing {not_parsed[codes].sum()} ids, ex. {values[not_parsed][0]}')
+
+    rows = (matched & ~not_parsed)[codes]
+    return pd.DataFrame({'pmid': pmids[rows], 'id': values[codes[rows]]})
+
+
+def node_positions(node_table, ids):
+    # positions of ids in node_table, -1 for the ids that do not exist, which are reported at once
+    positions = pd.Index(list(node_table), dtype=object).get_indexer(np.asarray(ids, dtype=object))
+    missing = positions < 0
+    if missing.any():
+        missing_ids = pd.unique(np.asarray(ids, dtype=object)[missing])
+        log.warning(f'{missing.sum()} annotations of {len(missing_ids)} ids do not exist, ex. {missing_ids[0]}')
+    return positions
 
 
 def add_count(node_table, annotation_table, prefix, root):
-    prefix_len = len(prefix)
+    annotations = explode_annotations(annotation_table, prefix)
+    positions = node_positions(node_table, annotations['id'])
+    counts = np.bincount(positions[positions >= 0], minlength=len(node_table))
 
-    for v in node_table.values():
-        v['count'] = 0
+    for v, count in zip(node_table.values(), counts.tolist()):
+        v['count'] = count
         if root is not None:
             v['total_count'] = 0
 
-    for annotations in annotation_table.values():
-        for _id in annotations:
-            if _id.startswith(prefix):
-                annotated_id = int(_id[prefix_len:])
-                if annotated_id in node_table:
-                    node_table[annotated_id]['count'] += 1
-                else:
-                    log.warning(f'{annotated_id} does not exist')
-
     if root in node_table:
         add_total_count(node_table[root])
 
     return node_table
 
 
+def add_enrichment(node_table, background_table, n_publications, n_background, count_key='total_count',
+                   correction=stats.FDR_BH):
+    # node_table and background_table are counted by add_count over the annotations of the publications of interest
+    # and of the background publications. every node is tested at once
+    ids = list(node_table)
+    counts = np.array([node_table[_id].get(count_key, 0) for _id in ids], dtype=np.int64)
+    background_counts = np.array(
+        [background_table[_id].get(count_key, 0) if _id in background_table else 0 for _id in ids], dtype=np.int64
+    )
+    fold_changes, p_values, adjusted = stats.over_representation(
+        counts, background_counts, n_publications, n_background, correction
+    )
+
+    for _id, fold_change, p_value, adjusted_p_value in zip(
+        ids, fold_changes.tolist(), p_values.tolist(), adjusted.tolist()
+    ):
+        node = node_table[_id]
+        node['fold_change'] = fold_change
+        node['p_value'] = p_value
+        node['adjusted_p_value'] = adjusted_p_value
+
+    return node_table
+
+
 def add_total_pmids(node):
-    total_pmids = set(node.get('pmids', []))
-    total_pmids = total_pmids.union(*[add_total_pmids(c) for c in node['children'] if c is not node])
-    node['total_pmids'] = total_pmids
-    return total_pmids
+    return rollup(node, 'pmids', 'total_pmids', ARRAY)
+
 
+def add_total_pmid_count(node):
+    return rollup(node, 'pmids', 'total_pmid_count', COUNT_DISTINCT)
 
-def replace_pmid_in(node_table, root):
+
+def replace_pmid_in(node_table, root, counts_only=False):
     for v in node_table.values():
         v['pmids'] = []
         if root is not None:
-            v['total_pmids'] = set()
+            if counts_only:
+                v['total_pmid_count'] = 0
+            else:
+                v['total_pmids'] = np.zeros(0, dtype=np.int64)
     return node_table
 
 
-def add_pmids(node_table, annotation_table, prefix, root):
-    prefix_len = len(prefix)
-    node_table = replace_pmid_in(node_table, root)
-
-    for pmid, annotations in annotation_table.items():
-        for _id in annotations:
-            if _id.startswith(prefix):
-                annotated_id = _id[prefix_len:]
-                if annotated_id[0] in {'0', '1', '2', '3', '4', '5', '6', '7', '8', '9'}:
-                    try:
-                        annotated_id = int(annotated_id)
-                    except ValueError:
-                        log.warning(f'error in parsing id: {annotated_id}')
-                        continue
+def add_pmids(node_table, annotation_table, prefix, root, counts_only=False):
+    # pmids and total pmids are kept as sorted int64 arrays, or only the number of total pmids if counts_only
+    node_table = replace_pmid_in(node_table, root, counts_only=counts_only)
 
-                if annotated_id in node_table:
-                    node_table[annotated_id]['pmids'].append(pmid)
-                else:
-                    log.warning(f'{annotated_id} does not exist')
+    annotations = explode_annotations(annotation_table, prefix)
+    positions = node_positions(node_table, annotations['id'])
+    found = positions >= 0
+    positions = positions[found]
+    pmids = annotations['pmid'][found].astype(np.int64).to_numpy()
+    # sorted by node, then pmid, without repeated pairs, so the pmids of a node are a slice
+    order = np.lexsort((pmids, positions))
+    positions, pmids = positions[order], pmids[order]
+    first = np.ones(len(pmids), dtype=bool)
+    first[1:] = (positions[1:] != positions[:-1]) | (pmids[1:] != pmids[:-1])
+    positions, pmids = positions[first], pmids[first]
+    bounds = np.searchsorted(positions, np.arange(len(node_table) + 1)).tolist()
+    for v, start, end in zip(node_table.values(), bounds, bounds[1:]):
+        v['pmids'] = pmids[start:end]
 
     if root in node_table:
-        add_total_pmids(node_table[root])
+        if counts_only:
+            add_total_pmid_count(node_table[root])
+        else:
+            add_total_pmids(node_table[root])
 
     return node_table
 
 
+def total_pmid_count(node):
+    return node['total_pmid_count'] if 'total_pmid_count' in node else len(node['total_pmids'])
+
+
 def trim_tree(node, min_count=1):
-    children = [
-        trim_tree(c, min_count=min_count)
-        for c in node['children']
-        if (c is not node) and (len(c['total_pmids']) >= min_count)
-    ]
-    node['children'] = children
-    return node
+    # keep the children with min_count total pmids at least, by total_pmid_count in the counts-only mode of add_pmids
+    root = node
+    visited = {id(root)}
+    stack = [root]
+    while len(stack) > 0:
+        node = stack.pop()
+        node['children'] = [c for c in node['children'] if (c is not node) and (total_pmid_count(c) >= min_count)]
+        for c in node['children']:
+            if id(c) not in visited:
+                visited.add(id(c))
+                stack.append(c)
+    return root
 
 
 def get_name(node):
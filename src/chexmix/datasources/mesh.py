@@ -12,6 +12,17 @@ def get_parent_tree_number(tree_number: str) -> str:
     return tree_number.rsplit('.', 1)[0]
 
 
+def parse_entry_terms(record: Dict[str, Union[str, List[Dict], List[str]]], name: str) -> List[str]:
+    """
+    get the entry terms (synonyms) of a descriptor or a supplementary record from its ConceptList/TermList
+    :param record: parsed record
+    :param name: name of the record, left out of the entry terms
+    :return: entry terms
+    """
+    terms = (term.get('String') for concept in record.get('ConceptList', []) for term in concept.get('TermList', []))
+    return [term for term in dict.fromkeys(terms) if term is not None and term != name]
+
+
 def parse_descriptor(
     descriptor: Dict[str, Union[str, List[Dict], List[str]]]
 ) -> Dict[str, Union[str, Dict[str, List[str]]]]:
@@ -21,6 +32,7 @@ def parse_descriptor(
         'name': descriptor['DescriptorName'],
         'type': NodeType.MeSHD,
         'tree_numbers': descriptor.get('TreeNumberList', []),
+        'entry_terms': parse_entry_terms(descriptor, descriptor['DescriptorName']),
         'relationship': {EdgeType.INCLUDES: [], EdgeType.reverse_prefix(EdgeType.INCLUDES): [], EdgeType.CONTAINS: []},
     }
 
@@ -33,6 +45,7 @@ def parse_supplement(
         'raw_id': supplement['SupplementalRecordUI'],
         'name': supplement['SupplementalRecordName'],
         'type': NodeType.MeSHC,
+        'entry_terms': parse_entry_terms(supplement, supplement['SupplementalRecordName']),
         'relationship': {
             EdgeType.reverse_prefix(EdgeType.CONTAINS): list(
                 map(MeSHGraph.get_mesh_node_id_from, supplement['HeadingMappedToListForIndex'])
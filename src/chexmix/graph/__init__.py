@@ -1,9 +1,11 @@
 from chexmix.graph.base import BioGraph, EdgeType, Header, HierarchicalGraph, NodeType, TaxParentType
 from chexmix.graph.classyfire import ClassyFireGraph
-from chexmix.graph.mesh import MeSHGraph
+from chexmix.graph.codec import NodeIdCodec
+from chexmix.graph.compact import CompactHierarchicalGraph
+from chexmix.graph.mesh import CompactMeSHGraph, MeSHGraph
 from chexmix.graph.pubmed import PubMedGraph
 from chexmix.graph.pubtator import PubTatorGraph
-from chexmix.graph.taxonomy import TaxonomyGraph
+from chexmix.graph.taxonomy import CompactTaxonomyGraph, TaxonomyGraph
 
 __all__ = [
     'BioGraph',
@@ -11,10 +13,14 @@ __all__ = [
     'NodeType',
     'EdgeType',
     'Header',
+    'NodeIdCodec',
     'TaxParentType',
     'PubTatorGraph',
     'PubMedGraph',
     'ClassyFireGraph',
     'TaxonomyGraph',
     'MeSHGraph',
+    'CompactHierarchicalGraph',
+    'CompactTaxonomyGraph',
+    'CompactMeSHGraph',
 ]
@@ -1,6 +1,15 @@
+import itertools
 from typing import Any, Dict, List, Optional, Tuple, Union
 
 import networkx as nx
+import numpy as np
+import pandas as pd
+
+from chexmix.graph import export
+from chexmix.graph.interval import IntervalLabelling
+from chexmix.graph.similarity import HierarchySimilarity
+from chexmix.graph.traversal import PREDECESSORS, SUCCESSORS, Traversal
+from chexmix.storage import decode_columns, encode_columns, from_columns, load_blocks, save_blocks, to_columns
 
 NodeId = Union[str, int]
 NodeAttr = Dict[str, Any]
@@ -109,35 +118,176 @@ class BioGraph(nx.MultiDiGraph):
         :param nodes: nodes of graph
         :param edges: edges of graph
         """
+        # successors and predecessors of each node per edge type, with the number of parallel edges.
+        # edge types changed in place through the attribute dicts are not tracked.
+        self._type_succ = {}
+        self._type_pred = {}
+        # memoized reachability closures, dropped whenever the edges change (tracked by _version)
+        self._version = 0
+        self._closures = {}
+        self._closures_version = 0
         super().__init__()
         if nodes is not None:
             self.add_nodes_from(nodes)
         if edges is not None:
             self.add_edges_from(edges)
 
-    def intersection(self, other: 'BioGraph') -> 'BioGraph':
-        """Build the intersection between the two graphs.
-
-        :param other: other graph
-        :return:
+    def add_edge(self, u_for_edge, v_for_edge, key=None, **attr):
+        key_dict = self._succ.get(u_for_edge, {}).get(v_for_edge, {})
+        if key in key_dict:
+            self._unindex_edge(u_for_edge, v_for_edge, key_dict[key].get('type'))
+        key = super().add_edge(u_for_edge, v_for_edge, key, **attr)
+        self._version += 1
+        self._index_edge(u_for_edge, v_for_edge, self._succ[u_for_edge][v_for_edge][key].get('type'))
+        return key
+
+    def add_edges_from(self, ebunch_to_add, **attr):
+        keys = []
+        for edge in ebunch_to_add:
+            if len(edge) == 4:
+                s_node, e_node, key, edge_attr = edge
+            elif len(edge) == 3:
+                s_node, e_node, edge_attr = edge
+                key = None
+            elif len(edge) == 2:
+                s_node, e_node = edge
+                key, edge_attr = None, {}
+            else:
+                raise nx.NetworkXError(f'Edge tuple {edge} must be a 2-tuple, 3-tuple or 4-tuple.')
+            new_attr = dict(attr)
+            try:
+                new_attr.update(edge_attr)
+            except (TypeError, ValueError):
+                if len(edge) != 3:
+                    raise
+                key = edge_attr  # the third element of a 3-tuple is a key if it is not a dict
+            keys.append(self.add_edge(s_node, e_node, key, **new_attr))
+        return keys
+
+    def remove_edge(self, u, v, key=None):
+        key_dict = self._succ.get(u, {}).get(v, {})
+        if key is None and len(key_dict) > 0:
+            key = list(key_dict)[-1]
+        edge_type = key_dict[key].get('type') if key in key_dict else None
+        super().remove_edge(u, v, key)
+        self._unindex_edge(u, v, edge_type)
+        self._version += 1
+
+    def remove_node(self, n):
+        if n in self._succ:
+            for e_node, key_dict in self._succ[n].items():
+                for edge_attr in key_dict.values():
+                    self._unindex_edge(n, e_node, edge_attr.get('type'))
+            for s_node, key_dict in self._pred[n].items():
+                if s_node != n:
+                    for edge_attr in key_dict.values():
+                        self._unindex_edge(s_node, n, edge_attr.get('type'))
+        super().remove_node(n)
+        self._version += 1
+
+    def remove_nodes_from(self, nodes):
+        for node in nodes:
+            if node in self._succ:
+                self.remove_node(node)
+
+    def clear(self):
+        self._type_succ, self._type_pred = {}, {}
+        super().clear()
+        self._version += 1
+
+    def clear_edges(self):
+        self._type_succ, self._type_pred = {}, {}
+        super().clear_edges()
+        self._version += 1
+
+    def _index_edge(self, s_node: NodeId, e_node: NodeId, edge_type: Any):
+        for index, node, neighbor in [(self._type_succ, s_node, e_node), (self._type_pred, e_node, s_node)]:
+            neighbors = index.setdefault(edge_type, {}).setdefault(node, {})
+            neighbors[neighbor] = neighbors.get(neighbor, 0) + 1
+
+    def _reachability_cache(self, key: Tuple) -> Dict:
+        if self._closures_version != self._version:
+            self._closures, self._closures_version = {}, self._version
+        return self._closures.setdefault(key, {})
+
+    def _unindex_edge(self, s_node: NodeId, e_node: NodeId, edge_type: Any):
+        for index, node, neighbor in [(self._type_succ, s_node, e_node), (self._type_pred, e_node, s_node)]:
+            neighbors = index[edge_type][node]
+            neighbors[neighbor] -= 1
+            if neighbors[neighbor] == 0:
+                del neighbors[neighbor]
+            if len(neighbors) == 0:
+                del index[edge_type][node]
+            if len(index[edge_type]) == 0:
+                del index[edge_type]
+
+    def intersection(self, *others: 'BioGraph') -> 'BioGraph':
+        """Build the intersection between this graph and the other graphs.
+
+        Edges are matched by (source, target, edge type) keys and nodes by id, so the cost is linear in the
+        number of edges and nodes of all graphs.
+
+        :param others: other graphs
+        :return: intersection graph
         """
+        edge_tables = [other.edge_attr_table() for other in others]
         intersection_graph = self.__class__()
-        intersection_graph.add_edges_from(edge for edge in self.edges(data=True) if edge in other.edges(data=True))
-        intersection_graph.add_nodes_from(node for node in self.nodes(data=True) if node in other.nodes(data=True))
+        intersection_graph.add_edges_from(
+            edge
+            for edge in self.edges(data=True)
+            if all(edge[2] in edge_table.get(self.edge_key(*edge), ()) for edge_table in edge_tables)
+        )
+        intersection_graph.add_nodes_from(
+            (node, node_attr)
+            for node, node_attr in self.nodes(data=True)
+            if all((node in other) and (other.nodes[node] == node_attr) for other in others)
+        )
         return intersection_graph
 
-    def difference(self, other: 'BioGraph') -> 'BioGraph':
-        """Build the difference between the two graphs. (self - other)
+    def difference(self, *others: 'BioGraph') -> 'BioGraph':
+        """Build the difference between this graph and the other graphs. (self - others[0] - others[1] ...)
 
-        :param other: other graph
-        :return:
+        Edges are matched by (source, target, edge type) keys and nodes by id, so the cost is linear in the
+        number of edges and nodes of all graphs.
+
+        :param others: other graphs
+        :return: difference graph
         """
+        edge_tables = [other.edge_attr_table() for other in others]
         diff_graph = self.__class__()
-        diff_graph.add_edges_from(edge for edge in self.edges(data=True) if edge not in other.edges(data=True))
-        diff_graph.add_nodes_from(node for node in self.nodes(data=True) if node not in other.nodes(data=True))
-
+        diff_graph.add_edges_from(
+            edge
+            for edge in self.edges(data=True)
+            if not any(edge[2] in edge_table.get(self.edge_key(*edge), ()) for edge_table in edge_tables)
+        )
+        diff_graph.add_nodes_from(
+            (node, node_attr)
+            for node, node_attr in self.nodes(data=True)
+            if not any((node in other) and (other.nodes[node] == node_attr) for other in others)
+        )
         return diff_graph
 
+    def edge_attr_table(self) -> Dict[Tuple[NodeId, NodeId, Any], List[EdgeAttr]]:
+        """Group edge attributes by (source, target, edge type) keys.
+
+        :return: edge attributes of each key
+        """
+        edge_table = {}
+        for s_node, e_node, edge_attr in self.edges(data=True):
+            edge_table.setdefault(self.edge_key(s_node, e_node, edge_attr), []).append(edge_attr)
+        return edge_table
+
+    @staticmethod
+    def edge_key(s_node: NodeId, e_node: NodeId, edge_attr: EdgeAttr) -> Tuple[NodeId, NodeId, Any]:
+        """Get the key of an edge. (source, target, edge type)
+
+        :param s_node: source node
+        :param e_node: target node
+        :param edge_attr: edge attribute
+        :return: edge key
+        """
+        return s_node, e_node, edge_attr.get('type')
+
     def union(self, other: 'BioGraph') -> 'BioGraph':
         """Build the sum of the two graphs.
 
@@ -146,12 +296,20 @@ class BioGraph(nx.MultiDiGraph):
         """
         return nx.compose(self, other)
 
-    def threshold(self, threshold: int) -> 'BioGraph':
+    def threshold(self, threshold: int, view: bool = False) -> 'BioGraph':
         """Remain only nodes with more than threshold.
 
         :param threshold: threshold to filter
+        :param view: return a read-only view sharing storage with this graph instead of a copy
         :return: trimmed graph
         """
+        if view:
+
+            def is_remained(node):
+                node_attr = self.nodes[node]
+                return (node_attr['count'] >= threshold) or (node_attr['type'] == NodeType.Keyword)
+
+            return nx.subgraph_view(self, filter_node=is_remained)
         trimmed_graph = self.copy()
         for node in self:
             is_smaller_than_threshold = trimmed_graph.nodes[node]['count'] < threshold
@@ -160,14 +318,98 @@ class BioGraph(nx.MultiDiGraph):
                 trimmed_graph.remove_node(node)
         return trimmed_graph
 
+    def successors_by_types(self, node: NodeId, edge_types: List[EdgeType]) -> List[NodeId]:
+        """Get successors connected with the given edge types.
+
+        :param node: node
+        :param edge_types: edge types
+        :return: successors
+        """
+        return self._neighbors_by_types(self._type_succ, self._succ, node, edge_types)
+
+    def predecessors_by_types(self, node: NodeId, edge_types: List[EdgeType]) -> List[NodeId]:
+        """Get predecessors connected with the given edge types.
+
+        :param node: node
+        :param edge_types: edge types
+        :return: predecessors
+        """
+        return self._neighbors_by_types(self._type_pred, self._pred, node, edge_types)
+
+    def out_degree_by_types(self, node: NodeId, edge_types: List[EdgeType]) -> int:
+        """Count outgoing edges of the given edge types.
+
+        :param node: node
+        :param edge_types: edge types
+        :return: out degree
+        """
+        return self._degree_by_types(self._type_succ, self._succ, node, edge_types)
+
+    def in_degree_by_types(self, node: NodeId, edge_types: List[EdgeType]) -> int:
+        """Count incoming edges of the given edge types.
+
+        :param node: node
+        :param edge_types: edge types
+        :return: in degree
+        """
+        return self._degree_by_types(self._type_pred, self._pred, node, edge_types)
+
+    def _neighbors_by_types(self, index, adjacency, node: NodeId, edge_types: List[EdgeType]) -> List[NodeId]:
+        if self.is_view:
+            # views do not own an index, so filter their adjacency
+            return [
+                neighbor
+                for neighbor, key_dict in adjacency[node].items()
+                if any(edge_attr.get('type') in edge_types for edge_attr in key_dict.values())
+            ]
+        neighbors = {}
+        for edge_type in edge_types:
+            neighbors.update(index.get(edge_type, {}).get(node, {}))
+        return list(neighbors)
+
+    def _degree_by_types(self, index, adjacency, node: NodeId, edge_types: List[EdgeType]) -> int:
+        if self.is_view:
+            return sum(
+                edge_attr.get('type') in edge_types
+                for key_dict in adjacency[node].values()
+                for edge_attr in key_dict.values()
+            )
+        return sum(sum(index.get(edge_type, {}).get(node, {}).values()) for edge_type in set(edge_types))
+
+    def _typed_nodes(self, index, edge_types: List[EdgeType]) -> List[NodeId]:
+        typed_nodes = {}
+        for edge_type in edge_types:
+            typed_nodes.update(dict.fromkeys(index.get(edge_type, {})))
+        return list(typed_nodes)
+
+    def has_edge_types(self, node: NodeId, edge_types: List[EdgeType]) -> bool:
+        """Check whether a node has any incoming or outgoing edge of the given edge types.
+
+        :param node: node
+        :param edge_types: edge types
+        :return: bool
+        """
+        if self.is_view:
+            return (self.in_degree_by_types(node, edge_types) + self.out_degree_by_types(node, edge_types)) > 0
+        return any(
+            (node in self._type_succ.get(edge_type, {})) or (node in self._type_pred.get(edge_type, {}))
+            for edge_type in edge_types
+        )
+
     def find_roots(self, edge_types: Optional[List[EdgeType]] = None) -> List[NodeId]:
         """Find root nodes.
 
         :param edge_types: edge type for remaining
         :return: root nodes
         """
+        if (edge_types is not None) and (not self.is_view):
+            return [
+                node
+                for node in self._typed_nodes(self._type_succ, edge_types)
+                if not any(node in self._type_pred.get(edge_type, {}) for edge_type in edge_types)
+            ]
         if edge_types is not None:
-            graph = self.remain_by_edge_types(edge_types)
+            graph = self.remain_by_edge_types(edge_types, view=True)
         else:
             graph = self
         root_nodes = [node for node, degree in graph.in_degree() if degree == 0]
@@ -179,8 +421,14 @@ class BioGraph(nx.MultiDiGraph):
         :param edge_types: edge type for remaining
         :return: leaf nodes
         """
+        if (edge_types is not None) and (not self.is_view):
+            return [
+                node
+                for node in self._typed_nodes(self._type_pred, edge_types)
+                if not any(node in self._type_succ.get(edge_type, {}) for edge_type in edge_types)
+            ]
         if edge_types is not None:
-            graph = self.remain_by_edge_types(edge_types)
+            graph = self.remain_by_edge_types(edge_types, view=True)
         else:
             graph = self
         leaf_nodes = [node for node, degree in graph.out_degree() if degree == 0]
@@ -216,66 +464,131 @@ class BioGraph(nx.MultiDiGraph):
             **kw_args,
         )
 
-    def subgraph_from_roots(self, root_nodes: List[NodeId], edge_types: Optional[List[EdgeType]] = None) -> 'BioGraph':
+    def subgraph_from_roots(
+        self, root_nodes: List[NodeId], edge_types: Optional[List[EdgeType]] = None, max_depth: Optional[int] = None
+    ) -> 'BioGraph':
         """Build a sub graph of root nodes and their descendants.
 
         :param root_nodes: root nodes
         :param edge_types: edge types for remaining
+        :param max_depth: maximum depth from the root nodes. unlimited if None
         :return: sub graph
         """
-        if edge_types is not None:
-            trimmed_graph = self.remain_by_edge_types(edge_types)
-        else:
-            trimmed_graph = self
-        sub_graph = self.__class__()
-        nodes, edges = self.nodes_and_edges_from_roots_or_leaves(trimmed_graph, root_nodes, 'successors')
-        sub_graph.add_nodes_from(nodes)
-        sub_graph.add_edges_from(edges)
-        sub_graph = sub_graph.inherit_attr_from(self)
-        return sub_graph
+        return self.subgraphs_from_roots([root_nodes], edge_types, max_depth)[0]
 
-    def subgraph_from_leaves(self, leaf_nodes: List[NodeId], edge_types: Optional[List[EdgeType]] = None) -> 'BioGraph':
+    def subgraph_from_leaves(
+        self, leaf_nodes: List[NodeId], edge_types: Optional[List[EdgeType]] = None, max_depth: Optional[int] = None
+    ) -> 'BioGraph':
         """Build a sub graph of leaf nodes and their ancestors.
 
         :param leaf_nodes: leaf nodes
         :param edge_types: edge types for remaining
+        :param max_depth: maximum depth from the leaf nodes. unlimited if None
         :return: sub graph
         """
+        return self.subgraphs_from_leaves([leaf_nodes], edge_types, max_depth)[0]
+
+    def subgraphs_from_roots(
+        self,
+        root_sets: List[List[NodeId]],
+        edge_types: Optional[List[EdgeType]] = None,
+        max_depth: Optional[int] = None,
+    ) -> List['BioGraph']:
+        """Build sub graphs of many root node sets and their descendants in one batch.
+        Descendants of each root are searched once and reused by the other sets and by later calls on this graph.
+
+        :param root_sets: root node sets
+        :param edge_types: edge types for remaining
+        :param max_depth: maximum depth from the root nodes. unlimited if None
+        :return: sub graph of each root node set
+        """
+        return self._subgraphs(root_sets, SUCCESSORS, edge_types, max_depth)
+
+    def subgraphs_from_leaves(
+        self,
+        leaf_sets: List[List[NodeId]],
+        edge_types: Optional[List[EdgeType]] = None,
+        max_depth: Optional[int] = None,
+    ) -> List['BioGraph']:
+        """Build sub graphs of many leaf node sets and their ancestors in one batch.
+        Ancestors of each leaf are searched once and reused by the other sets and by later calls on this graph.
+
+        :param leaf_sets: leaf node sets
+        :param edge_types: edge types for remaining
+        :param max_depth: maximum depth from the leaf nodes. unlimited if None
+        :return: sub graph of each leaf node set
+        """
+        return self._subgraphs(leaf_sets, PREDECESSORS, edge_types, max_depth)
+
+    def _subgraphs(self, node_sets, direction: str, edge_types: Optional[List[EdgeType]], max_depth: Optional[int]):
         if edge_types is not None:
-            trimmed_graph = self.remain_by_edge_types(edge_types)
-        else:
-            trimmed_graph = self
+            edge_types = set(edge_types)
+            node_sets = [[node for node in nodes if node in self and self.has_edge_types(node, edge_types)]
+                         for nodes in node_sets]
+        traversal = Traversal(self, direction, edge_types)
+        return [self._induced_subgraph(nodes, edge_types) for nodes in traversal.reach_many(node_sets, max_depth)]
+
+    def _induced_subgraph(self, nodes: List[NodeId], edge_types: Optional[set]) -> 'BioGraph':
+        node_set = set(nodes)
         sub_graph = self.__class__()
-        nodes, edges = self.nodes_and_edges_from_roots_or_leaves(trimmed_graph, leaf_nodes, 'predecessors')
         sub_graph.add_nodes_from(nodes)
-        sub_graph.add_edges_from(edges)
-        sub_graph = sub_graph.inherit_attr_from(self)
-        return sub_graph
+        sub_graph.add_edges_from(
+            (s_node, e_node, key, edge_attr)
+            for s_node in nodes
+            for e_node, key_dict in self._succ[s_node].items()
+            if e_node in node_set
+            for key, edge_attr in key_dict.items()
+            if (edge_types is None) or (edge_attr.get('type') in edge_types)
+        )
+        return sub_graph.join_attrs_from(self)
 
-    def remain_by_edge_types(self, edge_types: List[EdgeType]) -> 'BioGraph':
+    def remain_by_edge_types(self, edge_types: List[EdgeType], view: bool = False) -> 'BioGraph':
         """Remain only the desired type of edge
 
         :param edge_types: type of edge to remain
+        :param view: return a read-only view sharing storage with this graph instead of a copy
         :return: filtered graph
         """
         edge_types = set(edge_types)
+        if view:
+
+            def has_edge_type(s_node, e_node, key):
+                return self._succ[s_node][e_node][key].get('type') in edge_types
+
+            return nx.subgraph_view(
+                self, filter_node=lambda node: self.has_edge_types(node, edge_types), filter_edge=has_edge_type
+            )
         trimmed_graph = self.__class__()
         edges = filter(lambda edge: edge[2]['type'] in edge_types, self.edges(data=True))
         trimmed_graph.add_edges_from(edges)
-        trimmed_graph = trimmed_graph.inherit_attr_from(self)
-        return trimmed_graph
+        return trimmed_graph.join_attrs_from(self)
 
-    def remain_by_node_types(self, node_types: List[NodeType]) -> 'BioGraph':
+    def remain_by_node_types(self, node_types: List[NodeType], view: bool = False) -> 'BioGraph':
         """Remain only the desired type of node
 
         :param node_types: type of node to remain
+        :param view: return a read-only view sharing storage with this graph instead of a copy
         :return: filtered graph
         """
         node_types = set(node_types)
+        if view:
+            return nx.subgraph_view(self, filter_node=lambda node: self.nodes[node]['type'] in node_types)
         filtered_graph = self.copy()
         filtered_graph.remove_nodes_from(node for node in self if filtered_graph.nodes[node]['type'] not in node_types)
         return filtered_graph
 
+    @property
+    def is_view(self) -> bool:
+        """True if this graph is a read-only view on another graph."""
+        return hasattr(self, '_graph')
+
+    def materialize(self) -> 'BioGraph':
+        """Build an independent graph with the nodes and edges of this graph (or view).
+
+        :return: materialized graph
+        """
+        return self.copy()
+
     def set_attribute(self, attr_key: str, attr_value: Any, nodes: List[Union[int, str]]) -> 'BioGraph':
         """Set attribute
 
@@ -289,51 +602,158 @@ class BioGraph(nx.MultiDiGraph):
             added_graph.nodes[node][attr_key] = attr_value
         return added_graph
 
-    def inherit_attr_from(self, other: 'BioGraph') -> 'BioGraph':
+    def inherit_attr_from(self, other: 'BioGraph', attr_keys: Optional[List[str]] = None) -> 'BioGraph':
         """Inherit attribute from other bio graph
 
         :param other: other graph for inherit
+        :param attr_keys: attribute keys to inherit. all attributes if None
         :return: inherited graph
         """
-        inherited_graph = self.copy()
-        for node in self:
-            if node in other:
-                nx.set_node_attributes(inherited_graph, {node: other.nodes[node]})
-        for edge in self.edges():
-            if (edge in other.edges()) and (len(self.get_edge_data(edge[0], edge[1]).values()) == 0):
-                for eid, e_attr in other.get_edge_data(edge[0], edge[1]).items():
-                    nx.set_edge_attributes(inherited_graph, {(edge[0], edge[1], eid): e_attr})
-        return inherited_graph
+        return self.copy().join_attrs_from(other, attr_keys)
+
+    def join_attrs_from(self, other: 'BioGraph', attr_keys: Optional[List[str]] = None) -> 'BioGraph':
+        """Join node and edge attributes of other graph into this graph in place, in one pass over the smaller graph.
+
+        Node attributes of other overwrite those of this graph. Edge attributes are inherited by edges without any
+        attribute. Joined attribute dicts are shallow copies, so the two graphs never share a dict.
+
+        :param other: other graph for inherit
+        :param attr_keys: attribute keys to inherit. all attributes if None
+        :return: this graph
+        """
+        small, large = (self, other) if len(self) <= len(other) else (other, self)
+        for node in small:
+            if node not in large:
+                continue
+            node_attr, other_attr = self._node[node], other.nodes[node]
+            if attr_keys is not None:
+                node_attr.update((k, other_attr[k]) for k in attr_keys if k in other_attr)
+            else:
+                node_attr.update(other_attr)
+
+        small, large = (self, other) if self.number_of_edges() <= other.number_of_edges() else (other, self)
+        for s_node, e_node, key in small.edges(keys=True):
+            if not large.has_edge(s_node, e_node, key):
+                continue
+            edge_attr, other_attr = self._succ[s_node][e_node][key], other[s_node][e_node][key]
+            if len(edge_attr) > 0:
+                continue
+            if attr_keys is not None:
+                edge_attr.update((k, other_attr[k]) for k in attr_keys if k in other_attr)
+            else:
+                edge_attr.update(other_attr)
+            if edge_attr.get('type') is not None:
+                # the edge changes type, so memoized traversals are dropped
+                self._unindex_edge(s_node, e_node, None)
+                self._index_edge(s_node, e_node, edge_attr['type'])
+                self._version += 1
+        return self
+
+    def save(self, path: str):
+        """Save the graph to a columnar binary file: node and edge arrays with an array per attribute.
+
+        :param path: file path
+        """
+        node_ids = list(self)
+        positions = {node: pos for pos, node in enumerate(node_ids)}
+        edges = list(self.edges(keys=True, data=True))
+        ids = {'node': node_ids, 'edge_key': [key for _, _, key, _ in edges], 'graph': [self.graph]}
+        blocks, id_kinds = encode_columns('id', ids, {})
+        node_blocks, node_kinds = encode_columns('node', *to_columns([self._node[node] for node in node_ids]))
+        edge_blocks, edge_kinds = encode_columns('edge', *to_columns([edge_attr for _, _, _, edge_attr in edges]))
+        blocks.update(node_blocks)
+        blocks.update(edge_blocks)
+        blocks['edge_src'] = np.array([positions[s_node] for s_node, _, _, _ in edges], dtype=np.int64)
+        blocks['edge_dst'] = np.array([positions[e_node] for _, e_node, _, _ in edges], dtype=np.int64)
+        meta = {
+            'layout': 'graph',
+            'class': type(self).__name__,
+            'ids': id_kinds,
+            'node_columns': node_kinds,
+            'edge_columns': edge_kinds,
+        }
+        save_blocks(path, blocks, meta)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'BioGraph':
+        """Load a graph saved by `save`. Columns are decoded whole, and the adjacency and the type index are built
+        in one pass over the edges.
+
+        :param path: file path
+        :param mmap: if True, memory-map the file instead of reading it
+        :return: graph
+        """
+        blocks, meta = load_blocks(path, mmap)
+        if meta.get('layout') != 'graph':
+            raise ValueError(f'{path} is not a graph file')
+        ids, _ = decode_columns('id', blocks, meta['ids'])
+        node_ids, keys = ids['node'].tolist(), ids['edge_key'].tolist()
+        node_attrs = from_columns(len(node_ids), *decode_columns('node', blocks, meta['node_columns']))
+        edge_attrs = from_columns(len(keys), *decode_columns('edge', blocks, meta['edge_columns']))
+        graph = cls()
+        graph.graph.update(ids['graph'][0])
+        graph._add_node_columns(node_ids, node_attrs)
+        graph._add_edge_columns(
+            [node_ids[pos] for pos in blocks['edge_src'].tolist()],
+            [node_ids[pos] for pos in blocks['edge_dst'].tolist()],
+            keys,
+            edge_attrs,
+        )
+        return graph
+
+    def write_graphml(self, path_or_file: export.PathOrFile):
+        """Stream the graph to GraphML. Attributes GraphML can not hold (ex. lists and dicts) are left out, and node
+        ids are written as strings (see `export.write_graphml`).
+
+        :param path_or_file: file path or text file object
+        """
+        export.write_graphml(self, path_or_file)
+
+    def write_node_link_json(self, path_or_file: export.PathOrFile, edges_key: str = 'links'):
+        """Stream the graph to node-link JSON, readable by `networkx.node_link_graph`.
+
+        :param path_or_file: file path or text file object
+        :param edges_key: key of the edge list ('links' or 'edges')
+        """
+        export.write_node_link_json(self, path_or_file, edges_key)
 
     def get_table(self) -> Dict[NodeId, Dict]:
-        """Get table from graph.
+        """Get table from graph, the same as `table_from_frames(*to_frames())`. The attribute dicts of the graph are
+        not changed. Relationships are read per edge type from the type index, one list per node and edge type.
 
         :return: table
         """
-        nodes = self.nodes(data=True)
-        edges = self.edges(data=True)
-        table = {}
-        for node, node_attr in nodes:
-            node_attr['relationship'] = {}
-            table[node] = node_attr
-        for s_node, e_node, edge_attr in edges:
-            edge_types = {
-                'edge_type': {'edge_type': edge_attr['type'], 's_node': s_node, 'e_node': e_node},
-                'reversed_edge_type': {
-                    'edge_type': EdgeType.reverse_prefix(edge_attr['type']),
-                    's_node': e_node,
-                    'e_node': s_node,
-                },
-            }
-            for value in edge_types.values():
-                edge_type, s_node, e_node = value['edge_type'], value['s_node'], value['e_node']
-                if edge_type in table[s_node]['relationship']:
-                    table[s_node]['relationship'][edge_type].append(e_node)
-                else:
-                    table[s_node]['relationship'][edge_type] = [e_node]
-
+        table = {node: dict(node_attr, relationship={}) for node, node_attr in self._node.items()}
+        if self.is_view:
+            # views do not own a type index, so build one from their adjacency
+            indexes = [(BioGraph._type_index_of(self._succ), False), (BioGraph._type_index_of(self._pred), True)]
+        else:
+            indexes = [(self._type_succ, False), (self._type_pred, True)]
+        for index, reverse in indexes:
+            for edge_type, neighbors_by_node in index.items():
+                if edge_type is None:
+                    continue  # edges without a type have no relationship
+                relation_type = EdgeType.reverse_prefix(edge_type) if reverse else edge_type
+                for node, neighbors in neighbors_by_node.items():
+                    if len(neighbors) == sum(neighbors.values()):
+                        table[node]['relationship'][relation_type] = list(neighbors)
+                    else:
+                        table[node]['relationship'][relation_type] = [
+                            neighbor for neighbor, count in neighbors.items() for _ in range(count)
+                        ]
         return table
 
+    @staticmethod
+    def _type_index_of(adjacency) -> Dict[EdgeType, Dict[NodeId, Dict[NodeId, int]]]:
+        # the type index of an adjacency: edge type -> node -> neighbor -> number of edges
+        index = {}
+        for node, neighbors in adjacency.items():
+            for neighbor, key_dict in neighbors.items():
+                for edge_attr in key_dict.values():
+                    counts = index.setdefault(edge_attr.get('type'), {}).setdefault(node, {})
+                    counts[neighbor] = counts.get(neighbor, 0) + 1
+        return index
+
     @classmethod
     def from_table(cls, table: Dict[NodeId, Dict]) -> 'BioGraph':
         """Build graph from table
@@ -341,8 +761,197 @@ class BioGraph(nx.MultiDiGraph):
         :param table: table
         :return: Bio graph
         """
-        nodes, edges = BioGraph.nodes_and_edges_from_table(table)
-        return cls(nodes, edges)
+        return cls.from_frames(*BioGraph.frames_from_table(table))
+
+    def to_frames(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Get the columnar table of the graph. The node frame is indexed by node id with a column per node attribute,
+        and the edge frame has 'source', 'target' and 'key' columns with a column per edge attribute ('type' is
+        categorical). Attributes that a node or an edge does not have are pd.NA.
+
+        :return: node frame, edge frame
+        """
+        node_ids = list(self._node)
+        node_frame = BioGraph._frame_from_records(
+            list(self._node.values()), pd.Index(node_ids, dtype=object, name='node')
+        )
+        sources, targets, keys, edge_attrs = [], [], [], []
+        for s_node, neighbors in self._succ.items():
+            for e_node, key_dict in neighbors.items():
+                sources.extend([s_node] * len(key_dict))
+                targets.extend([e_node] * len(key_dict))
+                keys.extend(key_dict)
+                edge_attrs.extend(key_dict.values())
+        edge_frame = BioGraph._frame_from_records(edge_attrs, pd.RangeIndex(len(edge_attrs)))
+        for pos, (name, values) in enumerate([('source', sources), ('target', targets), ('key', keys)]):
+            edge_frame.insert(pos, name, pd.Series(values, dtype=object))
+        if 'type' in edge_frame:
+            edge_frame['type'] = edge_frame['type'].astype('category')
+        return node_frame, edge_frame
+
+    @classmethod
+    def from_frames(cls, node_frame: pd.DataFrame, edge_frame: pd.DataFrame) -> 'BioGraph':
+        """Build graph from the node and edge frames of `to_frames`. The 'key' column is optional.
+        Edge targets without a row in the node frame become nodes without attributes.
+
+        :param node_frame: node frame
+        :param edge_frame: edge frame
+        :return: Bio graph
+        """
+        graph = cls()
+        graph._add_node_columns(node_frame.index.tolist(), BioGraph._records_from_frame(node_frame))
+        attr_keys = [key for key in edge_frame.columns if key not in ('source', 'target', 'key')]
+        sources, targets = edge_frame['source'].tolist(), edge_frame['target'].tolist()
+        keys = edge_frame['key'].tolist() if 'key' in edge_frame else [None] * len(edge_frame)
+        graph._add_edge_columns(sources, targets, keys, BioGraph._records_from_frame(edge_frame[attr_keys]))
+        return graph
+
+    def _add_node_columns(self, node_ids: List[NodeId], node_attrs: List[Dict]):
+        # add_nodes_from without the per-node overhead of networkx. the attribute dicts are taken, not copied
+        for node, node_attr in zip(node_ids, node_attrs):
+            if node in self._node:
+                self._node[node].update(node_attr)
+            else:
+                self._succ[node] = self.adjlist_inner_dict_factory()
+                self._pred[node] = self.adjlist_inner_dict_factory()
+                self._node[node] = node_attr
+
+    def _add_edge_columns(self, sources: List[NodeId], targets: List[NodeId], keys: List[Any], edge_attrs: List[Dict]):
+        # add_edges_from without the per-edge overhead of networkx: write the adjacency and the type index directly
+        new_nodes = list(dict.fromkeys(node for node in itertools.chain(sources, targets) if node not in self._node))
+        self._add_node_columns(new_nodes, [{} for _ in new_nodes])
+        succ, pred, type_succ, type_pred = self._succ, self._pred, self._type_succ, self._type_pred
+        key_dict_factory = self.edge_key_dict_factory
+        for s_node, e_node, key, edge_attr in zip(sources, targets, keys, edge_attrs):
+            s_adjacency = succ[s_node]
+            key_dict = s_adjacency.get(e_node)
+            if key_dict is None:
+                key_dict = s_adjacency[e_node] = pred[e_node][s_node] = key_dict_factory()
+            if key is None:
+                key = self.new_edge_key(s_node, e_node)
+            elif key in key_dict:
+                self.add_edge(s_node, e_node, key, **edge_attr)
+                continue
+            key_dict[key] = edge_attr
+            # get before setdefault, not to build an empty dict per edge
+            edge_type = edge_attr.get('type')
+            for index, node, neighbor in ((type_succ, s_node, e_node), (type_pred, e_node, s_node)):
+                by_node = index.get(edge_type)
+                if by_node is None:
+                    by_node = index[edge_type] = {}
+                neighbors = by_node.get(node)
+                if neighbors is None:
+                    neighbors = by_node[node] = {}
+                neighbors[neighbor] = neighbors.get(neighbor, 0) + 1
+        self._version += 1
+
+    @staticmethod
+    def frames_from_table(table: Dict[NodeId, Dict]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Turn a table of entities into the node and edge frames of `to_frames`. Reverse relationships (edge types
+        starting with '_') are left out, and relationships are kept as a node attribute only for supplementary MeSH
+        records, as in `nodes_and_edges_from_table`.
+
+        :param table: table of entities
+        :return: node frame, edge frame
+        """
+        node_ids = list(table)
+        node_frame = BioGraph._frame_from_records(list(table.values()), pd.Index(node_ids, dtype=object, name='node'))
+        if 'relationship' in node_frame:
+            is_meshc = np.array([BioGraph.get_header(str(node)) == Header.MeSHC for node in node_ids], dtype=bool)
+            if is_meshc.any():
+                node_frame.loc[~is_meshc, 'relationship'] = pd.NA
+            else:
+                node_frame = node_frame.drop(columns='relationship')
+
+        sources, edge_types, targets = [], [], []
+        for node, attributes in table.items():
+            for edge_type, target_nodes in attributes.get('relationship', {}).items():
+                if not edge_type.startswith('_'):
+                    sources.append(node)
+                    edge_types.append(edge_type)
+                    targets.append(target_nodes)
+        counts = np.array([len(target_nodes) for target_nodes in targets], dtype=np.int64)
+        # a trailing None keeps NumPy from turning tuple ids into a 2D array
+        edge_frame = pd.DataFrame(
+            {
+                'source': pd.Series(np.repeat(np.array(sources + [None], dtype=object)[:-1], counts), dtype=object),
+                'target': pd.Series(list(itertools.chain.from_iterable(targets)), dtype=object),
+                'type': pd.Categorical(np.repeat(np.array(edge_types + [None], dtype=object)[:-1], counts)),
+            }
+        )
+        # parallel edges between the same nodes get the keys networkx would give them
+        edge_frame.insert(2, 'key', edge_frame.groupby(['source', 'target'], sort=False).cumcount())
+        return node_frame, edge_frame
+
+    @staticmethod
+    def table_from_frames(node_frame: pd.DataFrame, edge_frame: pd.DataFrame) -> Dict[NodeId, Dict]:
+        """Turn node and edge frames into a table of entities, deriving the reverse relationship of every edge.
+        Edges without a type are left out.
+
+        :param node_frame: node frame
+        :param edge_frame: edge frame
+        :return: table
+        """
+        node_ids = node_frame.index.tolist()
+        table = dict(zip(node_ids, BioGraph._records_from_frame(node_frame)))
+        for node_attr in table.values():
+            node_attr['relationship'] = {}
+        types = pd.Categorical(edge_frame['type'] if 'type' in edge_frame else [None] * len(edge_frame))
+        typed = np.flatnonzero(types.codes >= 0)
+        sources = edge_frame['source'].to_numpy(dtype=object)[typed]
+        targets = edge_frame['target'].to_numpy(dtype=object)[typed]
+        type_codes = types.codes[typed].astype(np.int64)
+        n_types = len(types.categories)
+        relation_types = list(types.categories) + [EdgeType.reverse_prefix(t) for t in types.categories]
+
+        # forward and reverse relationships, grouped by (node, relation type) in edge order
+        owners = np.concatenate([sources, targets])
+        others = np.concatenate([targets, sources])
+        relation_codes = np.concatenate([type_codes, type_codes + n_types])
+        owner_codes, owner_ids = pd.factorize(pd.Series(owners, dtype=object), sort=False)
+        order = np.lexsort((relation_codes, owner_codes))
+        owner_codes, relation_codes, others = owner_codes[order], relation_codes[order], others[order]
+        is_start = np.ones(len(order), dtype=bool)
+        is_start[1:] = (np.diff(owner_codes) != 0) | (np.diff(relation_codes) != 0)
+        starts = np.flatnonzero(is_start)
+        ends = np.append(starts[1:], len(order))
+        owner_ids, others = list(owner_ids), others.tolist()
+        for start, end, owner_code, relation_code in zip(
+            starts.tolist(), ends.tolist(), owner_codes[starts].tolist(), relation_codes[starts].tolist()
+        ):
+            owner = owner_ids[owner_code]
+            if owner not in table:
+                table[owner] = {'relationship': {}}
+            table[owner]['relationship'][relation_types[relation_code]] = others[start:end]
+        return table
+
+    @staticmethod
+    def _frame_from_records(records: List[Dict[str, Any]], index: pd.Index) -> pd.DataFrame:
+        columns, masks = to_columns(records)
+        frame = {}
+        for key, values in columns.items():
+            column = pd.Series(values, index=index, dtype=values.dtype if isinstance(values, np.ndarray) else object)
+            if key in masks:
+                column[~masks[key]] = pd.NA
+            frame[key] = column
+        return pd.DataFrame(frame, index=index)
+
+    @staticmethod
+    def _records_from_frame(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+        columns, masks = {}, {}
+        for key in frame.columns:
+            column = frame[key]
+            if column.dtype == object:
+                values = column.to_numpy()
+                mask = np.array([value is not pd.NA for value in values.tolist()], dtype=bool)
+            elif isinstance(column.dtype, np.dtype):
+                values, mask = column.to_numpy(), None
+            else:
+                # extension dtypes (ex. categories, strings, nullable integers) mark missing values themselves
+                values, mask = column.astype(object).to_numpy(), column.notna().to_numpy()
+            columns[key] = values
+            if mask is not None and not mask.all():
+                masks[key] = mask
+        return from_columns(len(frame), columns, masks)
 
     @staticmethod
     def create_node_id(header: Header, raw_id: Union[int, str]) -> str:
@@ -403,34 +1012,65 @@ class BioGraph(nx.MultiDiGraph):
         :param graph: original graph
         :param target_nodes: root or leaf nodes
         :param case: "successors" or "predecessors"
-        :return:
+        :return: nodes and edges between them
         """
-        nodes = []
-        edges = []
-        visited = set()
-        queue = target_nodes.copy()
-        while queue:
-            node = queue.pop()
-            if (node in visited) or (node not in graph):
-                continue
-            visited.add(node)
-            nodes.append((node, graph.nodes[node]))
-            if case == "successors":
-                children = list(graph.successors(node))
-                queue.extend(children)
-                for child_node in children:
-                    for edge_attr in graph.get_edge_data(node, child_node).values():
-                        edges.append((node, child_node, edge_attr))
-            else:
-                parents = list(graph.predecessors(node))
-                queue.extend(parents)
-                for parent_node in parents:
-                    for edge_attr in graph.get_edge_data(parent_node, node):
-                        edges.append((parent_node, node, edge_attr))
-        return nodes, edges
+        nodes = Traversal(graph, case).reach(target_nodes)
+        node_set = set(nodes)
+        edges = [
+            (s_node, e_node, edge_attr)
+            for s_node in nodes
+            for e_node, key_dict in graph.adj[s_node].items()
+            if e_node in node_set
+            for edge_attr in key_dict.values()
+        ]
+        return [(node, graph.nodes[node]) for node in nodes], edges
 
 
 class HierarchicalGraph(BioGraph):
+    # edge types of the hierarchy for ancestor tests. all edges if None
+    hierarchy_edge_types: Optional[List[EdgeType]] = None
+    # if True, a node is a descendant of itself
+    reflexive_descendant = True
+
+    def hierarchy_aliases(self, nodes: List[NodeId]) -> Dict[NodeId, List[NodeId]]:
+        """Get the nodes tested in place of nodes in ancestor tests. Only nodes with aliases are returned.
+
+        :param nodes: nodes
+        :return: aliases of nodes
+        """
+        return {}
+
+    def interval_labelling(self) -> IntervalLabelling:
+        """Get the interval labelling of the hierarchy, built once and rebuilt when the graph changes.
+
+        :return: interval labelling
+        """
+        key = (self._version, len(self))
+        labelling = getattr(self, '_labelling', None)
+        if (labelling is not None) and (labelling[0] == key) and (not self.is_view):
+            return labelling[1]
+        node_ids = list(self)
+        positions = {node: pos for pos, node in enumerate(node_ids)}
+        if self.hierarchy_edge_types is None:
+            edges = self.edges()
+        else:
+            edges = [
+                (s_node, e_node)
+                for s_node in node_ids
+                for e_node in self.successors_by_types(s_node, self.hierarchy_edge_types)
+            ]
+        edges = [(positions[s_node], positions[e_node]) for s_node, e_node in edges]
+        labelling = IntervalLabelling(
+            node_ids,
+            [s_pos for s_pos, _ in edges],
+            [e_pos for _, e_pos in edges],
+            self.hierarchy_aliases(node_ids),
+            self.reflexive_descendant,
+        )
+        if not self.is_view:
+            self._labelling = (key, labelling)
+        return labelling
+
     def is_descendant(self, node_id1: str, node_id2: str) -> bool:
         """return True if a node of 'node_id1' is a desecendant of that of 'node_id2'
 
@@ -438,4 +1078,37 @@ class HierarchicalGraph(BioGraph):
         :param node_id2: node id
         :return: bool
         """
-        raise NotImplementedError('This function need to implement on inherited class')
+        labelling = self.interval_labelling()
+        return labelling.is_descendant(node_id1, node_id2) or self._is_descendant_by_attributes(node_id1, node_id2)
+
+    def is_descendant_many(self, pairs: Union[np.ndarray, List[Tuple[str, str]]]) -> np.ndarray:
+        """Vectorized `is_descendant` for many (descendant, ancestor) pairs.
+
+        :param pairs: node id pairs, as a list of tuples or an array of shape (n, 2)
+        :return: bool array
+        """
+        if not isinstance(pairs, np.ndarray):
+            pairs = np.array(pairs, dtype=object).reshape(-1, 2)
+        labelling = self.interval_labelling()
+        indices1, indices2 = labelling.node_index(pairs[:, 0]), labelling.node_index(pairs[:, 1])
+        result = labelling.is_descendant_many(indices1, indices2)
+        if type(self)._is_descendant_by_attributes is not HierarchicalGraph._is_descendant_by_attributes:
+            for pos in np.flatnonzero(~result):
+                result[pos] = self._is_descendant_by_attributes(pairs[pos, 0], pairs[pos, 1])
+        return result
+
+    def _is_descendant_by_attributes(self, node_id1: str, node_id2: str) -> bool:
+        # ancestor test by node attributes (ex. lineage), for pairs without a path in the graph. the path may have been
+        # filtered out of the graph while the attributes still know it
+        return False
+
+    def similarity(self, count_key: str = 'count') -> HierarchySimilarity:
+        """Build the lowest common ancestor and semantic similarity engine of the hierarchy.
+        Publication counts are read once, so build it again after changing them.
+
+        :param count_key: attribute key of publication counts, used for information content
+        :return: similarity engine
+        """
+        labelling = self.interval_labelling()
+        counts = [self.nodes[node].get(count_key) or 0 for node in labelling.node_ids]
+        return HierarchySimilarity(labelling, np.array(counts, dtype=np.float64))
@@ -1,6 +1,7 @@
 from typing import Dict, List, Union
 
 from chexmix.graph import EdgeType, Header, HierarchicalGraph, NodeType
+from chexmix.graph.base import NodeId
 
 
 class ClassyFireGraph(HierarchicalGraph):
@@ -74,10 +75,21 @@ class ClassyFireGraph(HierarchicalGraph):
             edges.append((nodes[-2][0], nodes[-1][0], {'type': EdgeType.CONTAINS}))
         return nodes, edges
 
-    def is_descendant(self, node_id1: str, node_id2: str) -> bool:
+    def hierarchy_aliases(self, nodes: List[NodeId]) -> Dict[NodeId, List[NodeId]]:
+        """Chemicals are tested as their direct parent class.
+
+        :param nodes: nodes
+        :return: aliases of nodes
+        """
         node_data = self.nodes.data()
-        node_attrs = [
-            node_data[node_attr['parent']] if node_attr['type'] == NodeType.Chemical else node_attr
-            for node_attr in [node_data[node_id1], node_data[node_id2]]
-        ]
-        return (node_attrs[0] == node_attrs[1]) or (node_id2 in node_attrs[0]['lineage'])
+        return {node: [node_data[node]['parent']] for node in nodes if node_data[node]['type'] == NodeType.Chemical}
+
+    def _is_descendant_by_attributes(self, node_id1: str, node_id2: str) -> bool:
+        # ancestors filtered out of the graph are still known from the lineage of the class
+        if (node_id1 not in self.nodes) or (node_id2 not in self.nodes):
+            return False
+        aliases = self.hierarchy_aliases([node_id1, node_id2])
+        class1, class2 = (aliases.get(node_id, [node_id])[0] for node_id in (node_id1, node_id2))
+        if class1 == class2:
+            return True
+        return (class1 in self.nodes) and (node_id2 in self.nodes[class1].get('lineage', []))
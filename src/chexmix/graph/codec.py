@@ -0,0 +1,147 @@
+import re
+from typing import Iterable, Union
+
+import numpy as np
+
+from chexmix.graph.base import Header
+
+
+class NodeIdCodec:
+    """Pack node ids (ex. 'TAXO:9606', 'MSHD:D000001') into 64 bit integers, and unpack them.
+
+    bits 56-62 : index of the header in HEADERS
+    bits 48-55 : letter prefix of the raw id (ex. 'D' of 'D000001'), 0 if the raw id is numeric
+    bits 40-47 : number of digits to keep leading zeros (ex. 6 of 'D000001'), 0 for plain integers
+    bits 0-39  : digits of the raw id
+
+    Raw ids that are not an optional upper case letter followed by up to 12 digits, such as InChIKeys and
+    mutations, can not be encoded.
+    """
+
+    HEADERS = [
+        Header.Article,
+        Header.Taxonomy,
+        Header.MeSHD,
+        Header.MeSHC,
+        Header.ChemOnto,
+        Header.Chemical,
+        Header.Gene,
+        Header.Mutation,
+    ]
+    MAX_DIGITS = 12
+    VALUE_BITS = 40
+
+    _HEADER_INDEX = {header: idx for idx, header in enumerate(HEADERS)}
+    _RAW_ID_PATTERN = re.compile(r'([A-Z]?)([0-9]{1,12})')
+
+    @staticmethod
+    def encode(node: str) -> int:
+        """Encode a node id. (TAXO:9606 -> 72057594037937542)
+
+        :param node: node id
+        :return: code
+        """
+        match = NodeIdCodec._RAW_ID_PATTERN.fullmatch(node, 5)
+        if (node[4:5] != ':') or (node[:4] not in NodeIdCodec._HEADER_INDEX) or (match is None):
+            raise ValueError(f'{node} can not be encoded')
+        letter, digits = match.groups()
+        value = int(digits)
+        width = len(digits) if letter or (digits[0] == '0' and len(digits) > 1) else 0
+        if value >= (1 << NodeIdCodec.VALUE_BITS):
+            raise ValueError(f'{node} can not be encoded')
+        return (
+            (NodeIdCodec._HEADER_INDEX[node[:4]] << 56)
+            | ((ord(letter) if letter else 0) << 48)
+            | (width << NodeIdCodec.VALUE_BITS)
+            | value
+        )
+
+    @staticmethod
+    def decode(code: int) -> str:
+        """Decode a node id. (72057594037937542 -> TAXO:9606)
+
+        :param code: code
+        :return: node id
+        """
+        code = int(code)
+        letter, width = (code >> 48) & 0xFF, (code >> NodeIdCodec.VALUE_BITS) & 0xFF
+        digits = str(code & ((1 << NodeIdCodec.VALUE_BITS) - 1)).zfill(width)
+        return f"{NodeIdCodec.HEADERS[code >> 56]}:{chr(letter) if letter else ''}{digits}"
+
+    @staticmethod
+    def encode_many(nodes: Iterable[str]) -> np.ndarray:
+        """Encode node ids with vectorized operations.
+
+        :param nodes: node ids
+        :return: codes
+        """
+        ids = np.ascontiguousarray(np.asarray(list(nodes), dtype=str))
+        if len(ids) == 0:
+            return np.zeros(0, dtype=np.int64)
+        if ids.dtype.itemsize < 24:  # shorter than 'XXXX:0'
+            ids = ids.astype('U6')
+        points = ids.view(np.uint32).reshape(len(ids), -1).astype(np.int64)
+
+        headers, header_inverse = np.unique(ids.astype('U4'), return_inverse=True)
+        header_index = np.array([NodeIdCodec._HEADER_INDEX.get(header, -1) for header in headers])[header_inverse]
+        invalid = (header_index < 0) | (points[:, 4] != ord(':'))
+
+        raw = points[:, 5:]
+        letter = np.where((raw[:, 0] >= ord('A')) & (raw[:, 0] <= ord('Z')), raw[:, 0], 0)
+        digits = np.where(letter[:, None] > 0, np.roll(raw, -1, axis=1), raw)
+        digits[letter > 0, -1] = 0
+        is_digit = (digits >= ord('0')) & (digits <= ord('9'))
+        n_digits = is_digit.sum(axis=1)
+        in_digits = np.arange(digits.shape[1]) < n_digits[:, None]
+        invalid |= (is_digit != in_digits).any(axis=1) | ((~in_digits) & (digits != 0)).any(axis=1)
+        invalid |= (n_digits == 0) | (n_digits > NodeIdCodec.MAX_DIGITS)
+
+        value = np.zeros(len(ids), dtype=np.int64)
+        for col in range(min(digits.shape[1], NodeIdCodec.MAX_DIGITS)):
+            value = np.where(in_digits[:, col], value * 10 + digits[:, col] - ord('0'), value)
+        invalid |= value >= (1 << NodeIdCodec.VALUE_BITS)
+        if invalid.any():
+            raise ValueError(f'{ids[invalid][:5].tolist()} can not be encoded')
+
+        leading_zero = (digits[:, 0] == ord('0')) & (n_digits > 1)
+        width = np.where((letter > 0) | leading_zero, n_digits, 0)
+        return (header_index << 56) | (letter << 48) | (width << NodeIdCodec.VALUE_BITS) | value
+
+    @staticmethod
+    def decode_many(codes: Union[np.ndarray, Iterable[int]]) -> np.ndarray:
+        """Decode node ids with vectorized operations.
+
+        :param codes: codes
+        :return: node ids
+        """
+        codes = np.asarray(codes, dtype=np.int64)
+        letter = ((codes >> 48) & 0xFF).astype(np.uint32)
+        width = (codes >> NodeIdCodec.VALUE_BITS) & 0xFF
+        digits = (codes & ((1 << NodeIdCodec.VALUE_BITS) - 1)).astype(f'U{NodeIdCodec.MAX_DIGITS}')
+        for digit_width in np.unique(width[width > 0]):
+            digits[width == digit_width] = np.char.zfill(digits[width == digit_width], digit_width)
+        prefixes = np.char.add(NodeIdCodec.get_headers(codes), ':')
+        return np.char.add(np.char.add(prefixes, letter.view('U1')), digits)
+
+    @staticmethod
+    def get_headers(codes: Union[np.ndarray, Iterable[int]]) -> np.ndarray:
+        """Get the headers of codes. (TAXO:1234 -> TAXO)
+
+        :param codes: codes
+        :return: headers
+        """
+        return np.asarray(NodeIdCodec.HEADERS)[np.asarray(codes, dtype=np.int64) >> 56]
+
+    @staticmethod
+    def get_raw_ids(codes: Union[np.ndarray, Iterable[int]]) -> np.ndarray:
+        """Get the raw ids of codes as BioGraph.get_raw_id does. (TAXO:1234 -> 1234, MSHD:D000001 -> 'D000001')
+
+        :param codes: codes
+        :return: raw ids (int for numeric raw ids, str otherwise)
+        """
+        codes = np.asarray(codes, dtype=np.int64)
+        raw_ids = (codes & ((1 << NodeIdCodec.VALUE_BITS) - 1)).astype(object)
+        has_letter = ((codes >> 48) & 0xFF) > 0
+        if has_letter.any():
+            raw_ids[has_letter] = [node[5:] for node in NodeIdCodec.decode_many(codes[has_letter])]
+        return raw_ids
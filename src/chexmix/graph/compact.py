@@ -0,0 +1,422 @@
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from chexmix.graph.base import BioGraph, EdgeType, Header, HierarchicalGraph, NodeAttr, NodeId
+from chexmix.graph.interval import IntervalLabelling
+from chexmix.storage import (
+    decode_column,
+    decode_columns,
+    encode_column,
+    encode_columns,
+    load_blocks,
+    save_blocks,
+    to_columns,
+)
+
+
+class CompactNodeView(Mapping):
+    """Read-only mapping of node id to node attribute, assembled from the attribute columns on access."""
+
+    def __init__(self, graph: 'CompactHierarchicalGraph'):
+        self._graph = graph
+
+    def __getitem__(self, node: NodeId) -> NodeAttr:
+        return self._graph.node_attr(self._graph.node_index([node])[0], node)
+
+    def __iter__(self) -> Iterator[NodeId]:
+        return iter(self._graph)
+
+    def __len__(self) -> int:
+        return len(self._graph)
+
+    def __contains__(self, node) -> bool:
+        return node in self._graph
+
+    def data(self) -> 'CompactNodeView':
+        return self
+
+
+class CompactHierarchicalGraph:
+    """Immutable hierarchical graph stored as integer-indexed CSR adjacency in NumPy arrays.
+
+    Node attributes are kept in columns instead of one dict per node, and only the 'type' attribute of edges is kept.
+    Sub graphs are materialized as `graph_class` objects, so the usual BioGraph API is available on them.
+    """
+
+    graph_class = HierarchicalGraph
+
+    # CSR arrays saved as they are
+    _ARRAYS = ['succ_ptr', 'succ_idx', 'succ_type', 'pred_ptr', 'pred_idx', 'pred_type']
+    # loaded graphs look up at most this many nodes at once without building the index of all ids
+    _SEARCH_LIMIT = 64
+
+    create_node_id = staticmethod(BioGraph.create_node_id)
+    get_raw_id = staticmethod(BioGraph.get_raw_id)
+    get_header = staticmethod(BioGraph.get_header)
+
+    hierarchy_edge_types = HierarchicalGraph.hierarchy_edge_types
+    reflexive_descendant = HierarchicalGraph.reflexive_descendant
+    hierarchy_aliases = HierarchicalGraph.hierarchy_aliases
+    is_descendant = HierarchicalGraph.is_descendant
+    is_descendant_many = HierarchicalGraph.is_descendant_many
+    _is_descendant_by_attributes = HierarchicalGraph._is_descendant_by_attributes
+    similarity = HierarchicalGraph.similarity
+
+    def __init__(
+        self,
+        node_ids: List[NodeId],
+        node_columns: Dict[str, Any],
+        node_masks: Dict[str, np.ndarray],
+        edges: Tuple[np.ndarray, np.ndarray, np.ndarray],
+        edge_types: List[EdgeType],
+    ):
+        """Constructor method. Use `from_table` or `from_graph` to build a compact graph.
+
+        :param node_ids: node ids
+        :param node_columns: attribute values of nodes by attribute key (list or NumPy array)
+        :param node_masks: for columns that some nodes do not have, True where a node has the attribute
+        :param edges: (source indices, target indices, edge type codes) arrays
+        :param edge_types: edge type of each code
+        """
+        self._node_ids = node_ids
+        self._index = None
+        self._id_order = None
+        self._node_columns = node_columns
+        self._node_masks = node_masks
+        self._edge_types = list(edge_types)
+        n_nodes = len(node_ids)
+        src, dst, type_codes = edges
+        self._succ_ptr, self._succ_idx, self._succ_type = self._csr(src, dst, type_codes, n_nodes)
+        self._pred_ptr, self._pred_idx, self._pred_type = self._csr(dst, src, type_codes, n_nodes)
+        self._labelling = None
+
+    @staticmethod
+    def _csr(src: np.ndarray, dst: np.ndarray, type_codes: np.ndarray, n_nodes: int):
+        order = np.argsort(src, kind='stable')
+        ptr = np.zeros(n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n_nodes), out=ptr[1:])
+        return ptr, dst[order].astype(np.int32), type_codes[order].astype(np.int16)
+
+    @classmethod
+    def from_table(cls, table: Dict[NodeId, Dict]) -> 'CompactHierarchicalGraph':
+        """Build a compact graph from table. Nodes and edges are the same as those of `BioGraph.from_table`.
+
+        :param table: table
+        :return: compact graph
+        """
+        node_ids, node_attrs = list(table), list(table.values())
+        src, targets, edge_types = [], [], []
+        for pos, attributes in enumerate(node_attrs):
+            for edge_type, target_nodes in attributes.get('relationship', {}).items():
+                if edge_type.startswith('_'):
+                    continue
+                src.extend([pos] * len(target_nodes))
+                targets.extend(target_nodes)
+                edge_types.extend([edge_type] * len(target_nodes))
+        graph = cls._from_nodes_and_edges(node_ids, node_attrs, src, targets, edge_types)
+        if 'relationship' in graph._node_columns:
+            # relationships are kept as an attribute only for supplementary MeSH records, as in BioGraph.from_table
+            is_meshc = np.array([BioGraph.get_header(node) == Header.MeSHC for node in graph._node_ids])
+            graph._node_masks['relationship'] = graph._node_masks.get('relationship', True) & is_meshc
+        return graph
+
+    @classmethod
+    def from_graph(cls, graph: BioGraph) -> 'CompactHierarchicalGraph':
+        """Build a compact graph from a BioGraph.
+
+        :param graph: graph
+        :return: compact graph
+        """
+        node_ids, node_attrs = list(graph), [node_attr for _, node_attr in graph.nodes(data=True)]
+        positions = {node: pos for pos, node in enumerate(node_ids)}
+        edges = list(graph.edges(data='type'))
+        return cls._from_nodes_and_edges(
+            node_ids,
+            node_attrs,
+            [positions[s_node] for s_node, _, _ in edges],
+            [e_node for _, e_node, _ in edges],
+            [edge_type for _, _, edge_type in edges],
+        )
+
+    @classmethod
+    def _from_nodes_and_edges(
+        cls,
+        node_ids: List[NodeId],
+        node_attrs: List[NodeAttr],
+        src: List[int],
+        targets: List[NodeId],
+        edge_types: List[EdgeType],
+    ) -> 'CompactHierarchicalGraph':
+        dst = pd.Index(node_ids).get_indexer(targets)
+        if (dst < 0).any():
+            # targets without their own entry become nodes without attributes, as in networkx
+            unknown_targets = list(dict.fromkeys(np.asarray(targets, dtype=object)[dst < 0]))
+            node_ids = node_ids + unknown_targets
+            node_attrs = node_attrs + [{} for _ in unknown_targets]
+            dst = pd.Index(node_ids).get_indexer(targets)
+        node_columns, node_masks = to_columns(node_attrs)
+        type_codes, type_names = pd.factorize(pd.Series(edge_types, dtype=object))
+        edges = (np.asarray(src, dtype=np.int64), dst.astype(np.int64), type_codes)
+        return cls(node_ids, node_columns, node_masks, edges, list(type_names))
+
+    def __len__(self) -> int:
+        return len(self._node_ids)
+
+    def __iter__(self) -> Iterator[NodeId]:
+        return iter(self._node_ids)
+
+    def __contains__(self, node) -> bool:
+        try:
+            return bool(self.node_index([node])[0] >= 0)
+        except TypeError:
+            return False
+
+    @property
+    def _node_index(self) -> pd.Index:
+        if self._index is None:
+            node_ids = self._node_ids.tolist() if hasattr(self._node_ids, 'tolist') else self._node_ids
+            self._index = pd.Index(node_ids)
+        return self._index
+
+    @property
+    def nodes(self) -> CompactNodeView:
+        return CompactNodeView(self)
+
+    def number_of_nodes(self) -> int:
+        return len(self._node_ids)
+
+    def number_of_edges(self) -> int:
+        return len(self._succ_idx)
+
+    def node_index(self, nodes: List[NodeId]) -> np.ndarray:
+        """Get integer indices of nodes. (-1 for unknown nodes)
+
+        :param nodes: node ids
+        :return: indices
+        """
+        nodes = list(nodes)
+        if (self._index is None) and (self._id_order is not None) and (len(nodes) <= self._SEARCH_LIMIT):
+            # a loaded graph answers a few lookups by binary search, without building the index of all ids
+            return np.array([self._search_id(node) for node in nodes], dtype=np.int64)
+        return self._node_index.get_indexer(nodes)
+
+    def _search_id(self, node: NodeId) -> int:
+        lo, hi = 0, len(self._id_order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            try:
+                is_less = self._node_ids[self._id_order[mid]] < node
+            except TypeError:
+                return -1
+            if is_less:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self._id_order) and self._node_ids[self._id_order[lo]] == node:
+            return int(self._id_order[lo])
+        return -1
+
+    def node_attr(self, index: int, node: Optional[NodeId] = None) -> NodeAttr:
+        """Assemble the attribute dict of a node.
+
+        :param index: node index
+        :param node: node id, only used in the error message
+        :return: node attribute
+        """
+        if index < 0:
+            raise KeyError(node)
+        node_attr = {}
+        for key, values in self._node_columns.items():
+            if (key not in self._node_masks) or self._node_masks[key][index]:
+                value = values[index]
+                node_attr[key] = value.item() if isinstance(values, np.ndarray) else value
+        return node_attr
+
+    def _type_codes(self, edge_types: Optional[List[EdgeType]]) -> Optional[np.ndarray]:
+        if edge_types is None:
+            return None
+        return np.array([code for code, edge_type in enumerate(self._edge_types) if edge_type in set(edge_types)])
+
+    def _degrees(self, edge_types: Optional[List[EdgeType]]) -> Tuple[np.ndarray, np.ndarray]:
+        n_nodes, type_codes = len(self), self._type_codes(edge_types)
+        if type_codes is None:
+            return np.diff(self._pred_ptr), np.diff(self._succ_ptr)
+        src = np.repeat(np.arange(n_nodes), np.diff(self._succ_ptr))
+        mask = np.isin(self._succ_type, type_codes)
+        in_degree = np.bincount(self._succ_idx[mask], minlength=n_nodes)
+        out_degree = np.bincount(src[mask], minlength=n_nodes)
+        return in_degree, out_degree
+
+    def find_roots(self, edge_types: Optional[List[EdgeType]] = None) -> List[NodeId]:
+        """Find root nodes.
+
+        :param edge_types: edge type for remaining
+        :return: root nodes
+        """
+        in_degree, out_degree = self._degrees(edge_types)
+        is_root = in_degree == 0
+        if edge_types is not None:
+            is_root &= out_degree > 0
+        return [self._node_ids[idx] for idx in np.flatnonzero(is_root)]
+
+    def find_leaves(self, edge_types: Optional[List[EdgeType]] = None) -> List[NodeId]:
+        """Find leaf nodes.
+
+        :param edge_types: edge type for remaining
+        :return: leaf nodes
+        """
+        in_degree, out_degree = self._degrees(edge_types)
+        is_leaf = out_degree == 0
+        if edge_types is not None:
+            is_leaf &= in_degree > 0
+        return [self._node_ids[idx] for idx in np.flatnonzero(is_leaf)]
+
+    @staticmethod
+    def _expand(ptr: np.ndarray, indices: np.ndarray, frontier: np.ndarray) -> np.ndarray:
+        """Positions in `indices` of all neighbors of the frontier nodes."""
+        starts, counts = ptr[frontier], ptr[frontier + 1] - ptr[frontier]
+        offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+        return offsets + np.arange(counts.sum())
+
+    def _reach(
+        self, nodes: List[NodeId], case: str, edge_types: Optional[List[EdgeType]], max_depth: Optional[int] = None
+    ) -> np.ndarray:
+        ptr, indices, types = (
+            (self._succ_ptr, self._succ_idx, self._succ_type)
+            if case == 'successors'
+            else (self._pred_ptr, self._pred_idx, self._pred_type)
+        )
+        type_codes = self._type_codes(edge_types)
+        visited = np.zeros(len(self), dtype=bool)
+        frontier = self.node_index(nodes)
+        frontier = np.unique(frontier[frontier >= 0])
+        visited[frontier] = True
+        depth = 0
+        while len(frontier) > 0 and (max_depth is None or depth < max_depth):
+            positions = self._expand(ptr, indices, frontier)
+            if type_codes is not None:
+                positions = positions[np.isin(types[positions], type_codes)]
+            frontier = np.unique(indices[positions])
+            frontier = frontier[~visited[frontier]]
+            visited[frontier] = True
+            depth += 1
+        return visited
+
+    def _materialize(self, node_mask: np.ndarray, edge_mask: np.ndarray) -> HierarchicalGraph:
+        src = np.repeat(np.arange(len(self)), np.diff(self._succ_ptr))
+        nodes = [(self._node_ids[idx], self.node_attr(idx)) for idx in np.flatnonzero(node_mask)]
+        edges = [
+            (self._node_ids[s_idx], self._node_ids[e_idx], {'type': self._edge_types[code]})
+            for s_idx, e_idx, code in zip(src[edge_mask], self._succ_idx[edge_mask], self._succ_type[edge_mask])
+        ]
+        return self.graph_class(nodes, edges)
+
+    def _subgraph(
+        self, target_nodes: List[NodeId], case: str, edge_types: Optional[List[EdgeType]], max_depth: Optional[int]
+    ):
+        visited = self._reach(target_nodes, case, edge_types, max_depth)
+        edge_mask = np.repeat(visited, np.diff(self._succ_ptr)) & visited[self._succ_idx]
+        type_codes = self._type_codes(edge_types)
+        if type_codes is not None:
+            edge_mask &= np.isin(self._succ_type, type_codes)
+        return self._materialize(visited, edge_mask)
+
+    def subgraph_from_roots(
+        self, root_nodes: List[NodeId], edge_types: Optional[List[EdgeType]] = None, max_depth: Optional[int] = None
+    ):
+        """Build a sub graph of root nodes and their descendants.
+
+        :param root_nodes: root nodes
+        :param edge_types: edge types for remaining
+        :param max_depth: maximum depth from the root nodes. unlimited if None
+        :return: sub graph
+        """
+        return self._subgraph(root_nodes, 'successors', edge_types, max_depth)
+
+    def subgraph_from_leaves(
+        self, leaf_nodes: List[NodeId], edge_types: Optional[List[EdgeType]] = None, max_depth: Optional[int] = None
+    ):
+        """Build a sub graph of leaf nodes and their ancestors.
+
+        :param leaf_nodes: leaf nodes
+        :param edge_types: edge types for remaining
+        :param max_depth: maximum depth from the leaf nodes. unlimited if None
+        :return: sub graph
+        """
+        return self._subgraph(leaf_nodes, 'predecessors', edge_types, max_depth)
+
+    def to_graph(self) -> HierarchicalGraph:
+        """Materialize the whole graph.
+
+        :return: graph
+        """
+        return self._materialize(np.ones(len(self), dtype=bool), np.ones(self.number_of_edges(), dtype=bool))
+
+    def interval_labelling(self) -> IntervalLabelling:
+        """Get the interval labelling of the hierarchy, built on first use.
+
+        :return: interval labelling
+        """
+        if self._labelling is None:
+            src = np.repeat(np.arange(len(self)), np.diff(self._succ_ptr))
+            edge_mask = np.ones(self.number_of_edges(), dtype=bool)
+            type_codes = self._type_codes(self.hierarchy_edge_types)
+            if type_codes is not None:
+                edge_mask = np.isin(self._succ_type, type_codes)
+            self._labelling = IntervalLabelling(
+                self._node_index,
+                src[edge_mask],
+                self._succ_idx[edge_mask],
+                self.hierarchy_aliases(self._node_index),
+                self.reflexive_descendant,
+            )
+        return self._labelling
+
+    def save(self, path: str):
+        """Save the graph to a binary file. `load` memory-maps the arrays, so opening it does not build anything.
+
+        :param path: file path
+        """
+        blocks, node_kinds = encode_columns('node', self._node_columns, self._node_masks)
+        id_kind, id_parts = encode_column(self._node_ids)
+        blocks.update({f'node_id/{part}': array for part, array in id_parts.items()})
+        for name in self._ARRAYS:
+            blocks[name] = getattr(self, f'_{name}')
+        try:
+            blocks['node_id_order'] = np.argsort(np.array(list(self._node_ids), dtype=object), kind='stable')
+        except TypeError:
+            pass  # ids of mixed types can not be ordered
+        meta = {
+            'layout': 'compact',
+            'class': type(self).__name__,
+            'node_id': id_kind,
+            'node_columns': node_kinds,
+            'edge_types': self._edge_types,
+        }
+        save_blocks(path, blocks, meta)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'CompactHierarchicalGraph':
+        """Load a graph saved by `save`. Node ids and attributes are decoded when they are accessed.
+
+        :param path: file path
+        :param mmap: if True, memory-map the arrays instead of reading them
+        :return: compact graph
+        """
+        blocks, meta = load_blocks(path, mmap)
+        if meta.get('layout') != 'compact':
+            raise ValueError(f'{path} is not a compact graph file')
+        graph = cls.__new__(cls)
+        id_parts = {name[len('node_id/'):]: array for name, array in blocks.items() if name.startswith('node_id/')}
+        graph._node_ids = decode_column(meta['node_id'], id_parts)
+        graph._index = None
+        graph._id_order = blocks.get('node_id_order')
+        graph._node_columns, graph._node_masks = decode_columns('node', blocks, meta['node_columns'])
+        graph._edge_types = meta['edge_types']
+        for name in cls._ARRAYS:
+            setattr(graph, f'_{name}', blocks[name])
+        graph._labelling = None
+        return graph
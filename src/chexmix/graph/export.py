@@ -0,0 +1,163 @@
+import json
+import numbers
+from contextlib import contextmanager
+from typing import IO, Any, Dict, Iterable, Iterator, Optional, Union
+from xml.sax.saxutils import escape, quoteattr
+
+import numpy as np
+
+PathOrFile = Union[str, IO[str]]
+
+GRAPHML_HEADER = (
+    '<?xml version="1.0" encoding="utf-8"?>\n'
+    '<graphml xmlns="http://graphml.graphdrawing.org/xmlns" '
+    'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+    'xsi:schemaLocation="http://graphml.graphdrawing.org/xmlns '
+    'http://graphml.graphdrawing.org/xmlns/1.0/graphml.xsd">\n'
+)
+
+
+@contextmanager
+def open_text(path_or_file: PathOrFile) -> Iterator[IO[str]]:
+    """Open a file path for writing text, or pass an open text file through (left open).
+
+    :param path_or_file: file path or text file object
+    :return: text file object
+    """
+    if isinstance(path_or_file, str):
+        with open(path_or_file, 'w', encoding='utf-8') as f:
+            yield f
+    else:
+        yield path_or_file
+
+
+def graphml_type(value: Any) -> Optional[str]:
+    """Get the GraphML type of a value. None for values GraphML can not hold (ex. lists and dicts).
+
+    :param value: value
+    :return: GraphML type
+    """
+    if isinstance(value, (bool, np.bool_)):
+        return 'boolean'
+    if isinstance(value, numbers.Integral):
+        return 'long'
+    if isinstance(value, numbers.Real):
+        return 'double'
+    if isinstance(value, str):
+        return 'string'
+    return None
+
+
+def _scan_types(attrs: Iterable[Dict[str, Any]]) -> Dict[str, str]:
+    key_types = {}
+    for attr in attrs:
+        for key, value in attr.items():
+            value_type = graphml_type(value)
+            if (value_type is None) or (key_types.get(key) == value_type):
+                continue
+            if key not in key_types:
+                key_types[key] = value_type
+            elif {key_types[key], value_type} == {'long', 'double'}:
+                key_types[key] = 'double'
+            else:
+                key_types[key] = 'string'
+    return key_types
+
+
+def _format(value: Any, key_type: str) -> str:
+    if key_type == 'boolean':
+        return 'true' if value else 'false'
+    if key_type == 'long':
+        return str(int(value))
+    if key_type == 'double':
+        return repr(float(value))
+    return escape(str(value))
+
+
+def _data(attr: Dict[str, Any], key_ids: Dict[str, str], key_types: Dict[str, str]) -> str:
+    return ''.join(
+        f'<data key="{key_ids[key]}">{_format(value, key_types[key])}</data>'
+        for key, value in attr.items()
+        if (key in key_types) and (graphml_type(value) is not None)
+    )
+
+
+def write_graphml(graph, path_or_file: PathOrFile):
+    """Write a graph to GraphML node by node and edge by edge, without building a converted copy or an XML tree.
+    Attributes GraphML can not hold (ex. lists and dicts) are left out, and attributes of mixed types are written as
+    strings. The nodes and edges are listed once, then scanned for attribute types and written from that list.
+
+    GraphML ids are strings, so node ids and edge keys are written with str(), as networkx does. Read a graph of
+    integer ids back with `networkx.read_graphml(path, node_type=int)`.
+
+    :param graph: graph (BioGraph or any networkx graph)
+    :param path_or_file: file path or text file object
+    """
+    nodes = list(graph.nodes(data=True))
+    edges = list(graph.edges(keys=True, data=True) if graph.is_multigraph() else graph.edges(data=True))
+    domains = [
+        ('graph', [graph.graph]),
+        ('node', (attr for _, attr in nodes)),
+        ('edge', (edge[-1] for edge in edges)),
+    ]
+    key_types, key_ids = {}, {}
+    with open_text(path_or_file) as f:
+        f.write(GRAPHML_HEADER)
+        for domain, attrs in domains:
+            key_types[domain] = _scan_types(attrs)
+            key_ids[domain] = {}
+            for key, key_type in key_types[domain].items():
+                key_id = key_ids[domain][key] = f'd{sum(len(ids) for ids in key_ids.values())}'
+                name = quoteattr(str(key))
+                f.write(f'  <key id="{key_id}" for="{domain}" attr.name={name} attr.type="{key_type}"/>\n')
+
+        edge_default = 'directed' if graph.is_directed() else 'undirected'
+        f.write(f'  <graph edgedefault="{edge_default}">')
+        f.write(_data(graph.graph, key_ids['graph'], key_types['graph']) + '\n')
+        for node, attr in nodes:
+            f.write(f'    <node id={quoteattr(str(node))}>{_data(attr, key_ids["node"], key_types["node"])}</node>\n')
+        for edge in edges:
+            s_node, e_node, attr = edge[0], edge[1], edge[-1]
+            edge_id = f' id={quoteattr(str(edge[2]))}' if graph.is_multigraph() else ''
+            f.write(
+                f'    <edge source={quoteattr(str(s_node))} target={quoteattr(str(e_node))}{edge_id}>'
+                f'{_data(attr, key_ids["edge"], key_types["edge"])}</edge>\n'
+            )
+        f.write('  </graph>\n</graphml>\n')
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    return str(value)
+
+
+def write_node_link_json(graph, path_or_file: PathOrFile, edges_key: str = 'links'):
+    """Write a graph as node-link JSON (the `networkx.node_link_data` layout) node by node and edge by edge.
+    Values JSON can not hold are converted on the fly (NumPy values to Python values, sets to lists, others to str).
+
+    :param graph: graph (BioGraph or any networkx graph)
+    :param path_or_file: file path or text file object
+    :param edges_key: key of the edge list ('links' as networkx < 3.6 writes, or 'edges')
+    """
+
+    def dumps(value):
+        return json.dumps(value, default=_json_default, ensure_ascii=False)
+
+    with open_text(path_or_file) as f:
+        f.write(f'{{"directed": {dumps(graph.is_directed())}, "multigraph": {dumps(graph.is_multigraph())}, ')
+        f.write(f'"graph": {dumps(dict(graph.graph))}, "nodes": [')
+        for pos, (node, attr) in enumerate(graph.nodes(data=True)):
+            f.write(('\n' if pos == 0 else ',\n') + dumps({**attr, 'id': node}))
+        f.write(f'], {dumps(edges_key)}: [')
+        edges = graph.edges(keys=True, data=True) if graph.is_multigraph() else graph.edges(data=True)
+        for pos, edge in enumerate(edges):
+            link = {**edge[-1], 'source': edge[0], 'target': edge[1]}
+            if graph.is_multigraph():
+                link['key'] = edge[2]
+            f.write(('\n' if pos == 0 else ',\n') + dumps(link))
+        f.write(']}\n')
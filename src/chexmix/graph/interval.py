@@ -0,0 +1,220 @@
+import itertools
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+NodeId = Hashable
+
+
+class IntervalLabelling:
+    """Reachability labelling of a hierarchy for constant time ancestor tests.
+
+    Nodes are numbered in pre-order of a depth first spanning forest, so the descendants of a node in the forest are
+    the numbers in its interval [pre, end]. Descendants reached through the other parents of a DAG (ex. MeSH
+    descriptors in many trees) add more intervals, merged with those of the children in post-order. A node is a
+    descendant of another if its number falls in one of the intervals of the other, which a binary search over a
+    handful of intervals decides.
+
+    Aliases stand in for nodes outside the hierarchy (ex. a MeSH supplementary concept is tested as its heading
+    descriptors): a pair is a descendant pair if any pair of their aliases is. Hierarchy edges must be acyclic.
+    """
+
+    def __init__(
+        self,
+        node_ids: Sequence[NodeId],
+        src: np.ndarray,
+        dst: np.ndarray,
+        aliases: Optional[Dict[NodeId, List[NodeId]]] = None,
+        reflexive: bool = True,
+    ):
+        """Constructor method.
+
+        :param node_ids: node ids
+        :param src: source indices of hierarchy edges (parent -> child)
+        :param dst: target indices of hierarchy edges
+        :param aliases: nodes to test in place of a node
+        :param reflexive: if True, a node is a descendant of itself
+        """
+        self.reflexive = reflexive
+        self._node_index = pd.Index(node_ids)
+        n_nodes = len(node_ids)
+        self._src, self._dst = np.asarray(src, dtype=np.int64), np.asarray(dst, dtype=np.int64)
+        self._pre, self._ptr, self._lo, self._hi = self._label(n_nodes, self._src, self._dst)
+        # intervals sorted by (node, lo), as keys for one searchsorted over all nodes
+        self._keys = np.repeat(np.arange(n_nodes, dtype=np.int64), np.diff(self._ptr)) * (n_nodes + 1) + self._lo
+        self._alias_ptr, self._alias_idx = self._alias_csr(aliases or {})
+
+    def __len__(self) -> int:
+        return len(self._node_index)
+
+    @staticmethod
+    def _label(n_nodes: int, src: np.ndarray, dst: np.ndarray) -> Tuple[np.ndarray, ...]:
+        order = np.argsort(src, kind='stable')
+        ptr = np.zeros(n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n_nodes), out=ptr[1:])
+        ptr, children = ptr.tolist(), dst[order].tolist()
+        roots = np.flatnonzero(np.bincount(dst, minlength=n_nodes) == 0).tolist()
+
+        pre, end, post_order = [-1] * n_nodes, [0] * n_nodes, []
+        counter = 0
+        for root in itertools.chain(roots, range(n_nodes)):
+            if pre[root] >= 0:
+                continue
+            pre[root] = counter
+            counter += 1
+            stack = [[root, ptr[root]]]
+            while stack:
+                frame = stack[-1]
+                node, pos = frame
+                if pos < ptr[node + 1]:
+                    frame[1] += 1
+                    child = children[pos]
+                    if pre[child] < 0:
+                        pre[child] = counter
+                        counter += 1
+                        stack.append([child, ptr[child]])
+                else:
+                    stack.pop()
+                    end[node] = counter - 1
+                    post_order.append(node)
+
+        intervals = [None] * n_nodes
+        for node in post_order:
+            lo, hi = pre[node], end[node]
+            merged = [(lo, hi)]
+            for child in children[ptr[node]:ptr[node + 1]]:
+                child_intervals = intervals[child]
+                if child_intervals is None:
+                    continue
+                if len(child_intervals) == 1 and lo <= child_intervals[0][0] and child_intervals[0][1] <= hi:
+                    continue  # a tree child, covered by the interval of this node
+                merged.extend(child_intervals)
+            intervals[node] = IntervalLabelling._merge(merged) if len(merged) > 1 else merged
+
+        counts = [len(node_intervals) for node_intervals in intervals]
+        interval_ptr = np.zeros(n_nodes + 1, dtype=np.int64)
+        np.cumsum(counts, out=interval_ptr[1:])
+        flat = np.array(list(itertools.chain.from_iterable(intervals)), dtype=np.int64).reshape(-1, 2)
+        return np.array(pre, dtype=np.int64), interval_ptr, flat[:, 0].copy(), flat[:, 1].copy()
+
+    @staticmethod
+    def _merge(intervals: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        intervals.sort()
+        merged = [intervals[0]]
+        for lo, hi in intervals[1:]:
+            last_lo, last_hi = merged[-1]
+            if lo <= last_hi + 1:
+                if hi > last_hi:
+                    merged[-1] = (last_lo, hi)
+            else:
+                merged.append((lo, hi))
+        return merged
+
+    def _alias_csr(self, aliases: Dict[NodeId, List[NodeId]]) -> Tuple[np.ndarray, np.ndarray]:
+        targets = [[idx] for idx in range(len(self))]
+        for node, alias_nodes in aliases.items():
+            idx = self._node_index.get_indexer([node])[0]
+            if idx >= 0:
+                alias_idx = self._node_index.get_indexer(alias_nodes)
+                targets[idx] = alias_idx[alias_idx >= 0].tolist()
+        ptr = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum([len(node_targets) for node_targets in targets], out=ptr[1:])
+        return ptr, np.array(list(itertools.chain.from_iterable(targets)), dtype=np.int64)
+
+    @property
+    def node_ids(self) -> pd.Index:
+        """Node ids, in the order of node positions."""
+        return self._node_index
+
+    @property
+    def edges(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(source positions, target positions) of the hierarchy edges."""
+        return self._src, self._dst
+
+    def node_index(self, nodes: Sequence[NodeId]) -> np.ndarray:
+        """Get the positions of nodes in the labelling. -1 for unknown nodes.
+
+        :param nodes: node ids
+        :return: positions
+        """
+        return self._node_index.get_indexer(nodes)
+
+    def __contains__(self, node) -> bool:
+        return node in self._node_index
+
+    def is_descendant(self, node_id1: NodeId, node_id2: NodeId) -> bool:
+        """Return True if node_id1 is a descendant of node_id2. False if any of them is unknown.
+
+        :param node_id1: node id
+        :param node_id2: node id
+        :return: bool
+        """
+        try:
+            idx1, idx2 = self._node_index.get_loc(node_id1), self._node_index.get_loc(node_id2)
+        except KeyError:
+            return False
+        for alias1 in self._alias_idx[self._alias_ptr[idx1]:self._alias_ptr[idx1 + 1]]:
+            for alias2 in self._alias_idx[self._alias_ptr[idx2]:self._alias_ptr[idx2 + 1]]:
+                pre = self._pre[alias1]
+                pos = np.searchsorted(self._keys, alias2 * (len(self) + 1) + pre, side='right') - 1
+                if pos >= self._ptr[alias2] and self._hi[pos] >= pre and (self.reflexive or alias1 != alias2):
+                    return True
+        return False
+
+    def is_descendant_many(self, indices1: np.ndarray, indices2: np.ndarray) -> np.ndarray:
+        """Vectorized `is_descendant` on node positions. False for unknown (-1) positions.
+
+        :param indices1: positions of descendant candidates
+        :param indices2: positions of ancestor candidates
+        :return: bool array
+        """
+        indices1, indices2 = np.asarray(indices1, dtype=np.int64), np.asarray(indices2, dtype=np.int64)
+        result = np.zeros(len(indices1), dtype=bool)
+        known = np.flatnonzero((indices1 >= 0) & (indices2 >= 0))
+        if len(known) == 0 or len(self._keys) == 0:
+            return result
+        pair_ids, alias1 = self._expand_aliases(known, indices1[known])
+        pair_ids, alias2, alias1 = self._expand_aliases(pair_ids, indices2[pair_ids], alias1)
+
+        found = self.reaches(alias1, alias2)
+        if not self.reflexive:
+            found &= alias1 != alias2
+        result[pair_ids[found]] = True
+        return result
+
+    def reaches(self, indices1: np.ndarray, indices2: np.ndarray) -> np.ndarray:
+        """Vectorized reachability on known node positions: True where indices1 is reached from indices2 through the
+        hierarchy edges or is the same node. Aliases and reflexivity are not applied.
+
+        :param indices1: positions of descendant candidates
+        :param indices2: positions of ancestor candidates
+        :return: bool array
+        """
+        if len(self._keys) == 0:
+            return np.zeros(len(indices1), dtype=bool)
+        pre = self._pre[indices1]
+        pos = np.searchsorted(self._keys, indices2 * (len(self) + 1) + pre, side='right') - 1
+        return (pos >= self._ptr[indices2]) & (self._hi[np.maximum(pos, 0)] >= pre)
+
+    def descendant_sums(self, values: np.ndarray) -> np.ndarray:
+        """Sum values over the descendants of every node, the node itself included.
+        Every descendant is counted once even if it is reached through many paths of a DAG.
+
+        :param values: values of nodes, in the order of node positions
+        :return: sums of nodes
+        """
+        values = np.asarray(values)
+        if len(values) == 0:
+            return values.copy()
+        by_pre = np.zeros_like(values)
+        by_pre[self._pre] = values
+        cumulative = np.concatenate([np.zeros(1, dtype=by_pre.dtype), np.cumsum(by_pre)])
+        return np.add.reduceat(cumulative[self._hi + 1] - cumulative[self._lo], self._ptr[:-1])
+
+    def _expand_aliases(self, pair_ids: np.ndarray, indices: np.ndarray, *carried: np.ndarray):
+        counts = self._alias_ptr[indices + 1] - self._alias_ptr[indices]
+        starts = np.repeat(self._alias_ptr[indices], counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        expanded = [np.repeat(pair_ids, counts), self._alias_idx[starts + offsets]]
+        return tuple(expanded + [np.repeat(values, counts) for values in carried])
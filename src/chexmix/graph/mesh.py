@@ -1,6 +1,8 @@
-from typing import Dict
+from typing import Dict, List
 
 from chexmix.graph import EdgeType, Header, HierarchicalGraph
+from chexmix.graph.base import NodeId
+from chexmix.graph.compact import CompactHierarchicalGraph
 
 
 class MeSHGraph(HierarchicalGraph):
@@ -27,18 +29,41 @@ class MeSHGraph(HierarchicalGraph):
         mesh_header = Header.MeSHD if bioentity[0] == "D" else Header.MeSHC
         return HierarchicalGraph.create_node_id(mesh_header, bioentity)
 
-    def is_descendant(self, node_id1: str, node_id2: str) -> bool:
-        node_data = self.nodes.data()
-        descriptors = [
-            node_data[node_id]['relationship'][EdgeType.reverse_prefix(EdgeType.CONTAINS)]
-            if HierarchicalGraph.get_header(node_id) == Header.MeSHC
-            else [node_id]
-            for node_id in [node_id1, node_id2]
-        ]
-        for desc1 in descriptors[0]:
-            for desc2 in descriptors[1]:
-                for tn1 in node_data[desc1]['tree_numbers']:
-                    for tn2 in node_data[desc2]['tree_numbers']:
-                        if tn1.startswith(tn2):
-                            return True
-        return False
+    def hierarchy_aliases(self, nodes: List[NodeId]) -> Dict[NodeId, List[NodeId]]:
+        """Supplementary concepts are tested as their heading descriptors.
+
+        :param nodes: nodes
+        :return: aliases of nodes
+        """
+        return {
+            node: self.nodes[node].get('relationship', {}).get(EdgeType.reverse_prefix(EdgeType.CONTAINS), [node])
+            for node in nodes
+            if self.get_header(node) == Header.MeSHC
+        }
+
+    def _is_descendant_by_attributes(self, node_id1: str, node_id2: str) -> bool:
+        # ancestors filtered out of the graph are still known from the tree numbers
+        if (node_id1 not in self.nodes) or (node_id2 not in self.nodes):
+            return False
+        aliases = self.hierarchy_aliases([node_id1, node_id2])
+        tree_numbers1, tree_numbers2 = (
+            [
+                tree_number
+                for descriptor in aliases.get(node_id, [node_id])
+                if descriptor in self.nodes
+                for tree_number in self.nodes[descriptor].get('tree_numbers') or []
+            ]
+            for node_id in (node_id1, node_id2)
+        )
+        return any(tn1.startswith(tn2) for tn1 in tree_numbers1 for tn2 in tree_numbers2)
+
+
+class CompactMeSHGraph(CompactHierarchicalGraph):
+    """MeSHGraph stored in compact arrays. Sub graphs are built as MeSHGraph objects."""
+
+    graph_class = MeSHGraph
+
+    subgraph_from_pubtator_bioentities = MeSHGraph.subgraph_from_pubtator_bioentities
+    get_mesh_node_id_from = staticmethod(MeSHGraph.get_mesh_node_id_from)
+    hierarchy_aliases = MeSHGraph.hierarchy_aliases
+    _is_descendant_by_attributes = MeSHGraph._is_descendant_by_attributes
@@ -35,6 +35,7 @@ class PubMedGraph(BioGraph):
 
     def to_graphml(self) -> nx.DiGraph:
         """Reduce attribute for export to .graphml. A returned graph is only used to export.
+        `write_graphml` writes the same attributes straight to a file, without this copy.
 
         :return: graph for export
         """
@@ -0,0 +1,209 @@
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from chexmix.graph.interval import IntervalLabelling
+
+NodeId = Hashable
+NodePairs = Union[np.ndarray, List[Tuple[NodeId, NodeId]]]
+
+
+class HierarchySimilarity:
+    """Lowest common ancestors and Resnik/Lin semantic similarity of node pairs in a hierarchy.
+
+    The information content of a node is -log((c + 1) / (C + 1)), where c is the sum of publication counts of the
+    node and its descendants and C is the sum over all nodes, so leaves without publications get the largest finite
+    value and the root of all publications gets zero.
+
+    Trees use an Euler tour with a sparse table for range minimum queries, so a LCA costs two lookups. DAGs (ex.
+    MeSH) have no single lowest ancestor: the common ancestor with the most information (MICA) is used instead,
+    searched over the memoized ancestor closure of the first node with the interval labelling.
+    """
+
+    def __init__(self, labelling: IntervalLabelling, counts: np.ndarray):
+        """Constructor method. Use `HierarchicalGraph.similarity` to build it from a graph.
+
+        :param labelling: interval labelling of the hierarchy
+        :param counts: publication counts of nodes, in the order of the labelling
+        """
+        self._labelling = labelling
+        n_nodes = len(labelling)
+        src, dst = labelling.edges
+        sums = labelling.descendant_sums(np.asarray(counts, dtype=np.float64))
+        total = np.asarray(counts, dtype=np.float64).sum()
+        self.information_content = -np.log((sums + 1) / (total + 1))
+
+        order = np.argsort(dst, kind='stable')
+        self._parent_ptr = np.zeros(n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(dst, minlength=n_nodes), out=self._parent_ptr[1:])
+        self.is_tree = bool(np.all(np.diff(self._parent_ptr) <= 1))
+        self._parent_ptr, self._parents = self._parent_ptr.tolist(), src[order].tolist()
+        self._ancestors: Dict[int, np.ndarray] = {}
+        if self.is_tree:
+            self._first, self._tree, self._euler_depth, self._euler, self._sparse = self._euler_tour(n_nodes, src, dst)
+
+    @staticmethod
+    def _euler_tour(n_nodes: int, src: np.ndarray, dst: np.ndarray):
+        order = np.argsort(src, kind='stable')
+        ptr = np.zeros(n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n_nodes), out=ptr[1:])
+        ptr, children = ptr.tolist(), dst[order].tolist()
+        roots = np.flatnonzero(np.bincount(dst, minlength=n_nodes) == 0).tolist()
+
+        euler, depths, first, tree = [], [], [-1] * n_nodes, [-1] * n_nodes
+        for root in roots:
+            first[root], tree[root] = len(euler), root
+            euler.append(root)
+            depths.append(0)
+            stack = [[root, ptr[root]]]
+            while stack:
+                frame = stack[-1]
+                node, pos = frame
+                if pos < ptr[node + 1]:
+                    frame[1] += 1
+                    child = children[pos]
+                    first[child], tree[child] = len(euler), root
+                    euler.append(child)
+                    depths.append(len(stack))
+                    stack.append([child, ptr[child]])
+                else:
+                    stack.pop()
+                    if stack:
+                        euler.append(stack[-1][0])
+                        depths.append(len(stack) - 1)
+
+        depths = np.array(depths, dtype=np.int32)
+        # sparse[k][i] is the position of the shallowest node in euler[i:i + 2 ** k]
+        sparse = [np.arange(len(euler), dtype=np.int32)]
+        span = 1
+        while 2 * span <= len(euler):
+            prev = sparse[-1]
+            left, right = prev[: len(euler) - 2 * span + 1], prev[span: len(euler) - span + 1]
+            sparse.append(np.where(depths[left] <= depths[right], left, right))
+            span *= 2
+        sparse = [np.pad(level, (0, len(euler) - len(level))) for level in sparse]
+        return (
+            np.array(first, dtype=np.int64),
+            np.array(tree, dtype=np.int64),
+            depths,
+            np.array(euler, dtype=np.int64),
+            np.array(sparse, dtype=np.int32).reshape(len(sparse), len(euler)),
+        )
+
+    def _node_indices(self, pairs: NodePairs) -> Tuple[np.ndarray, np.ndarray]:
+        if not isinstance(pairs, np.ndarray):
+            pairs = np.array(pairs, dtype=object).reshape(-1, 2)
+        return self._labelling.node_index(pairs[:, 0]), self._labelling.node_index(pairs[:, 1])
+
+    def ancestors(self, index: int) -> np.ndarray:
+        """Get the ancestor closure of a node, itself included, ordered by information content (largest first).
+
+        :param index: node position
+        :return: ancestor positions
+        """
+        if index not in self._ancestors:
+            reached = {index: None}
+            frontier = [index]
+            while frontier:
+                next_frontier = []
+                for node in frontier:
+                    for parent in self._parents[self._parent_ptr[node]:self._parent_ptr[node + 1]]:
+                        if parent not in reached:
+                            reached[parent] = None
+                            next_frontier.append(parent)
+                frontier = next_frontier
+            ancestors = np.array(list(reached), dtype=np.int64)
+            self._ancestors[index] = ancestors[np.argsort(-self.information_content[ancestors], kind='stable')]
+        return self._ancestors[index]
+
+    def lca_indices(self, indices1: np.ndarray, indices2: np.ndarray) -> np.ndarray:
+        """Vectorized lowest common ancestor (MICA for DAGs) on node positions. -1 if there is none.
+
+        :param indices1: node positions
+        :param indices2: node positions
+        :return: positions of lowest common ancestors
+        """
+        indices1, indices2 = np.asarray(indices1, dtype=np.int64), np.asarray(indices2, dtype=np.int64)
+        result = np.full(len(indices1), -1, dtype=np.int64)
+        known = np.flatnonzero((indices1 >= 0) & (indices2 >= 0))
+        if len(known) == 0:
+            return result
+        if self.is_tree:
+            first1, first2 = self._first[indices1[known]], self._first[indices2[known]]
+            same_tree = (first1 >= 0) & (first2 >= 0) & (self._tree[indices1[known]] == self._tree[indices2[known]])
+            known, first1, first2 = known[same_tree], first1[same_tree], first2[same_tree]
+            left, right = np.minimum(first1, first2), np.maximum(first1, first2)
+            level = np.log2(right - left + 1).astype(np.int64)
+            candidates1 = self._sparse[level, left]
+            candidates2 = self._sparse[level, right - (1 << level) + 1]
+            shallowest = np.where(
+                self._euler_depth[candidates1] <= self._euler_depth[candidates2], candidates1, candidates2
+            )
+            result[known] = self._euler[shallowest]
+            return result
+
+        ancestors = [self.ancestors(index) for index in indices1[known].tolist()]
+        counts = np.array([len(node_ancestors) for node_ancestors in ancestors], dtype=np.int64)
+        pair_ids = np.repeat(known, counts)
+        candidates = np.concatenate(ancestors)
+        # ancestors are ordered by information content, so the first common one of each pair is the MICA
+        found = np.flatnonzero(self._labelling.reaches(indices2[pair_ids], candidates))
+        found_pairs, first = np.unique(pair_ids[found], return_index=True)
+        result[found_pairs] = candidates[found[first]]
+        return result
+
+    def lowest_common_ancestors(self, pairs: NodePairs) -> List[Optional[NodeId]]:
+        """Get the lowest common ancestor (MICA for DAGs) of node pairs.
+
+        :param pairs: node id pairs, as a list of tuples or an array of shape (n, 2)
+        :return: lowest common ancestors. None if there is none or a node is unknown
+        """
+        node_ids = self._labelling.node_ids
+        return [None if index < 0 else node_ids[index] for index in self.lca_indices(*self._node_indices(pairs))]
+
+    def resnik(self, pairs: NodePairs) -> np.ndarray:
+        """Resnik similarity of node pairs: the information content of their lowest common ancestor.
+
+        :param pairs: node id pairs, as a list of tuples or an array of shape (n, 2)
+        :return: similarities. 0 if there is no common ancestor or a node is unknown
+        """
+        lca = self.lca_indices(*self._node_indices(pairs))
+        return np.where(lca >= 0, self.information_content[lca], 0.0)
+
+    def lin(self, pairs: NodePairs) -> np.ndarray:
+        """Lin similarity of node pairs: 2 * IC(lca) / (IC(node1) + IC(node2)), between 0 and 1.
+
+        :param pairs: node id pairs, as a list of tuples or an array of shape (n, 2)
+        :return: similarities. 0 if there is no common ancestor or a node is unknown
+        """
+        indices1, indices2 = self._node_indices(pairs)
+        lca = self.lca_indices(indices1, indices2)
+        found = lca >= 0
+        similarity = np.zeros(len(lca))
+        ic_lca = self.information_content[lca[found]]
+        ic_sum = self.information_content[indices1[found]] + self.information_content[indices2[found]]
+        # both nodes carry all publications, so they are as similar as they can be
+        similarity[found] = np.divide(2 * ic_lca, ic_sum, out=np.ones(len(ic_sum)), where=ic_sum > 0)
+        return similarity
+
+    def similarity(self, pairs: NodePairs, method: str = 'lin') -> np.ndarray:
+        """Score node pairs.
+
+        :param pairs: node id pairs, as a list of tuples or an array of shape (n, 2)
+        :param method: "resnik" or "lin"
+        :return: similarities
+        """
+        if method == 'resnik':
+            return self.resnik(pairs)
+        if method == 'lin':
+            return self.lin(pairs)
+        raise ValueError(f'method must be "resnik" or "lin", not {method}')
+
+    def information_content_of(self, nodes: Sequence[NodeId]) -> np.ndarray:
+        """Get the information content of nodes. NaN for unknown nodes.
+
+        :param nodes: node ids
+        :return: information content
+        """
+        indices = self._labelling.node_index(nodes)
+        return np.where(indices >= 0, self.information_content[indices], np.nan)
@@ -1,9 +1,12 @@
 from typing import Dict, List, Optional
 
 from chexmix.graph import Header, HierarchicalGraph, NodeType, TaxParentType
+from chexmix.graph.compact import CompactHierarchicalGraph
 
 
 class TaxonomyGraph(HierarchicalGraph):
+    reflexive_descendant = False
+
     def subgraph_from_pubtator_bioentities(
         self,
         taxonomy_table: Dict[int, Dict],
@@ -62,5 +65,17 @@ class TaxonomyGraph(HierarchicalGraph):
         parent_ids = [tax_name_id[name] for name in parent_names]
         return parent_ids
 
-    def is_descendant(self, node_id1: str, node_id2: str) -> bool:
-        return node_id2 in self.nodes.data()[node_id1]['lineage']
+    def _is_descendant_by_attributes(self, node_id1: str, node_id2: str) -> bool:
+        # ancestors filtered out of the graph are still known from the lineage
+        return (node_id1 in self.nodes) and (node_id2 in self.nodes[node_id1].get('lineage', []))
+
+
+class CompactTaxonomyGraph(CompactHierarchicalGraph):
+    """TaxonomyGraph stored in compact arrays. Sub graphs are built as TaxonomyGraph objects."""
+
+    graph_class = TaxonomyGraph
+
+    subgraph_from_pubtator_bioentities = TaxonomyGraph.subgraph_from_pubtator_bioentities
+    get_parents = staticmethod(TaxonomyGraph.get_parents)
+    reflexive_descendant = TaxonomyGraph.reflexive_descendant
+    _is_descendant_by_attributes = TaxonomyGraph._is_descendant_by_attributes
@@ -0,0 +1,120 @@
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+SUCCESSORS = 'successors'
+PREDECESSORS = 'predecessors'
+
+
+class Traversal:
+    """Multi-source frontier traversal over a BioGraph in one direction, masked by edge types.
+
+    Reachability closures of source nodes are memoized on the graph and reused by later traversals in the same
+    direction with the same edge types, until the graph is mutated. Views never keep closures since their base
+    graph can change under them.
+    """
+
+    def __init__(self, graph, direction: str = SUCCESSORS, edge_types: Optional[Iterable[Any]] = None):
+        """Constructor method.
+
+        :param graph: graph to traverse (BioGraph or a view of it)
+        :param direction: "successors" or "predecessors"
+        :param edge_types: edge types to follow. all edges if None
+        """
+        if direction not in (SUCCESSORS, PREDECESSORS):
+            raise ValueError(f'direction must be "{SUCCESSORS}" or "{PREDECESSORS}", not {direction}')
+        self.graph = graph
+        self.direction = direction
+        self.edge_types = None if edge_types is None else frozenset(edge_types)
+        self._adjacency = graph._succ if direction == SUCCESSORS else graph._pred
+        if self.edge_types is None or graph.is_view:
+            self._masks = None
+        else:
+            index = graph._type_succ if direction == SUCCESSORS else graph._type_pred
+            self._masks = [index[edge_type] for edge_type in self.edge_types if edge_type in index]
+
+    def neighbors(self, node: Hashable) -> Iterable[Hashable]:
+        """Get the neighbors of a node through the masked edges.
+
+        :param node: node
+        :return: neighbors
+        """
+        if self.edge_types is None:
+            return self._adjacency[node]
+        if self._masks is None:
+            # views do not own an index, so filter their adjacency
+            return [
+                neighbor
+                for neighbor, key_dict in self._adjacency[node].items()
+                if any(edge_attr.get('type') in self.edge_types for edge_attr in key_dict.values())
+            ]
+        if len(self._masks) == 1:
+            return self._masks[0].get(node, ())
+        neighbors = {}
+        for mask in self._masks:
+            neighbors.update(mask.get(node, {}))
+        return neighbors
+
+    def closure(self, node: Hashable) -> Tuple[Hashable, ...]:
+        """Get the nodes reachable from a node, including itself, in breadth first order.
+
+        :param node: node
+        :return: reachable nodes
+        """
+        closures = self._closures()
+        if node not in closures:
+            closures[node] = tuple(self._search([node], closures))
+        return closures[node]
+
+    def reach(self, nodes: Iterable[Hashable], max_depth: Optional[int] = None) -> List[Hashable]:
+        """Get the nodes reachable from any of the source nodes, including themselves.
+        Source nodes not in the graph are ignored.
+
+        :param nodes: source nodes
+        :param max_depth: maximum number of edges from the sources. unlimited if None
+        :return: reachable nodes
+        """
+        return self.reach_many([nodes], max_depth)[0]
+
+    def reach_many(self, node_sets: Iterable[Iterable[Hashable]], max_depth: Optional[int] = None) -> List[List]:
+        """Get the reachable nodes of many source node sets in one batch.
+        Without depth limit, the closure of every distinct source node is searched only once for the whole batch.
+
+        :param node_sets: source node sets
+        :param max_depth: maximum number of edges from the sources. unlimited if None
+        :return: reachable nodes of each source node set
+        """
+        node_sets = [[node for node in nodes if node in self.graph] for nodes in node_sets]
+        if max_depth is not None:
+            return [list(self._search(nodes, {}, max_depth)) for nodes in node_sets]
+        reached_sets = []
+        for nodes in node_sets:
+            reached = {}
+            for node in nodes:
+                if node not in reached:
+                    reached.update(dict.fromkeys(self.closure(node)))
+            reached_sets.append(list(reached))
+        return reached_sets
+
+    def _closures(self) -> Dict[Hashable, Tuple[Hashable, ...]]:
+        if self.graph.is_view:
+            return {}
+        return self.graph._reachability_cache((self.direction, self.edge_types))
+
+    def _search(self, nodes: List[Hashable], closures: Dict, max_depth: Optional[int] = None) -> Dict[Hashable, None]:
+        reached = dict.fromkeys(nodes)
+        frontier = list(reached)
+        depth = 0
+        while frontier and (max_depth is None or depth < max_depth):
+            next_frontier = []
+            for node in frontier:
+                for neighbor in self.neighbors(node):
+                    if neighbor in reached:
+                        continue
+                    if neighbor in closures:
+                        # the whole closure is known, so do not expand it again
+                        reached.update(dict.fromkeys(closures[neighbor]))
+                        continue
+                    reached[neighbor] = None
+                    next_frontier.append(neighbor)
+            frontier = next_frontier
+            depth += 1
+        return reached
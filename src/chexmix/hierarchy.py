@@ -1,12 +1,221 @@
+import json
 import logging
+import os
 from abc import ABC, abstractmethod
+from collections import deque
+from collections.abc import MutableSet
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass, field
-from typing import Any, List, Set
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
-from chexmix import types, utils
+import numpy as np
+import pandas as pd
+
+from chexmix import stats, types, utils
+from chexmix.bitmap import Bitmap
+from chexmix.graph.export import open_text
+from chexmix.name_index import SUBSTRING, NameIndex
+from chexmix.storage import decode_column, decode_columns, encode_column, encode_columns, load_blocks, save_blocks
 
 log = logging.getLogger(__name__)
 
+# number of cells of the (node, year) count blocks of parallel attach_publications
+YEAR_BLOCK_CELLS = 2 ** 20
+
+
+def _publication_key(publ: types.PubTator) -> types.PubTator:
+    # publications are equal as tuples, as in sets of publications. mentions are often lists, which can not be hashed
+    if isinstance(publ.mentions, list):
+        return publ._replace(mentions=tuple(publ.mentions))
+    return publ
+
+
+class PublicationRegistry:
+    """Interns publications to dense integer ids. Publications are the same if they are equal as tuples."""
+
+    def __init__(self):
+        self._ids: Dict[types.PubTator, int] = {}
+        # publications by integer id. None for saved publications that are not decoded yet (see `publication`)
+        self.publications: List[Optional[types.PubTator]] = []
+        self._year_list: List[int] = []
+        self._years = np.zeros(0, dtype=np.int64)
+        self._saved: Dict[int, Tuple[Sequence, int]] = {}  # integer id -> saved publications, position
+        # publication id -> integer ids of saved publications, to decode them before a publication of the id is found
+        self._saved_ids: Dict[Any, List[int]] = {}
+        self._publ_ids = set()  # publication ids of all registered publications
+
+    def __len__(self):
+        return len(self.publications)
+
+    def _decode_saved(self, publ_id):
+        for idx in self._saved_ids.pop(publ_id, ()):
+            self.publication(idx)
+
+    def intern(self, publ: types.PubTator) -> int:
+        """
+        get the integer id of a publication, registering it if it is new
+        :param publ:
+        :return:
+        """
+        key = _publication_key(publ)
+        idx = self._ids.get(key)
+        if idx is None and publ.id in self._saved_ids:
+            self._decode_saved(publ.id)
+            idx = self._ids.get(key)
+        if idx is None:
+            idx = self._ids[key] = len(self.publications)
+            self.publications.append(publ)
+            self._year_list.append(-1 if publ.year is None else int(publ.year))
+            self._publ_ids.add(publ.id)
+        return idx
+
+    def intern_saved(self, publ_ids: Sequence, years: Sequence[int], publs: Sequence[types.PubTator]) -> np.ndarray:
+        """
+        get the integer ids of saved publications, registering the ones of new publication ids without decoding them
+        :param publ_ids: publication ids
+        :param years: publication years, -1 for publications without a year
+        :param publs: publications, decoded on first access
+        :return:
+        """
+        ret = np.zeros(len(publ_ids), dtype=np.int64)
+        for pos, (publ_id, year) in enumerate(zip(publ_ids, years)):
+            if publ_id in self._publ_ids:
+                # a publication of the id is registered already, so the saved one is compared with it
+                ret[pos] = self.intern(publs[pos])
+                continue
+            idx = ret[pos] = len(self.publications)
+            self.publications.append(None)
+            self._year_list.append(year)
+            self._saved[idx] = (publs, pos)
+            self._saved_ids.setdefault(publ_id, []).append(idx)
+            self._publ_ids.add(publ_id)
+        return ret
+
+    def lookup(self, publ: types.PubTator) -> Optional[int]:
+        """
+        get the integer id of a publication without registering it
+        :param publ:
+        :return: None if the publication is not registered
+        """
+        key = _publication_key(publ)
+        idx = self._ids.get(key)
+        if idx is None and publ.id in self._saved_ids:
+            self._decode_saved(publ.id)
+            idx = self._ids.get(key)
+        return idx
+
+    def publication(self, idx: int) -> types.PubTator:
+        """
+        get a publication by integer id
+        :param idx:
+        :return:
+        """
+        publ = self.publications[idx]
+        if publ is None:
+            publs, pos = self._saved.pop(idx)
+            publ = self.publications[idx] = publs[pos]
+            self._ids[_publication_key(publ)] = idx
+        return publ
+
+    def years(self) -> np.ndarray:
+        """
+        get the years of publications by integer id, -1 for publications without a year
+        :return:
+        """
+        if len(self._years) < len(self._year_list):
+            self._years = np.concatenate([self._years, np.array(self._year_list[len(self._years):], dtype=np.int64)])
+        return self._years
+
+
+# registry to share between hierarchies whose publications are combined often, if it is passed to them. hierarchies
+# have registries of their own by default, so publications are not kept after their hierarchies are gone
+default_registry = PublicationRegistry()
+
+
+class PublicationSet(MutableSet):
+    """
+    set of publications stored as a bitmap of their interned integer ids. sets of a hierarchy share its registry, and
+    a set without one has a registry of its own
+    """
+
+    __slots__ = ('registry', 'bitmap')
+
+    def __init__(self, publs: Iterable[types.PubTator] = (), registry: Optional[PublicationRegistry] = None):
+        self.registry = PublicationRegistry() if registry is None else registry
+        self.bitmap = Bitmap()
+        if not (isinstance(publs, tuple) and len(publs) == 0):
+            self.update(publs)
+
+    @classmethod
+    def _from_bitmap(cls, bitmap: Bitmap, registry: PublicationRegistry) -> 'PublicationSet':
+        publ_set = cls.__new__(cls)
+        publ_set.registry = registry
+        publ_set.bitmap = bitmap
+        return publ_set
+
+    def _bitmap_of(self, other, intern=True) -> Bitmap:
+        if isinstance(other, PublicationSet) and other.registry is self.registry:
+            return other.bitmap
+        if intern:
+            return Bitmap(self.registry.intern(publ) for publ in other)
+        # publications that are not registered are in no set of the registry
+        return Bitmap(idx for idx in map(self.registry.lookup, other) if idx is not None)
+
+    def add(self, value: types.PubTator):
+        self.bitmap.add(self.registry.intern(value))
+
+    def discard(self, value: types.PubTator):
+        idx = self.registry.lookup(value)
+        if idx is not None:
+            self.bitmap.discard(idx)
+
+    def update(self, publs: Iterable[types.PubTator]):
+        if isinstance(publs, PublicationSet) and publs.registry is self.registry:
+            self.bitmap.update(publs.bitmap)
+        else:
+            self.bitmap.update(self.registry.intern(publ) for publ in publs)
+
+    def __contains__(self, value) -> bool:
+        idx = self.registry.lookup(value) if isinstance(value, types.PubTator) else None
+        return idx is not None and idx in self.bitmap
+
+    def __iter__(self) -> Iterator[types.PubTator]:
+        registry = self.registry
+        return (registry.publication(idx) for idx in self.bitmap)
+
+    def __len__(self) -> int:
+        return len(self.bitmap)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, PublicationSet) and other.registry is self.registry:
+            return self.bitmap == other.bitmap
+        return super().__eq__(other)
+
+    __hash__ = None
+
+    def __or__(self, other) -> 'PublicationSet':
+        return PublicationSet._from_bitmap(self.bitmap | self._bitmap_of(other), self.registry)
+
+    def __and__(self, other) -> 'PublicationSet':
+        return PublicationSet._from_bitmap(self.bitmap & self._bitmap_of(other, intern=False), self.registry)
+
+    def __sub__(self, other) -> 'PublicationSet':
+        return PublicationSet._from_bitmap(self.bitmap - self._bitmap_of(other, intern=False), self.registry)
+
+    def union_len(self, other) -> int:
+        """
+        count the publications in any of the sets without building their union
+        :param other:
+        :return:
+        """
+        return self.bitmap.union_len(self._bitmap_of(other))
+
+    def copy(self) -> 'PublicationSet':
+        return PublicationSet._from_bitmap(self.bitmap.copy(), self.registry)
+
+    def __repr__(self):
+        return f'PublicationSet(<{len(self)} publications>)'
+
 
 @dataclass(frozen=True)
 class Node:
@@ -15,8 +224,8 @@ class Node:
     entity: Any  # TODO: this should be entity
     parents: List['Node'] = field(default_factory=list)
     children: List['Node'] = field(default_factory=list)
-    publications: Set[types.PubTator] = field(default_factory=set)
-    subpublications: Set[types.PubTator] = field(default_factory=set)  # publications of descendants
+    publications: PublicationSet = field(default_factory=PublicationSet)
+    subpublications: PublicationSet = field(default_factory=PublicationSet)  # publications of descendants
 
     def __repr__(self):
         return (
@@ -28,7 +237,71 @@ class Node:
         )
 
 
+class TreeNode:
+    """
+    node of a tree hierarchy, with one parent at most. it is slotted, and its children and publication containers
+    are created on first use, so millions of nodes (ex. the NCBI taxonomy) take a fraction of the memory of `Node`
+    """
+
+    __slots__ = ('id', 'name', 'entity', 'parent', 'registry', '_children', '_publications', '_subpublications')
+
+    def __init__(self, _id, name, entity, parent=None, registry=None):
+        self.id = _id
+        self.name = name
+        self.entity = entity
+        self.parent = parent
+        self.registry = registry  # registry of the publication sets
+        self._children = None
+        self._publications = None
+        self._subpublications = None
+
+    @property
+    def parents(self):
+        return [] if self.parent is None else [self.parent]
+
+    @property
+    def children(self):
+        return () if self._children is None else self._children
+
+    def add_child(self, node):
+        if self._children is None:
+            self._children = []
+        self._children.append(node)
+
+    @property
+    def publications(self):
+        if self._publications is None:
+            self._publications = PublicationSet(registry=self.registry)
+        return self._publications
+
+    @property
+    def subpublications(self):
+        if self._subpublications is None:
+            self._subpublications = PublicationSet(registry=self.registry)
+        return self._subpublications
+
+    def __repr__(self):
+        return (
+            f'TreeNode(id={self.id!r}, name={self.name!r}, entity={self.entity!r}, '
+            f'parent={None if self.parent is None else self.parent.id!r}, '
+            f'children=[...{len(self.children)} children], '
+            f'publications=[...{len(self.publications)} publications], '
+            f'subpublications=[...{len(self.subpublications)} subpublications])'
+        )
+
+
 class Hierarchy(ABC):
+    def __init__(self, registry: Optional[PublicationRegistry] = None):
+        # registry of the publications of nodes. pass `default_registry` to share it with other hierarchies
+        self.registry = PublicationRegistry() if registry is None else registry
+        self._name_indexes = {}
+        # (publications, subpublications, total publications) by node id, dropped when publications are attached
+        self._counts = {}
+        # counts of total publications by year since first_year, by node id. years before are never attached
+        self._year_counts: Dict[Any, np.ndarray] = {}
+        self.first_year = None
+        self.last_year = None
+
     @property
     @abstractmethod
     def node_type(self):
@@ -48,64 +321,710 @@ class Hierarchy(ABC):
     def get_node(self, _id):
         pass
 
-    def get_nodes_by_name(self, name):
-        return [n for n in self.nodes if n.name is not None and name in n.name]
+    def synonyms(self, node):
+        """
+        get the other names of a node to search by (ex. MeSH entry terms)
+        :param node:
+        :return:
+        """
+        return []
+
+    def name_index(self, synonyms=False):
+        """
+        get the index of node names, built on first use and again after nodes are added
+        :param synonyms: if True, index the synonyms of nodes too
+        :return: name index, node of each indexed name
+        """
+        if synonyms not in self._name_indexes:
+            names, indexed_nodes = [], []
+            for n in self.nodes:
+                node_names = [n.name] if n.name is not None else []
+                if synonyms:
+                    node_names.extend(self.synonyms(n))
+                names.extend(node_names)
+                indexed_nodes.extend([n] * len(node_names))
+            self._name_indexes[synonyms] = (NameIndex(names), indexed_nodes)
+        return self._name_indexes[synonyms]
+
+    def get_nodes_by_name(self, name, match=SUBSTRING, ignore_case=False, synonyms=False):
+        """
+        find nodes by name, ranked by the number of publications of the nodes and their descendants
+        :param name:
+        :param match: "substring", "prefix" or "exact"
+        :param ignore_case:
+        :param synonyms: if True, match the synonyms of nodes too
+        :return:
+        """
+        index, indexed_nodes = self.name_index(synonyms)
+        found = {}
+        for pos in index.search(name, match, ignore_case):
+            found.setdefault(indexed_nodes[pos].id, indexed_nodes[pos])
+        # sorted is stable, so nodes with as many publications keep their order
+        return sorted(found.values(), key=lambda n: n.publications.union_len(n.subpublications), reverse=True)
 
     @abstractmethod
     def add_nodes(self, entities):
         pass
 
-    def attach_publication(self, publ):
+    @abstractmethod
+    def _restore_node(self, _id, name, entity):
+        """
+        add a node of a saved hierarchy, without its links
+        :param _id:
+        :param name:
+        :param entity:
+        :return: node
+        """
+
+    @abstractmethod
+    def _restore_links(self, node, parents, children):
+        """
+        link a node of a saved hierarchy to its parents and children, in their saved order
+        :param node:
+        :param parents:
+        :param children:
+        :return:
+        """
+
+    def _state_columns(self):
+        """
+        get the state of the hierarchy besides its nodes, links and publications to save (ex. MeSH entry terms)
+        :return: columns by name
+        """
+        return {}
+
+    def _restore_state(self, columns, nodes):
+        """
+        restore the state saved from `_state_columns`
+        :param columns: columns by name
+        :param nodes: restored nodes, in saved order
+        :return:
+        """
+
+    @staticmethod
+    def _publication_bitmaps(node):
+        # without creating the publication sets of tree nodes, which are created on first use
+        if isinstance(node, TreeNode):
+            return tuple(
+                Bitmap() if publs is None else publs.bitmap
+                for publs in (node._publications, node._subpublications)  # pylint: disable=protected-access
+            )
+        return node.publications.bitmap, node.subpublications.bitmap
+
+    def save(self, path):
+        """
+        save the hierarchy and its attached publications to a single file: node columns, links and the publications
+        of nodes as arrays, and the attached publications themselves. `load` memory-maps the arrays
+        :param path:
+        :return:
+        """
+        nodes = self.nodes
+        positions = {n.id: pos for pos, n in enumerate(nodes)}
+        node_columns = {
+            'id': [n.id for n in nodes],
+            'name': [n.name for n in nodes],
+            'entity': [n.entity for n in nodes],
+        }
+        blocks, node_kinds = encode_columns('node', node_columns, {})
+        for name, node_lists in [('parent', [n.parents for n in nodes]), ('child', [n.children for n in nodes])]:
+            blocks[f'{name}_ptr'] = np.cumsum([0] + [len(ns) for ns in node_lists], dtype=np.int64)
+            blocks[f'{name}_pos'] = np.array([positions[x.id] for ns in node_lists for x in ns], dtype=np.int64)
+
+        # publications are saved once and referred to by their positions in the file
+        bitmaps = [self._publication_bitmaps(n) for n in nodes]
+        publ_arrays = {
+            'publ': [publ_bitmap.to_array() for publ_bitmap, _ in bitmaps],
+            'subpubl': [subpubl_bitmap.to_array() for _, subpubl_bitmap in bitmaps],
+        }
+        empty = np.zeros(0, dtype=np.int64)
+        publ_ids = np.unique(np.concatenate([empty] + publ_arrays['publ'] + publ_arrays['subpubl']))
+        for name, arrays in publ_arrays.items():
+            blocks[f'{name}_ptr'] = np.cumsum([0] + [len(ids) for ids in arrays], dtype=np.int64)
+            blocks[f'{name}_ids'] = np.searchsorted(publ_ids, np.concatenate([empty] + arrays))
+        publs = [self.registry.publication(idx) for idx in publ_ids.tolist()]
+        publ_kind, publ_parts = encode_column(publs)
+        blocks.update({f'publication/{part}': array for part, array in publ_parts.items()})
+        publ_id_kind, publ_id_parts = encode_column([publ.id for publ in publs])
+        blocks.update({f'publication_id/{part}': array for part, array in publ_id_parts.items()})
+        blocks['publication_year'] = self.registry.years()[publ_ids]
+
+        year_nodes = [n for n in nodes if n.id in self._year_counts]
+        n_years = 0 if self.first_year is None else self.last_year - self.first_year + 1
+        blocks['year_nodes'] = np.array([positions[n.id] for n in year_nodes], dtype=np.int64)
+        blocks['year_counts'] = np.zeros((len(year_nodes), n_years), dtype=np.int64)
+        for row, n in enumerate(year_nodes):
+            counts = self._year_counts[n.id]
+            blocks['year_counts'][row, : len(counts)] = counts
+
+        state_blocks, state_kinds = encode_columns('state', self._state_columns(), {})
+        blocks.update(state_blocks)
+        meta = {
+            'layout': 'hierarchy',
+            'class': type(self).__name__,
+            'node_columns': node_kinds,
+            'publication': publ_kind,
+            'publication_id': publ_id_kind,
+            'state_columns': state_kinds,
+            'first_year': self.first_year,
+            'last_year': self.last_year,
+        }
+        save_blocks(path, blocks, meta)
+
+    @classmethod
+    def load(cls, path, mmap=True, registry=None):
+        """
+        load a hierarchy saved by `save`. its publications are interned again, so they can be combined with the
+        publications of other hierarchies of the registry
+        :param path:
+        :param mmap: if True, memory-map the arrays instead of reading them
+        :param registry: registry of the publications of nodes, a new one if None
+        :return:
+        """
+        blocks, meta = load_blocks(path, mmap)
+        if meta.get('layout') != 'hierarchy' or meta.get('class') != cls.__name__:
+            raise ValueError(f'{path} is not a {cls.__name__} file')
+        hierarchy = cls(registry=registry)
+        node_columns, _ = decode_columns('node', blocks, meta['node_columns'])
+        nodes = [
+            hierarchy._restore_node(_id, name, entity)
+            for _id, name, entity in zip(*[node_columns[key].tolist() for key in ('id', 'name', 'entity')])
+        ]
+        parent_ptr, parent_pos = blocks['parent_ptr'].tolist(), blocks['parent_pos'].tolist()
+        child_ptr, child_pos = blocks['child_ptr'].tolist(), blocks['child_pos'].tolist()
+        for pos, node in enumerate(nodes):
+            hierarchy._restore_links(
+                node,
+                [nodes[x] for x in parent_pos[parent_ptr[pos]:parent_ptr[pos + 1]]],
+                [nodes[x] for x in child_pos[child_ptr[pos]:child_ptr[pos + 1]]],
+            )
+
+        # publications are decoded when they are iterated, not to load a hierarchy
+        publ_parts, publ_id_parts = {}, {}
+        for name, array in blocks.items():
+            if name.startswith('publication/'):
+                publ_parts[name[len('publication/'):]] = array
+            elif name.startswith('publication_id/'):
+                publ_id_parts[name[len('publication_id/'):]] = array
+        registry_ids = hierarchy.registry.intern_saved(
+            decode_column(meta['publication_id'], publ_id_parts).tolist(),
+            blocks['publication_year'].tolist(),
+            decode_column(meta['publication'], publ_parts),
+        )
+        for name in ('publ', 'subpubl'):
+            ptr, ids = np.array(blocks[f'{name}_ptr']), registry_ids[blocks[f'{name}_ids']]
+            for pos in np.flatnonzero(np.diff(ptr)).tolist():
+                node_publs = nodes[pos].publications if name == 'publ' else nodes[pos].subpublications
+                node_publs.bitmap.update(ids[ptr[pos]:ptr[pos + 1]])
+
+        hierarchy.first_year, hierarchy.last_year = meta['first_year'], meta['last_year']
+        year_counts = np.array(blocks['year_counts'])  # copied, since counts are added in place
+        for row, pos in enumerate(blocks['year_nodes'].tolist()):
+            hierarchy._year_counts[nodes[pos].id] = year_counts[row]
+
+        state_columns, _ = decode_columns('state', blocks, meta['state_columns'])
+        hierarchy._restore_state(state_columns, nodes)
+        return hierarchy
+
+    def _warn_not_found(self, entity_id):
+        prefix = {
+            types.MeSH: 'MESH',
+            types.Taxonomy: 'TAXO',
+        }[self.node_type]
+
+        if entity_id.startswith(prefix):
+            log.warning(f'{entity_id} is not found.')
+
+    def _mentioned_nodes(self, publ):
         mentioned_ids = set(m.entity.id for m in publ.mentions if m.entity is not None)
 
+        nodes = []
         for entity_id in mentioned_ids:
             try:
                 node = self.get_node(entity_id)
             except KeyError:
-                prefix = {
-                    types.MeSH: 'MESH',
-                    types.Taxonomy: 'TAXO',
-                }[self.node_type]
-
-                if entity_id.startswith(prefix):
-                    log.warning(f'{entity_id} is not found.')
+                self._warn_not_found(entity_id)
                 continue
+            nodes.append(node)
+        return nodes
+
+    def _id_aliases(self):
+        """
+        get the other ids `get_node` accepts (ex. MeSH tree numbers)
+        :return: node id by alias
+        """
+        return {}
+
+    @staticmethod
+    def _unique_parents(node):
+        return list({p.id: p for p in node.parents}.values())
+
+    def attach_publication(self, publ):
+        self._counts = {}
+        nodes = self._mentioned_nodes(publ)
+        publ_ids = np.array([self.registry.intern(publ)], dtype=np.int64)
+        self._extend_years(publ_ids)
+        for node in nodes:
+            if publ not in node.publications and publ not in node.subpublications:
+                self._count_years(node, publ_ids)
             node.publications.add(publ)
 
-            # update subpublications for ancestor nodes
-            ancestors = list(node.parents)
+        # update subpublications for ancestor nodes, once per ancestor even if it is reached through many paths
+        ancestors = [p for node in nodes for p in node.parents]
+        visited = set()
+        while len(ancestors) > 0:
+            ancestor_node = ancestors.pop()
+            if ancestor_node.id in visited:
+                continue
+            visited.add(ancestor_node.id)
+            if publ not in ancestor_node.publications and publ not in ancestor_node.subpublications:
+                self._count_years(ancestor_node, publ_ids)
+            ancestor_node.subpublications.add(publ)
+            ancestors.extend(ancestor_node.parents)
+
+    def attach_publications(self, publs, n_jobs=1, chunk_size=100000):
+        """
+        attach publications in bulk. direct mentions are recorded first, then the new publications are pushed up to
+        the ancestors once, children before parents, so every node and edge above the mentioned nodes is visited
+        once for the whole batch, not once per path and publication. a node passes up only the publications that
+        are new to it and its descendants, and counts them by year in one vectorized pass.
+        :param publs:
+        :param n_jobs: number of worker processes. 1 attaches in this process, and None uses every CPU
+        :param chunk_size: number of publications per worker task, if n_jobs is not 1
+        :return:
+        """
+        if n_jobs != 1:
+            self._attach_publications_parallel(publs, n_jobs or os.cpu_count() or 1, chunk_size)
+            return
+        self._counts = {}
+        # new publications by node id, of the node itself and of its descendants
+        direct, carried = {}, {}
+        nodes = {}
+        for publ in publs:
+            for node in self._mentioned_nodes(publ):
+                nodes[node.id] = node
+                direct.setdefault(node.id, PublicationSet(registry=self.registry)).add(publ)
+
+        # number of children of each affected ancestor that are affected too
+        pending_children = {}
+        stack = list(nodes.values())
+        while len(stack) > 0:
+            node = stack.pop()
+            for p in self._unique_parents(node):
+                pending_children[p.id] = pending_children.get(p.id, 0) + 1
+                if p.id not in nodes:
+                    nodes[p.id] = p
+                    stack.append(p)
+
+        # reverse topological order: a node is pushed up once all of its affected children are
+        ready = [node for node_id, node in nodes.items() if pending_children.get(node_id, 0) == 0]
+        direct_ids = [publs.bitmap.to_array() for publs in direct.values()]
+        self._extend_years(np.concatenate(direct_ids) if len(direct_ids) > 0 else np.zeros(0, dtype=np.int64))
+        while len(ready) > 0:
+            node = ready.pop()
+            # publications already in the total of a node are in the totals of its ancestors too
+            has_publs = bool(node.publications.bitmap) or bool(node.subpublications.bitmap)
+            new_publs = None
+            node_publs, sub_publs = direct.pop(node.id, None), carried.pop(node.id, None)
+            if node_publs is not None:
+                new_publs = node_publs - node.publications - node.subpublications if has_publs else node_publs
+                node.publications.update(node_publs)
+            if sub_publs is not None:
+                new_sub_publs = sub_publs - node.subpublications - node.publications if has_publs else sub_publs
+                new_publs = new_sub_publs if new_publs is None else new_publs | new_sub_publs
+                node.subpublications.update(sub_publs)
+            if new_publs is not None and not new_publs.bitmap:
+                new_publs = None
+            if new_publs is not None:
+                self._count_years(node, new_publs.bitmap.to_array())
+            for p in self._unique_parents(node):
+                if new_publs is not None and p.id in carried:
+                    carried[p.id].update(new_publs)
+                elif new_publs is not None:
+                    carried[p.id] = new_publs.copy()
+                pending_children[p.id] -= 1
+                if pending_children[p.id] == 0:
+                    ready.append(p)
+
+    def _attach_publications_parallel(self, publs, n_jobs, chunk_size):
+        # map: workers resolve the mentions of a chunk and push them up a copy of the hierarchy structure.
+        # reduce: workers merge the results two at a time, and the last one is merged into the hierarchy here
+        self._counts = {}
+        parents = {n.id: tuple(p.id for p in self._unique_parents(n)) for n in self.nodes}
+        with ProcessPoolExecutor(n_jobs, initializer=_init_attach_worker, initargs=(parents, self._id_aliases())) as ex:
+            futures = deque()
+            for chunk in utils.iter_grouper(chunk_size, publs):
+                tasks = [
+                    (self.registry.intern(publ), [m.entity.id for m in publ.mentions if m.entity is not None])
+                    for publ in chunk
+                ]
+                self._extend_years(np.array([publ_idx for publ_idx, _ in tasks], dtype=np.int64))
+                futures.append(ex.submit(_attach_chunk, tasks))
+                if len(futures) >= 2 * n_jobs:
+                    futures.append(ex.submit(_merge_attached, futures.popleft().result(), futures.popleft().result()))
+            while len(futures) > 1:
+                futures.append(ex.submit(_merge_attached, futures.popleft().result(), futures.popleft().result()))
+            if len(futures) > 0:
+                self._apply_attached(futures.popleft().result())
+
+    def _apply_attached(self, attached):
+        node_ids, publ_ptr, publ_ids, subpubl_ptr, subpubl_ids, total_ptr, total_ids, not_found = attached
+        for entity_id in not_found:
+            self._warn_not_found(entity_id)
+        nodes = [self.get_node(node_id) for node_id in node_ids]
+        # all publications are new to nodes without any, and their years are counted at once below
+        is_new = np.array([not (n.publications.bitmap or n.subpublications.bitmap) for n in nodes], dtype=bool)
+        for pos, node in enumerate(nodes):
+            if not is_new[pos]:
+                new_bitmap = Bitmap(total_ids[total_ptr[pos]:total_ptr[pos + 1]])
+                new_bitmap = new_bitmap - node.publications.bitmap - node.subpublications.bitmap
+                self._count_years(node, new_bitmap.to_array())
+            if publ_ptr[pos] < publ_ptr[pos + 1]:
+                node.publications.bitmap.update(publ_ids[publ_ptr[pos]:publ_ptr[pos + 1]])
+            if subpubl_ptr[pos] < subpubl_ptr[pos + 1]:
+                node.subpublications.bitmap.update(subpubl_ids[subpubl_ptr[pos]:subpubl_ptr[pos + 1]])
+        self._count_years_by_node(nodes, total_ptr, total_ids, is_new)
+
+    def _extend_years(self, publ_ids):
+        years = self.registry.years()[publ_ids]
+        years = years[years >= 0]
+        if len(years) == 0:
+            return
+        first_year, last_year = int(years.min()), int(years.max())
+        if self.first_year is None:
+            self.first_year = self.last_year = first_year
+        if first_year < self.first_year:
+            shift = self.first_year - first_year
+            self._year_counts = {_id: np.pad(c, (shift, 0)) for _id, c in self._year_counts.items()}
+            self.first_year = first_year
+        self.last_year = max(self.last_year, last_year)
+
+    def _count_years(self, node, publ_ids):
+        # years of the publications are within [first_year, last_year] once they are passed to _extend_years
+        if self.first_year is None or len(publ_ids) == 0:
+            return
+        slots = self.registry.years()[publ_ids] - self.first_year
+        self._add_year_counts(node, np.bincount(slots[slots >= 0], minlength=self.last_year - self.first_year + 1))
+
+    def _count_years_by_node(self, nodes, ptr, publ_ids, mask):
+        # one bincount over (node, year) pairs per block of nodes, for the nodes in the mask
+        if self.first_year is None:
+            return
+        n_years = self.last_year - self.first_year + 1
+        block_size = max(YEAR_BLOCK_CELLS // n_years, 1)
+        slots = self.registry.years()[publ_ids] - self.first_year
+        owners = np.repeat(np.arange(len(nodes)), np.diff(ptr))
+        keep = (slots >= 0) & mask[owners]
+        slots, owners = slots[keep], owners[keep]
+        for start in range(0, len(nodes), block_size):
+            in_block = (owners >= start) & (owners < start + block_size)
+            counts = np.bincount(
+                (owners[in_block] - start) * n_years + slots[in_block], minlength=block_size * n_years
+            ).reshape(block_size, n_years)
+            for pos in np.flatnonzero(counts.any(axis=1)).tolist():
+                self._add_year_counts(nodes[start + pos], counts[pos].copy())
+
+    def _add_year_counts(self, node, counts):
+        node_counts = self._year_counts.get(node.id)
+        if node_counts is None:
+            self._year_counts[node.id] = counts
+            return
+        if len(node_counts) < len(counts):
+            node_counts = np.pad(node_counts, (0, len(counts) - len(node_counts)))
+        node_counts += counts
+        self._year_counts[node.id] = node_counts
 
-            while len(ancestors) > 0:
-                ancestor_node = ancestors.pop()
-                ancestor_node.subpublications.add(publ)
-                ancestors.extend(ancestor_node.parents)
+    def year_histogram(self, node, start=None, end=None):
+        """
+        count the publications of a node and its descendants by year. publications without a year are left out
+        :param node:
+        :param start: first year, inclusive. the first year of attached publications by default
+        :param end: last year, inclusive. the last year of attached publications by default
+        :return: years, counts
+        """
+        first_year, last_year = (0, -1) if self.first_year is None else (self.first_year, self.last_year)
+        start = first_year if start is None else start
+        end = last_year if end is None else end
+        years = np.arange(start, end + 1)
+        counts = np.zeros(len(years), dtype=np.int64)
+        node_counts = self._year_counts.get(node.id)
+        if node_counts is not None:
+            # overlap of the requested years and the years the node has counts for
+            low, high = max(start, first_year), min(end, first_year + len(node_counts) - 1)
+            if low <= high:
+                counts[low - start: high - start + 1] = node_counts[low - first_year: high - first_year + 1]
+        return years, counts
+
+    def count_publications(self, node, start=None, end=None):
+        """
+        count the publications of a node and its descendants in a range of years
+        :param node:
+        :param start: first year, inclusive
+        :param end: last year, inclusive
+        :return:
+        """
+        return int(self.year_histogram(node, start, end)[1].sum())
+
+    def publication_counts(self, node):
+        """
+        get the numbers of publications of a node, cached until publications are attached again
+        :param node:
+        :return: publications, subpublications, total publications (publications of the node or its descendants)
+        """
+        counts = self._counts.get(node.id)
+        if counts is None:
+            counts = self._counts[node.id] = (
+                len(node.publications),
+                len(node.subpublications),
+                node.publications.union_len(node.subpublications),
+            )
+        return counts
+
+    def _lookup_publications(self, publs):
+        # the publications are looked up, not interned, so the registry does not grow by every query. publications
+        # that are not registered are in no node, and are only counted
+        if isinstance(publs, PublicationSet) and publs.registry is self.registry:
+            return publs.bitmap, set()
+        ids, unregistered = [], set()
+        for publ in publs:
+            idx = self.registry.lookup(publ)
+            if idx is None:
+                unregistered.add(_publication_key(publ))
+            else:
+                ids.append(idx)
+        return Bitmap(ids), unregistered
+
+    def enrichment(self, publs, background=None, correction=stats.FDR_BH, min_count=1):
+        """
+        score every node by the over-representation of its publications among publications of interest (ex. the
+        publications of a keyword) against a background, by the hypergeometric test (one-sided Fisher's exact test).
+        nodes are counted by their total publications, and all nodes with background publications are tested at once
+        :param publs: publications of interest
+        :param background: background publications. all publications attached to the hierarchy by default
+        :param correction: "fdr_bh" (Benjamini-Hochberg), "bonferroni" or None
+        :param min_count: leave out nodes with fewer publications of interest (after the correction)
+        :return: data frame of id, name, count, background_count, fold_change, p_value and adjusted_p_value by node,
+         sorted by p-value
+        """
+        nodes = [n for n in self.nodes if self.publication_counts(n)[2] > 0]
+        totals = []
+        for n in nodes:
+            publications, subpublications = self._publication_bitmaps(n)
+            totals.append(publications | subpublications)
+        background_unregistered = set()
+        if background is None:
+            # every attached publication is a publication of a root or of its descendants
+            background_bitmap = Bitmap()
+            for publications, subpublications in map(self._publication_bitmaps, self.roots):
+                background_bitmap |= publications
+                background_bitmap |= subpublications
+            background_counts = np.array([self.publication_counts(n)[2] for n in nodes], dtype=np.int64)
+        else:
+            background_bitmap, background_unregistered = self._lookup_publications(background)
+            background_counts = np.array(
+                [total.intersection_len(background_bitmap) for total in totals], dtype=np.int64
+            )
+        publ_bitmap, publ_unregistered = self._lookup_publications(publs)
+        publ_bitmap = publ_bitmap & background_bitmap
+        counts = np.array([total.intersection_len(publ_bitmap) for total in totals], dtype=np.int64)
 
-    def attach_publications(self, publs):
-        for p in publs:
-            self.attach_publication(p)
+        n_publications = len(publ_bitmap) + len(publ_unregistered & background_unregistered)
+        n_background = len(background_bitmap) + len(background_unregistered)
+        fold_changes, p_values, adjusted = stats.over_representation(
+            counts, background_counts, n_publications, n_background, correction
+        )
+        ret = pd.DataFrame({
+            'id': [n.id for n in nodes],
+            'name': [n.name for n in nodes],
+            'count': counts,
+            'background_count': background_counts,
+            'fold_change': fold_changes,
+            'p_value': p_values,
+            'adjusted_p_value': adjusted,
+        })
+        ret = ret[ret['count'] >= min_count]
+        return ret.sort_values(['p_value', 'fold_change'], ascending=[True, False], kind='stable', ignore_index=True)
 
-    def _nodes2dict(self, nodes, sort_by):
+    def _export_children(self, nodes, sort_by, min_publications, top_k):
+        if min_publications > 0:
+            nodes = [n for n in nodes if self.publication_counts(n)[2] >= min_publications]
         if sort_by is not None:
             sort_key = {
-                'publications': lambda n: len(n.publications),
-                'subpublications': lambda n: len(n.subpublications),
-                'total_publications': lambda n: len(n.publications | n.subpublications),
+                'publications': lambda n: self.publication_counts(n)[0],
+                'subpublications': lambda n: self.publication_counts(n)[1],
+                'total_publications': lambda n: self.publication_counts(n)[2],
                 'name': lambda n: n.name or n.id,
                 'id': lambda n: n.id,
             }[sort_by]
             nodes = sorted(nodes, key=sort_key, reverse=True)
+        return nodes if top_k is None else nodes[:top_k]
+
+    def _export_keys(self, sort_by, min_publications, max_depth, top_k):
+        # depth first, without recursion: the key of a node opens its children, and None closes them
+        stack = [iter(self._export_children(self.roots, sort_by, min_publications, top_k))]
+        while len(stack) > 0:
+            n = next(stack[-1], None)
+            if n is None:
+                stack.pop()
+                yield None
+                continue
+            publications, _, total_publications = self.publication_counts(n)
+            yield f'{n.name} ({publications}/{total_publications})'
+            if max_depth is not None and len(stack) > max_depth:
+                children = []
+            else:
+                children = self._export_children(n.children, sort_by, min_publications, top_k)
+            stack.append(iter(children))
+
+    def to_dict(self, sort_by=None, min_publications=0, max_depth=None, top_k=None):
+        """
+        export the hierarchy as nested dicts of "name (publications/total publications)"
+        :param sort_by: "publications", "subpublications", "total_publications", "name" or "id", in descending order
+        :param min_publications: leave out nodes with fewer total publications
+        :param max_depth: leave out nodes deeper than this (roots are at depth 0)
+        :param top_k: keep this many children of a node at most, after sorting
+        :return:
+        """
         ret = {}
-        for n in nodes:
-            node_name = f'{n.name} ({len(n.publications)}/{(len(n.publications | n.subpublications))})'
-            ret[node_name] = self._nodes2dict(n.children, sort_by)
+        stack = [ret]
+        for key in self._export_keys(sort_by, min_publications, max_depth, top_k):
+            if key is None:
+                stack.pop()
+            else:
+                stack[-1][key] = {}
+                stack.append(stack[-1][key])
         return ret
 
-    def to_dict(self, sort_by=None):
-        return self._nodes2dict(self.roots, sort_by)
+    def write_json(self, path_or_file, sort_by=None, min_publications=0, max_depth=None, top_k=None):
+        """
+        stream `to_dict` to a JSON file node by node, without building the nested dicts
+        :param path_or_file: file path or text file object
+        :param sort_by:
+        :param min_publications:
+        :param max_depth:
+        :param top_k:
+        :return:
+        """
+        with open_text(path_or_file) as f:
+            f.write('{')
+            is_first = [True]
+            for key in self._export_keys(sort_by, min_publications, max_depth, top_k):
+                if key is None:
+                    f.write('}')
+                    is_first.pop()
+                    continue
+                f.write(('' if is_first[-1] else ', ') + json.dumps(key, ensure_ascii=False) + ': {')
+                is_first[-1] = False
+                is_first.append(True)
+            f.write('\n')
+
+
+# hierarchy structure of an attach_publications worker process: parent ids by node id, node id by alias
+_attach_worker_state = ({}, {})
+
+
+def _init_attach_worker(parents, aliases):
+    global _attach_worker_state  # pylint: disable=global-statement
+    _attach_worker_state = (parents, aliases)
+
+
+def _to_csr(node_ids, pos, ids_by_node):
+    # (owner positions, ids) pairs to sorted unique ids per node, as offsets and one array
+    empty = np.zeros(0, dtype=np.int64)
+    owners = np.concatenate([empty] + [np.full(len(ids), pos[node_id], dtype=np.int64) for node_id, ids in ids_by_node])
+    ids = np.concatenate([empty] + [ids for _, ids in ids_by_node])
+    return _pairs_to_csr(len(node_ids), owners, ids)
+
+
+def _pairs_to_csr(n_nodes, owners, ids):
+    order = np.lexsort((ids, owners))
+    owners, ids = owners[order], ids[order]
+    first = np.ones(len(ids), dtype=bool)
+    first[1:] = (owners[1:] != owners[:-1]) | (ids[1:] != ids[:-1])
+    owners, ids = owners[first], ids[first]
+    return np.searchsorted(owners, np.arange(n_nodes + 1)), ids
+
+
+def _attach_chunk(tasks):
+    """
+    map step of the parallel `Hierarchy.attach_publications`, run in a worker process
+    :param tasks: integer id of each publication and the entity ids it mentions
+    :return: affected node ids, then offsets and ids of their publications, of the publications of their descendants
+     and of both, then entity ids not found
+    """
+    parents, aliases = _attach_worker_state
+    direct, not_found = {}, []
+    for publ_idx, entity_ids in tasks:
+        for entity_id in set(entity_ids):
+            node_id = entity_id if entity_id in parents else aliases.get(entity_id)
+            if node_id is None:
+                not_found.append(entity_id)
+            else:
+                direct.setdefault(node_id, []).append(publ_idx)
+
+    # the same walk as the serial path, children before parents, over id arrays
+    pending_children = {}
+    stack = list(direct)
+    node_ids = list(direct)
+    while len(stack) > 0:
+        node_id = stack.pop()
+        for parent_id in parents[node_id]:
+            if parent_id not in pending_children and parent_id not in direct:
+                node_ids.append(parent_id)
+                stack.append(parent_id)
+            pending_children[parent_id] = pending_children.get(parent_id, 0) + 1
+
+    direct = {node_id: np.unique(np.array(ids, dtype=np.int64)) for node_id, ids in direct.items()}
+    empty = np.zeros(0, dtype=np.int64)
+    subpubls, totals, carried = [], [], {}
+    ready = [node_id for node_id in node_ids if pending_children.get(node_id, 0) == 0]
+    while len(ready) > 0:
+        node_id = ready.pop()
+        parts = carried.pop(node_id, [])
+        total_ids = direct.get(node_id, empty)
+        if len(parts) > 0:
+            subpubl_ids = parts[0] if len(parts) == 1 else np.unique(np.concatenate(parts))
+            subpubls.append((node_id, subpubl_ids))
+            total_ids = np.union1d(total_ids, subpubl_ids) if len(total_ids) > 0 else subpubl_ids
+        totals.append((node_id, total_ids))
+        for parent_id in parents[node_id]:
+            carried.setdefault(parent_id, []).append(total_ids)
+            pending_children[parent_id] -= 1
+            if pending_children[parent_id] == 0:
+                ready.append(parent_id)
+
+    pos = {node_id: pos for pos, node_id in enumerate(node_ids)}
+    return (
+        node_ids,
+        *_to_csr(node_ids, pos, direct.items()),
+        *_to_csr(node_ids, pos, subpubls),
+        *_to_csr(node_ids, pos, totals),
+        not_found,
+    )
+
+
+def _merge_attached(attached1, attached2):
+    """
+    reduce step of the parallel `Hierarchy.attach_publications`, run in a worker process
+    :param attached1: result of `_attach_chunk` or `_merge_attached`
+    :param attached2: result of `_attach_chunk` or `_merge_attached`
+    :return: result with the publications of both by node
+    """
+    node_ids = list(dict.fromkeys(attached1[0] + attached2[0]))
+    pos = {node_id: pos for pos, node_id in enumerate(node_ids)}
+    merged = [node_ids]
+    for ptr_idx in (1, 3, 5):
+        owners, ids = [], []
+        for attached in (attached1, attached2):
+            positions = np.array([pos[node_id] for node_id in attached[0]], dtype=np.int64)
+            owners.append(np.repeat(positions, np.diff(attached[ptr_idx])))
+            ids.append(attached[ptr_idx + 1])
+        merged.extend(_pairs_to_csr(len(node_ids), np.concatenate(owners), np.concatenate(ids)))
+    return (*merged, attached1[7] + attached2[7])
 
 
 class TaxonomyHierarchy(Hierarchy):
-    def __init__(self, taxs=None):
+    def __init__(self, taxs=None, registry=None):
+        super().__init__(registry)
         self._tax_tbl = {}
         if taxs is not None:
             self.add_nodes(taxs)
@@ -119,13 +1038,34 @@ class TaxonomyHierarchy(Hierarchy):
         ancestor_tax_ids = set(tax_anc.id for tax in taxs for tax_anc in tax.ancestors)
         return ancestor_tax_ids - set(tax.id for tax in taxs)
 
+    @classmethod
+    def from_table(cls, table, registry=None):
+        """
+        build the hierarchy from the taxonomy table of `datasources.taxonomy.load_taxonomy`, linking nodes by their
+        parent ids. the entity of a node is its row of the table
+        :param table: taxonomy table by node id
+        :param registry: registry of the publications of nodes, a new one if None
+        :return:
+        """
+        hierarchy = cls(registry=registry)
+        tax_tbl = hierarchy._tax_tbl
+        for node_id, attr in table.items():
+            tax_tbl[node_id] = TreeNode(node_id, attr.get('name'), attr, registry=hierarchy.registry)
+        for node in tax_tbl.values():
+            parent = tax_tbl.get(node.entity.get('parent_id'))
+            # the root is its own parent in the taxonomy dump
+            if parent is not None and parent is not node:
+                node.parent = parent
+                parent.add_child(node)
+        return hierarchy
+
     @property
     def nodes(self):
         return list(self._tax_tbl.values())
 
     @property
     def roots(self):
-        return [n for n in self.nodes if len(n.parents) == 0]
+        return [n for n in self._tax_tbl.values() if n.parent is None]
 
     def get_node(self, _id):
         return self._tax_tbl[_id]
@@ -133,20 +1073,27 @@ class TaxonomyHierarchy(Hierarchy):
     def _add_node(self, tax):
         if tax.id in self._tax_tbl:
             raise Exception(f'duplicated id {tax.id}')
-        self._tax_tbl[tax.id] = Node(tax.id, tax.name, tax)
+        self._tax_tbl[tax.id] = TreeNode(tax.id, tax.name, tax, registry=self.registry)
 
     def _update_parents(self, node):
-        ancestors = node.entity.ancestors[-1:] if len(node.entity.ancestors) > 0 else []
-        for anc in ancestors:
-            if self._tax_tbl[anc.id] not in node.parents:
-                node.parents.append(self._tax_tbl[anc.id])
+        if node.parent is None and len(node.entity.ancestors) > 0:
+            node.parent = self._tax_tbl[node.entity.ancestors[-1].id]
 
     def _update_children(self, node):
-        for p in node.parents:
-            if node not in p.children:
-                p.children.append(node)
+        if node.parent is not None:
+            node.parent.add_child(node)
+
+    def _restore_node(self, _id, name, entity):
+        node = self._tax_tbl[_id] = TreeNode(_id, name, entity, registry=self.registry)
+        return node
+
+    def _restore_links(self, node, parents, children):
+        node.parent = parents[0] if len(parents) > 0 else None
+        for child in children:
+            node.add_child(child)
 
     def add_nodes(self, entities):
+        entities = list(entities)
         for tax in entities:
             assert isinstance(tax, types.Taxonomy)
             self._add_node(tax)
@@ -155,12 +1102,17 @@ class TaxonomyHierarchy(Hierarchy):
             node = self.get_node(tax.id)
             self._update_parents(node)
             self._update_children(node)
+        self._name_indexes = {}
 
 
 class MeSHHierarchy(Hierarchy):
-    def __init__(self, meshs=None):
+    def __init__(self, meshs=None, registry=None):
+        super().__init__(registry)
         self._mesh_tbl = {}
         self._tree_number2id = {}
+        self._links = set()  # (parent id, child id)
+        self._pending_children = {}  # tree number -> ids of children added before the node of the tree number
+        self._entry_terms = {}
         if meshs is not None:
             self.add_nodes(meshs)
 
@@ -201,39 +1153,109 @@ class MeSHHierarchy(Hierarchy):
     def get_node(self, _id):
         return self._mesh_tbl.get(_id) or self._mesh_tbl[self._tree_number2id[_id]]
 
-    def _add_node(self, mesh):
+    def _id_aliases(self):
+        return self._tree_number2id
+
+    def _new_node(self, _id, name, entity):
+        return Node(
+            _id,
+            name,
+            entity,
+            publications=PublicationSet(registry=self.registry),
+            subpublications=PublicationSet(registry=self.registry),
+        )
+
+    def _add_node(self, mesh, new_nodes):
         if mesh.id in self._mesh_tbl:
             return
 
-        self._mesh_tbl[mesh.id] = Node(mesh.id, mesh.name, mesh)
+        node = self._mesh_tbl[mesh.id] = self._new_node(mesh.id, mesh.name, mesh)
+        new_nodes.append(node)
         for tree_number in mesh.tree_numbers or []:
             self._tree_number2id[tree_number] = mesh.id
 
         if mesh.headings is not None:
             for heading in mesh.headings:
-                self._add_node(heading)
+                self._add_node(heading, new_nodes)
+
+    def _link(self, parent, child):
+        if (parent.id, child.id) not in self._links:
+            self._links.add((parent.id, child.id))
+            child.parents.append(parent)
+            parent.children.append(child)
 
     def _update_parents(self, node):
         mesh = node.entity
-        if mesh.tree_numbers is not None:
-            parent_tree_numbers = [
-                tree_number.rsplit('.', 1)[0] for tree_number in mesh.tree_numbers if '.' in tree_number
-            ]
-            parent_ids = set(self._tree_number2id[tree_number] for tree_number in parent_tree_numbers)
-            node.parents.extend(self._mesh_tbl[parent_id] for parent_id in parent_ids)
+        parent_ids = []
+        for tree_number in mesh.tree_numbers or []:
+            if '.' not in tree_number:
+                continue
+            parent_tree_number = tree_number.rsplit('.', 1)[0]
+            if parent_tree_number in self._tree_number2id:
+                parent_ids.append(self._tree_number2id[parent_tree_number])
+            else:
+                # the parent may come in a later batch
+                self._pending_children.setdefault(parent_tree_number, []).append(node.id)
         if mesh.headings is not None:
-            node.parents.extend(self._mesh_tbl[heading.id] for heading in mesh.headings)
+            parent_ids.extend(heading.id for heading in mesh.headings)
+        for parent_id in dict.fromkeys(parent_ids):
+            self._link(self._mesh_tbl[parent_id], node)
 
     def _update_children(self, node):
-        for p in node.parents:
-            if node not in p.children:
-                p.children.append(node)
+        # children added in earlier batches than this node
+        for tree_number in node.entity.tree_numbers or []:
+            for child_id in self._pending_children.pop(tree_number, []):
+                self._link(node, self._mesh_tbl[child_id])
 
     def add_nodes(self, entities):
+        """
+        add MeSHs and their headings. only the new nodes and their parents and children are updated, so MeSHs can
+        be added in batches, and a parent can come after its children
+        :param entities:
+        :return:
+        """
+        new_nodes = []
         for mesh in entities:
             assert isinstance(mesh, self.node_type)
-            self._add_node(mesh)
+            self._add_node(mesh, new_nodes)
 
-        for _, node in self._mesh_tbl.items():
-            self._update_parents(node)
+        for node in new_nodes:
             self._update_children(node)
+            self._update_parents(node)
+        self._name_indexes = {}
+
+    def _restore_node(self, _id, name, entity):
+        node = self._mesh_tbl[_id] = self._new_node(_id, name, entity)
+        for tree_number in entity.tree_numbers or []:
+            self._tree_number2id[tree_number] = _id
+        return node
+
+    def _restore_links(self, node, parents, children):
+        node.parents.extend(parents)
+        node.children.extend(children)
+        self._links.update((parent.id, node.id) for parent in parents)
+
+    def _state_columns(self):
+        return {
+            'pending_tree_number': list(self._pending_children),
+            'pending_children': list(self._pending_children.values()),
+            'entry_term_id': list(self._entry_terms),
+            'entry_terms': list(self._entry_terms.values()),
+        }
+
+    def _restore_state(self, columns, nodes):
+        self._pending_children = dict(zip(columns['pending_tree_number'], columns['pending_children']))
+        self._entry_terms = dict(zip(columns['entry_term_id'], columns['entry_terms']))
+
+    def synonyms(self, node):
+        return self._entry_terms.get(node.id, [])
+
+    def add_entry_terms(self, entry_terms):
+        """
+        add entry terms of MeSHs to search by name (ex. 'entry_terms' of the MeSH table by MeSH id)
+        :param entry_terms: entry terms by MeSH id
+        :return:
+        """
+        for _id, terms in entry_terms.items():
+            self._entry_terms[_id] = list(dict.fromkeys(self._entry_terms.get(_id, []) + list(terms)))
+        self._name_indexes = {}
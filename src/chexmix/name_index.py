@@ -0,0 +1,99 @@
+"""Index of names for substring, prefix and exact lookups.
+
+Names are case folded and split into trigrams. The index keeps, for every trigram, the sorted positions of the names
+that contain it, so a substring query intersects the postings of its trigrams and checks only the names left.
+Names sorted by their folded form answer prefix queries with two binary searches.
+"""
+import bisect
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+SUBSTRING = 'substring'
+PREFIX = 'prefix'
+EXACT = 'exact'
+# number of candidate names below which they are checked directly instead of intersecting more postings
+CHECK_LIMIT = 64
+
+
+def _trigram_codes(text: str) -> np.ndarray:
+    # code points take 21 bits, so a trigram packs into an int64
+    chars = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.int64)
+    return (chars[:-2] << 42) | (chars[1:-1] << 21) | chars[2:]
+
+
+class NameIndex:
+    """Index of names. The same name can appear many times (ex. as the name of a node and an entry term of another)."""
+
+    def __init__(self, names: Sequence[str]):
+        """Constructor method.
+
+        :param names: names. results are positions in this sequence
+        """
+        self._names = list(names)
+        self._folded = [name.casefold() for name in self._names]
+
+        # trigrams of all names at once, over the names joined by a separator that no trigram may contain
+        text = '\0'.join(self._folded) + '\0'
+        codes = _trigram_codes(text)
+        lengths = np.array([len(name) + 1 for name in self._folded], dtype=np.int64)
+        owners = np.repeat(np.arange(len(self._folded), dtype=np.int64), lengths)[: len(codes)]
+        chars = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+        valid = (chars[:-2] != 0) & (chars[1:-1] != 0) & (chars[2:] != 0)
+        codes, owners = codes[valid], owners[valid]
+        order = np.lexsort((owners, codes))
+        codes, owners = codes[order], owners[order]
+        # a name with a repeated trigram is posted once
+        first = np.ones(len(codes), dtype=bool)
+        first[1:] = (codes[1:] != codes[:-1]) | (owners[1:] != owners[:-1])
+        codes, self._postings = codes[first], owners[first]
+        self._trigrams, starts = np.unique(codes, return_index=True)
+        self._ptr = np.append(starts, len(codes))
+
+        self._sorted = sorted(range(len(self._folded)), key=self._folded.__getitem__)
+        self._sorted_folded = [self._folded[pos] for pos in self._sorted]
+        self._exact: Dict[str, List[int]] = {}
+        for pos, name in enumerate(self._folded):
+            self._exact.setdefault(name, []).append(pos)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def _substring_candidates(self, folded: str) -> List[int]:
+        codes = np.unique(_trigram_codes(folded))
+        if len(codes) == 0:
+            return list(range(len(self._names)))  # too short for trigrams, so every name is a candidate
+        pos = np.searchsorted(self._trigrams, codes)
+        if (pos == len(self._trigrams)).any() or (self._trigrams[pos] != codes).any():
+            return []
+        starts, ends = self._ptr[pos], self._ptr[pos + 1]
+        order = np.argsort(ends - starts, kind='stable')
+        candidates = self._postings[starts[order[0]]:ends[order[0]]]
+        for idx in order[1:].tolist():
+            if len(candidates) <= CHECK_LIMIT:
+                break  # few enough to check the names themselves
+            candidates = np.intersect1d(candidates, self._postings[starts[idx]:ends[idx]], assume_unique=True)
+        return candidates.tolist()
+
+    def search(self, query: str, match: str = SUBSTRING, ignore_case: bool = False) -> List[int]:
+        """Find the names matching a query.
+
+        :param query: query
+        :param match: "substring", "prefix" or "exact"
+        :param ignore_case: if True, compare case folded names
+        :return: positions of matching names, in ascending order
+        """
+        folded = query.casefold()
+        names = self._folded if ignore_case else self._names
+        query = folded if ignore_case else query
+        if match == SUBSTRING:
+            return [pos for pos in self._substring_candidates(folded) if query in names[pos]]
+        if match == PREFIX:
+            start = bisect.bisect_left(self._sorted_folded, folded)
+            end = start
+            while end < len(self._sorted_folded) and self._sorted_folded[end].startswith(folded):
+                end += 1
+            return sorted(pos for pos in self._sorted[start:end] if names[pos].startswith(query))
+        if match == EXACT:
+            return [pos for pos in self._exact.get(folded, []) if names[pos] == query]
+        raise ValueError(f'match must be "{SUBSTRING}", "{PREFIX}" or "{EXACT}", not {match}')
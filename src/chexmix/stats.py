@@ -0,0 +1,191 @@
+"""Over-representation statistics, vectorized over many tests at once (ex. every node of a hierarchy).
+
+A node is tested by the hypergeometric distribution: of N background publications, K are annotated with the node,
+and n are drawn (ex. the publications of a keyword), k of them annotated. The p-value of over-representation is
+P(X >= k), the same as the one-sided Fisher's exact test of the 2x2 table of the counts. Tails are summed from their
+term nearest the mode outwards, by the ratio of consecutive terms, until the terms no longer change the sum, so all
+tests advance together in NumPy and a test takes a few terms beyond its standard deviation at most.
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+
+# log factorials below this are looked up, and the others use the Stirling series, exact to double precision there
+LOG_FACTORIAL_TABLE_SIZE = 256
+# relative size of a term below which a tail sum stops
+TAIL_TOLERANCE = 1e-17
+# number of terms a tail sum adds at a time
+TAIL_BLOCK = 32
+
+FDR_BH = 'fdr_bh'
+BONFERRONI = 'bonferroni'
+
+_log_factorial_table = np.concatenate(([0.0], np.cumsum(np.log(np.arange(1, LOG_FACTORIAL_TABLE_SIZE)))))
+
+
+def log_factorial(x) -> np.ndarray:
+    """Natural log of x!, element-wise.
+
+    :param x: non-negative integers
+    :return: float array
+    """
+    x = np.asarray(x, dtype=np.int64)
+    ret = _log_factorial_table[np.minimum(x, LOG_FACTORIAL_TABLE_SIZE - 1)]
+    large = x >= LOG_FACTORIAL_TABLE_SIZE
+    if large.any():
+        z = x[large] + 1.0
+        series = 1 / (12 * z) - 1 / (360 * z ** 3) + 1 / (1260 * z ** 5) - 1 / (1680 * z ** 7)
+        ret = np.where(large, 0.0, ret)
+        ret[large] = (z - 0.5) * np.log(z) - z + 0.5 * np.log(2 * np.pi) + series
+    return ret
+
+
+def _log_choose(n: np.ndarray, k: np.ndarray) -> np.ndarray:
+    return log_factorial(n) - log_factorial(k) - log_factorial(n - k)
+
+
+def hypergeom_pmf(k, K, n, N) -> np.ndarray:
+    """P(X = k) of the hypergeometric distribution, element-wise.
+
+    :param k: numbers of annotated draws
+    :param K: numbers of annotated items in the population
+    :param n: numbers of draws
+    :param N: population sizes
+    :return: float array
+    """
+    k, K, n, N = np.broadcast_arrays(*(np.asarray(a, dtype=np.int64) for a in (k, K, n, N)))
+    valid = (np.maximum(0, n + K - N) <= k) & (k <= np.minimum(n, K))
+    k = np.where(valid, k, 0)
+    K = np.where(valid, K, 0)
+    log_pmf = _log_choose(K, k) + _log_choose(N - K, n - k) - _log_choose(N, n)
+    return np.where(valid, np.exp(log_pmf), 0.0)
+
+
+def _tail_sum(start: np.ndarray, stop: np.ndarray, K: np.ndarray, n: np.ndarray, N: np.ndarray, step: int):
+    # sum of pmf from start to stop (inclusive) in steps of +1 or -1, where the terms shrink away from start.
+    # tests advance TAIL_BLOCK terms at a time, as the cumulative products of the ratios of consecutive terms
+    total = hypergeom_pmf(start, K, n, N)
+    term = total.copy()
+    active = np.flatnonzero((start != stop) & (term > 0))
+    i = start.astype(np.float64)
+    offsets = np.arange(TAIL_BLOCK, dtype=np.float64) * step
+    while len(active) > 0:
+        i_a = i[active, None] + offsets
+        K_a, n_a, N_a = K[active, None], n[active, None], N[active, None]
+        with np.errstate(divide='ignore', invalid='ignore'):  # ratios past the end of the tail are dropped
+            if step > 0:
+                ratios = (K_a - i_a) * (n_a - i_a) / ((i_a + 1) * (N_a - K_a - n_a + i_a + 1))
+            else:
+                ratios = i_a * (N_a - K_a - n_a + i_a) / ((K_a - i_a + 1) * (n_a - i_a + 1))
+            terms = np.cumprod(ratios, axis=1) * term[active, None]
+        n_terms = np.minimum(np.abs(stop[active] - i[active]), TAIL_BLOCK)
+        terms[np.arange(TAIL_BLOCK) >= n_terms[:, None]] = 0.0
+        term[active] = terms[:, -1]
+        total[active] += terms.sum(axis=1)
+        i[active] += n_terms * step
+        active = active[(i[active] != stop[active]) & (term[active] > TAIL_TOLERANCE * total[active])]
+    return total
+
+
+def hypergeom_sf(k, K, n, N) -> np.ndarray:
+    """P(X >= k) of the hypergeometric distribution, element-wise. It is the p-value of over-representation, and of
+    the one-sided ("greater") Fisher's exact test of the table [[k, n - k], [K - k, N - K - n + k]].
+
+    :param k: numbers of annotated draws
+    :param K: numbers of annotated items in the population
+    :param n: numbers of draws
+    :param N: population sizes
+    :return: float array
+    """
+    k, K, n, N = np.broadcast_arrays(*(np.asarray(a, dtype=np.int64) for a in (k, K, n, N)))
+    low, high = np.maximum(0, n + K - N), np.minimum(n, K)
+    mode = (n + 1) * (K + 1) // (N + 2)
+    ret = np.where(k <= low, 1.0, 0.0)
+    # above the mode, sum the upper tail itself. at the mode or below, 1 - the lower tail, which is the smaller one
+    upper = (low < k) & (k <= high) & (k > mode)
+    lower = (low < k) & (k <= high) & (k <= mode)
+    if upper.any():
+        ret[upper] = _tail_sum(k[upper], high[upper], K[upper], n[upper], N[upper], 1)
+    if lower.any():
+        ret[lower] = 1.0 - _tail_sum(k[lower] - 1, low[lower], K[lower], n[lower], N[lower], -1)
+    return np.clip(ret, 0.0, 1.0)
+
+
+def hypergeom_cdf(k, K, n, N) -> np.ndarray:
+    """P(X <= k) of the hypergeometric distribution, element-wise. It is the p-value of under-representation.
+
+    :param k: numbers of annotated draws
+    :param K: numbers of annotated items in the population
+    :param n: numbers of draws
+    :param N: population sizes
+    :return: float array
+    """
+    # k or fewer annotated draws are n - k or more draws of the other items
+    k, K, n, N = (np.asarray(a, dtype=np.int64) for a in (k, K, n, N))
+    return hypergeom_sf(n - k, N - K, n, N)
+
+
+def fold_change(k, K, n, N) -> np.ndarray:
+    """Ratio of the rate of annotated draws to the rate of annotated items in the population, element-wise.
+
+    :param k: numbers of annotated draws
+    :param K: numbers of annotated items in the population
+    :param n: numbers of draws
+    :param N: population sizes
+    :return: float array, NaN where K or n is 0
+    """
+    k, K, n, N = (np.asarray(a, dtype=np.float64) for a in (k, K, n, N))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where((K > 0) & (n > 0), (k * N) / (K * n), np.nan)
+
+
+def benjamini_hochberg(p_values) -> np.ndarray:
+    """Adjust p-values for the false discovery rate by the Benjamini-Hochberg procedure.
+
+    :param p_values: p-values
+    :return: adjusted p-values, in the same order
+    """
+    p_values = np.asarray(p_values, dtype=np.float64)
+    order = np.argsort(p_values, kind='stable')
+    scaled = p_values[order] * len(p_values) / np.arange(1, len(p_values) + 1)
+    ret = np.empty(len(p_values), dtype=np.float64)
+    ret[order] = np.minimum(np.minimum.accumulate(scaled[::-1])[::-1], 1.0)
+    return ret
+
+
+def adjust_p_values(p_values, correction: Optional[str] = FDR_BH) -> np.ndarray:
+    """Correct p-values for multiple testing.
+
+    :param p_values: p-values
+    :param correction: "fdr_bh" (Benjamini-Hochberg), "bonferroni" or None
+    :return: adjusted p-values, in the same order
+    """
+    p_values = np.asarray(p_values, dtype=np.float64)
+    if correction is None:
+        return p_values.copy()
+    if correction == FDR_BH:
+        return benjamini_hochberg(p_values)
+    if correction == BONFERRONI:
+        return np.minimum(p_values * len(p_values), 1.0)
+    raise ValueError(f'correction must be "{FDR_BH}", "{BONFERRONI}" or None, not {correction}')
+
+
+def over_representation(
+    k, K, n, N, correction: Optional[str] = FDR_BH
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Test many annotations for over-representation at once. Annotations without items in the population (K = 0)
+    are not tested: their p-values are 1 and they do not count towards the correction.
+
+    :param k: numbers of annotated draws
+    :param K: numbers of annotated items in the population
+    :param n: numbers of draws
+    :param N: population sizes
+    :param correction: "fdr_bh" (Benjamini-Hochberg), "bonferroni" or None
+    :return: fold changes, p-values, adjusted p-values
+    """
+    k, K, n, N = np.broadcast_arrays(*(np.asarray(a, dtype=np.int64) for a in (k, K, n, N)))
+    p_values = hypergeom_sf(k, K, n, N)
+    adjusted = np.ones(p_values.shape, dtype=np.float64)
+    tested = K > 0
+    adjusted[tested] = adjust_p_values(p_values[tested], correction)
+    return fold_change(k, K, n, N), p_values, adjusted
@@ -0,0 +1,275 @@
+"""Single file container of NumPy blocks, used to save graphs and hierarchies.
+
+The file is the magic bytes, blocks in the .npy format aligned to 64 bytes, a JSON footer with the offset of every
+block and user metadata, then the footer length and the magic bytes again. Blocks are memory-mapped on load, so
+opening a file only reads its footer. Columns of strings and other Python objects are stored as variable length
+binary blocks (concatenated bytes and offsets) and decoded lazily, value by value.
+"""
+import itertools
+import json
+import pickle
+from collections.abc import Sequence
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b'CHEXMIX\x01'
+ALIGNMENT = 64
+
+Blocks = Dict[str, np.ndarray]
+
+
+def save_blocks(path: str, blocks: Blocks, meta: Optional[Dict[str, Any]] = None) -> None:
+    """Save blocks of arrays to a single file.
+
+    :param path: file path
+    :param blocks: arrays by block name
+    :param meta: JSON serializable metadata
+    """
+    offsets = {}
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        for name, array in blocks.items():
+            f.write(b'\0' * (-f.tell() % ALIGNMENT))
+            offsets[name] = f.tell()
+            np.lib.format.write_array(f, np.ascontiguousarray(array), allow_pickle=False)
+        footer = json.dumps({'blocks': offsets, 'meta': meta or {}}).encode()
+        f.write(footer)
+        f.write(np.uint64(len(footer)).tobytes())
+        f.write(MAGIC)
+
+
+def load_blocks(path: str, mmap: bool = True) -> Tuple[Blocks, Dict[str, Any]]:
+    """Load blocks of arrays saved by `save_blocks`.
+
+    :param path: file path
+    :param mmap: if True, memory-map the blocks (read-only) instead of reading them
+    :return: arrays by block name, metadata
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{path} is not a chexmix block file')
+        f.seek(-len(MAGIC) - 8, 2)
+        footer_length = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{path} is truncated')
+        f.seek(-len(MAGIC) - 8 - footer_length, 2)
+        footer = json.loads(f.read(footer_length))
+
+        blocks = {}
+        for name, offset in footer['blocks'].items():
+            f.seek(offset)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            order = 'F' if fortran_order else 'C'
+            count = int(np.prod(shape))
+            if mmap and count > 0:
+                blocks[name] = np.memmap(path, dtype=dtype, mode='r', offset=f.tell(), shape=shape, order=order)
+            else:
+                blocks[name] = np.fromfile(f, dtype=dtype, count=count).reshape(shape, order=order)
+    return blocks, footer['meta']
+
+
+class VarBinaryColumn(Sequence):
+    """Read-only column of values stored as concatenated bytes and offsets, decoded on access."""
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray, decode: Callable[[bytes], Any]):
+        self._data = data
+        self._offsets = offsets
+        self._decode = decode
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[pos] for pos in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self._decode(self._data[self._offsets[index]:self._offsets[index + 1]].tobytes())
+
+    def tolist(self) -> List[Any]:
+        """Decode all values at once.
+
+        :return: values
+        """
+        buffer, offsets = self._data.tobytes(), self._offsets.tolist()
+        return [self._decode(buffer[start:end]) for start, end in zip(offsets, offsets[1:])]
+
+
+class CategoryColumn(Sequence):
+    """Read-only column of few distinct values, stored as integer codes to the categories."""
+
+    def __init__(self, codes: np.ndarray, categories: List[Any]):
+        self._codes = codes
+        self._categories = categories
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._categories[code] for code in self._codes[index].tolist()]
+        return self._categories[self._codes[index]]
+
+    def tolist(self) -> List[Any]:
+        """Decode all values at once.
+
+        :return: values
+        """
+        return [self._categories[code] for code in self._codes.tolist()]
+
+
+def _decode_str(value: bytes) -> str:
+    return value.decode('utf-8')
+
+
+def _var_binary(encoded: List[bytes]) -> Tuple[np.ndarray, np.ndarray]:
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def encode_column(values: Sequence, mask: Optional[np.ndarray] = None) -> Tuple[str, Blocks]:
+    """Encode a column of values into arrays. The kind of column is the narrowest one that holds every value:
+    'bool', 'int', 'float', 'category' (strings with few distinct values), 'str' or 'pickle'. Columns mixing ints
+    and floats are pickled, so their values keep their types.
+
+    :param values: values
+    :param mask: False where a value is missing. missing values are stored as placeholders
+    :return: kind of column, arrays by part name
+    """
+    values = values.tolist() if hasattr(values, 'tolist') else list(values)
+    present = values if mask is None else list(itertools.compress(values, np.asarray(mask).tolist()))
+    types = set(map(type, present))
+    if types <= {bool}:
+        kind, default = 'bool', False
+    elif types <= {int}:
+        kind, default = 'int', 0
+        if present and not (-(2 ** 63) <= min(present) and max(present) < 2 ** 63):
+            kind = 'pickle'
+    elif types <= {float}:
+        kind, default = 'float', 0.0
+    elif types <= {str}:
+        kind, default = 'str', ''
+    else:
+        kind, default = 'pickle', None
+    if mask is not None:
+        values = [value if is_present else default for value, is_present in zip(values, np.asarray(mask).tolist())]
+
+    if kind in ('bool', 'int', 'float'):
+        return kind, {'values': np.array(values, dtype={'bool': bool, 'int': np.int64, 'float': np.float64}[kind])}
+    if kind == 'str':
+        categories = list(dict.fromkeys(values))
+        if len(categories) <= min(len(values) // 2, 2 ** 15):
+            positions = {category: pos for pos, category in enumerate(categories)}
+            data, offsets = _var_binary([category.encode('utf-8') for category in categories])
+            codes = np.array([positions[value] for value in values], dtype=np.int16)
+            return 'category', {'codes': codes, 'data': data, 'offsets': offsets}
+        data, offsets = _var_binary([value.encode('utf-8') for value in values])
+        return kind, {'data': data, 'offsets': offsets}
+    data, offsets = _var_binary([pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL) for value in values])
+    return kind, {'data': data, 'offsets': offsets}
+
+
+def decode_column(kind: str, parts: Blocks) -> Sequence:
+    """Decode a column encoded by `encode_column`. Strings and objects are decoded on access.
+
+    :param kind: kind of column
+    :param parts: arrays by part name
+    :return: column (NumPy array for 'bool', 'int' and 'float')
+    """
+    if kind in ('bool', 'int', 'float'):
+        return parts['values']
+    if kind == 'category':
+        return CategoryColumn(parts['codes'], VarBinaryColumn(parts['data'], parts['offsets'], _decode_str).tolist())
+    if kind == 'str':
+        return VarBinaryColumn(parts['data'], parts['offsets'], _decode_str)
+    if kind == 'pickle':
+        return VarBinaryColumn(parts['data'], parts['offsets'], pickle.loads)
+    raise ValueError(f'unknown column kind {kind}')
+
+
+def to_columns(records: List[Mapping[str, Any]]) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """Turn records (ex. node attribute dicts) into columns.
+
+    :param records: records
+    :return: values by key (NumPy arrays for int and float columns without missing values),
+     masks by key for the keys that some records do not have (True where a record has the key)
+    """
+    missing = object()
+    columns, masks = {}, {}
+    for key in dict.fromkeys(itertools.chain.from_iterable(records)):
+        values = [record.get(key, missing) for record in records]
+        if any(value is missing for value in values):
+            masks[key] = np.array([value is not missing for value in values])
+            values = [None if value is missing else value for value in values]
+        elif all(type(v) is int for v in values):  # pylint: disable=unidiomatic-typecheck
+            values = np.array(values, dtype=np.int64)
+        elif all(type(v) is float for v in values):  # pylint: disable=unidiomatic-typecheck
+            values = np.array(values, dtype=np.float64)
+        columns[key] = values
+    return columns, masks
+
+
+def from_columns(
+    n_records: int, columns: Mapping[str, Sequence], masks: Mapping[str, np.ndarray]
+) -> List[Dict[str, Any]]:
+    """Turn columns back into records, the inverse of `to_columns`.
+
+    :param n_records: number of records
+    :param columns: values by key
+    :param masks: masks by key for the keys that some records do not have
+    :return: records
+    """
+    records = [{} for _ in range(n_records)]
+    for key, values in columns.items():
+        values = values.tolist() if hasattr(values, 'tolist') else list(values)
+        positions = np.flatnonzero(masks[key]).tolist() if key in masks else range(n_records)
+        for pos in positions:
+            records[pos][key] = values[pos]
+    return records
+
+
+def encode_columns(
+    prefix: str, columns: Mapping[str, Sequence], masks: Mapping[str, np.ndarray]
+) -> Tuple[Blocks, Dict[str, str]]:
+    """Encode columns into blocks named '{prefix}/{position}/{part}'.
+
+    :param prefix: prefix of block names
+    :param columns: values by key
+    :param masks: masks by key for the keys with missing values
+    :return: blocks, kind of column by key
+    """
+    blocks, kinds = {}, {}
+    for pos, (key, values) in enumerate(columns.items()):
+        kinds[key], parts = encode_column(values, masks.get(key))
+        blocks.update({f'{prefix}/{pos}/{part}': array for part, array in parts.items()})
+        if key in masks:
+            blocks[f'{prefix}/{pos}/mask'] = np.asarray(masks[key], dtype=bool)
+    return blocks, kinds
+
+
+def decode_columns(
+    prefix: str, blocks: Blocks, kinds: Mapping[str, str]
+) -> Tuple[Dict[str, Sequence], Dict[str, np.ndarray]]:
+    """Decode columns encoded by `encode_columns`.
+
+    :param prefix: prefix of block names
+    :param blocks: blocks
+    :param kinds: kind of column by key
+    :return: values by key, masks by key
+    """
+    columns, masks = {}, {}
+    for pos, (key, kind) in enumerate(kinds.items()):
+        part_prefix = f'{prefix}/{pos}/'
+        parts = {name[len(part_prefix):]: array for name, array in blocks.items() if name.startswith(part_prefix)}
+        if 'mask' in parts:
+            masks[key] = parts.pop('mask')
+        columns[key] = decode_column(kind, parts)
+    return columns, masks
@@ -1,5 +1,5 @@
 from collections import namedtuple
-from typing import List, NamedTuple
+from typing import List, NamedTuple, Optional
 
 ChEMBLCompound = namedtuple(
     "ChEMBLCompound",
@@ -76,6 +76,7 @@ class PubTator(NamedTuple):
     title: str
     abstract: str
     mentions: list
+    year: Optional[int] = None
 
     def __hash__(self):
         return hash(self.id) * hash(self.title) * hash(self.abstract)
@@ -0,0 +1,88 @@
+import pytest
+
+from chexmix.datasources import base
+
+
+def node_table():
+    table = {_id: {'id': _id, 'children': []} for _id in [1, 2, 3]}
+    table[1]['children'] = [table[2], table[3]]
+    return table
+
+
+def test_add_enrichment():
+    background_annotations = {f'p{i}': ['TAXO:2' if i < 4 else 'TAXO:3'] for i in range(10)}
+    annotations = {pmid: background_annotations[pmid] for pmid in ['p0', 'p1', 'p2', 'p3']}
+    background_table = base.add_count(node_table(), background_annotations, 'TAXO:', 1)
+    table = base.add_count(node_table(), annotations, 'TAXO:', 1)
+
+    table = base.add_enrichment(table, background_table, len(annotations), len(background_annotations))
+    assert table[2]['fold_change'] == pytest.approx(2.5)
+    assert table[2]['p_value'] == pytest.approx(1 / 210)
+    assert table[2]['adjusted_p_value'] == pytest.approx(3 / 210)
+    assert table[1]['p_value'] == pytest.approx(1.0)
+    assert table[3]['fold_change'] == 0.0 and table[3]['p_value'] == 1.0
+
+
+def test_rollup():
+    # a chain deeper than the recursion limit, with a diamond at the bottom: 0 -> ... -> 4999 -> (a, b) -> c
+    chain = [{'id': i, 'children': [], 'count': 1, 'pmids': [i % 3]} for i in range(5000)]
+    for parent, child in zip(chain, chain[1:]):
+        parent['children'].append(child)
+    c = {'id': 'c', 'children': [], 'count': 10, 'pmids': [7]}
+    a = {'id': 'a', 'children': [c], 'pmids': [8]}
+    b = {'id': 'b', 'children': [c, c]}
+    b['children'].append(b)
+    chain[-1]['children'] = [a, b]
+
+    assert base.add_total_count(chain[0]) == 5000 + 10 * 3
+    assert (a['total_count'], b['total_count'], chain[-1]['total_count']) == (10, 20, 31)
+    assert base.add_total_pmids(chain[0]).tolist() == [0, 1, 2, 7, 8]
+    assert b['total_pmids'].tolist() == [7]
+    assert base.rollup(chain[0], 'pmids', 'pmid_set', base.UNION) == {0, 1, 2, 7, 8}
+    assert base.rollup(chain[0], 'pmids', 'n_pmids', base.COUNT_DISTINCT) == 5
+    assert base.rollup(chain[0], 'count', 'max_count', lambda value, totals: max([value or 0] + totals)) == 10
+    assert chain[0]['max_count'] == 10
+
+    c['children'].append(chain[0])
+    with pytest.raises(ValueError):
+        base.add_total_count(chain[0])
+
+
+@pytest.mark.parametrize('counts_only', [False, True])
+def test_add_pmids_and_trim_tree(counts_only):
+    annotations = {'10': ['TAXO:2', 'TAXO:3'], '11': ['TAXO:2'], 12: ['TAXO:1', 'TAXO:4']}
+    table = base.add_pmids(node_table(), annotations, 'TAXO:', 1, counts_only=counts_only)
+    assert table[2]['pmids'].tolist() == [10, 11]
+    assert [base.total_pmid_count(table[_id]) for _id in [1, 2, 3]] == [3, 2, 1]
+    if counts_only:
+        assert 'total_pmids' not in table[1]
+    else:
+        assert table[1]['total_pmids'].tolist() == [10, 11, 12]
+
+    root = base.trim_tree(table[1], min_count=2)
+    assert [c['id'] for c in root['children']] == [2]
+
+
+def test_add_count_and_pmids_from_exploded_annotations(caplog):
+    table = {**node_table(), 'D5': {'id': 'D5', 'children': []}}
+    annotations = {
+        '10': ['TAXO:2', 'TAXO:3', 'MESH:D5', 'TAXO:9', 'TAXO:1x'],
+        '11': {'TAXO:2': {}, 'TAXO:9': {}, 'Gene:2': {}},
+        '12': [],
+    }
+    assert base.explode_annotations(annotations, 'TAXO:').to_dict('list') == {
+        'pmid': ['10', '10', '10', '11', '11'], 'id': [2, 3, 9, 2, 9]
+    }
+    assert base.explode_annotations(annotations, 'MESH:')['id'].tolist() == ['D5']
+
+    caplog.clear()
+    table = base.add_count(table, annotations, 'TAXO:', 1)
+    assert [table[_id]['count'] for _id in [1, 2, 3]] == [0, 2, 1]
+    assert table[1]['total_count'] == 3
+    # misses are reported once, not by annotation
+    assert [r.getMessage() for r in caplog.records] == [
+        'error in parsing 1 ids, ex. 1x', '2 annotations of 1 ids do not exist, ex. 9'
+    ]
+
+    table = base.add_pmids(table, annotations, 'MESH:', None)
+    assert table['D5']['pmids'].tolist() == [10] and table[2]['pmids'].tolist() == []
@@ -8,3 +8,15 @@ def test_load_mesh(mesh_XML_mock):
     MeSH.load_XML = Mock(return_value=mesh_XML_mock)
     mesh_table = mesh.load_mesh()
     assert (mesh_table['MSHD:D058729']['level'] == 4) and (mesh_table['MSHD:D050197']['level'] == 5)
+
+
+def test_parse_entry_terms():
+    descriptor = {
+        'DescriptorUI': 'D017719', 'DescriptorName': 'Diabetic Foot',
+        'ConceptList': [
+            {'ConceptUI': 'M1', 'TermList': [{'String': 'Diabetic Foot'}, {'String': 'Diabetic Feet'}]},
+            {'ConceptUI': 'M2', 'TermList': [{'String': 'Foot Ulcer, Diabetic'}, {'String': 'Diabetic Feet'}]},
+        ],
+    }
+    assert mesh.parse_entry_terms(descriptor, 'Diabetic Foot') == ['Diabetic Feet', 'Foot Ulcer, Diabetic']
+    assert mesh.parse_descriptor(descriptor)['entry_terms'] == ['Diabetic Feet', 'Foot Ulcer, Diabetic']
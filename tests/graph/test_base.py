@@ -1,3 +1,8 @@
+import json
+
+import networkx as nx
+import pandas as pd
+
 from chexmix.graph import BioGraph, Header
 
 
@@ -75,6 +80,39 @@ def test_get_table(bio_graph):
     assert len(table1) == 6
     assert len(table2) == 3
     assert len(table1['2.1 : node21']['relationship']) == 3
+    assert table1['2 : node2']['relationship'] == {'test': ['2.1 : node21'], 'test2': ['2.1 : node21']}
+    assert 'relationship' not in bio_graph[0].nodes['2 : node2']
+    assert table1 == BioGraph.table_from_frames(*bio_graph[0].to_frames())
+
+
+def test_to_frames_and_from_frames(bio_graph):
+    graph = bio_graph[0]
+    graph.nodes['1 : node1']['lineage'] = ['0 : node0']
+    node_frame, edge_frame = graph.to_frames()
+    assert list(node_frame.index) == list(graph.nodes)
+    assert node_frame.loc['1 : node1', 'lineage'] == ['0 : node0']
+    assert node_frame.loc['2 : node2', 'lineage'] is pd.NA
+    assert list(edge_frame.columns) == ['source', 'target', 'key', 'type']
+    assert isinstance(edge_frame['type'].dtype, pd.CategoricalDtype)
+
+    loaded = BioGraph.from_frames(node_frame, edge_frame)
+    assert list(loaded.nodes(data=True)) == list(graph.nodes(data=True))
+    assert list(loaded.edges(keys=True, data=True)) == list(graph.edges(keys=True, data=True))
+    assert loaded.successors_by_types('2 : node2', ['test2']) == ['2.1 : node21']
+
+
+def test_frames_from_table(taxonomy_table, mesh_table):
+    node_frame, edge_frame = BioGraph.frames_from_table(taxonomy_table)
+    assert 'relationship' not in node_frame
+    assert edge_frame[['source', 'target', 'key']].values.tolist() == [
+        ['TAXO:9605', 'TAXO:9606', 0], ['TAXO:9606', 'TAXO:63221', 0]
+    ]
+    assert BioGraph.table_from_frames(node_frame, edge_frame) == taxonomy_table
+
+    nodes, edges = BioGraph.nodes_and_edges_from_table(mesh_table)
+    graph, expected = BioGraph.from_table(mesh_table), BioGraph(nodes, edges)
+    assert list(graph.nodes(data=True)) == list(expected.nodes(data=True))
+    assert list(graph.edges(keys=True, data=True)) == list(expected.edges(keys=True, data=True))
 
 
 def test_subgraph_from_leaves(bio_graph):
@@ -87,3 +125,190 @@ def test_subgraph_from_leaves(bio_graph):
     assert len(sub_bio_graph1_1.edges()) == 1
     assert len(sub_bio_graph1_2.edges()) == 3
     assert len(sub_bio_graph2_1.edges()) == 1
+
+
+def test_intersection_of_many(bio_graph):
+    third_graph = BioGraph([('2 : node2', {'type': 'genus', 'count': 0})],
+                           [('2 : node2', '2.1 : node21', {'type': 'test2'})])
+    assert len(bio_graph[0].intersection(bio_graph[1], third_graph).edges()) == 0
+    intersection_graph = bio_graph[0].intersection(bio_graph[0].copy(), bio_graph[1])
+    assert list(intersection_graph.edges(data=True)) == [('2 : node2', '2.1 : node21', {'type': 'test'})]
+
+
+def test_difference_of_many(bio_graph):
+    third_graph = BioGraph([('1 : node1', {'type': 'genus', 'count': 0})],
+                           [('2 : node2', '2.1 : node21', {'type': 'test2'})])
+    difference_graph = bio_graph[0].difference(bio_graph[1], third_graph)
+    assert list(difference_graph.edges(data=True)) == [('1 : node1', '1.1 : node11', {'type': 'test'}),
+                                                       ('2.1 : node21', '2.2 : node22', {'type': 'test'})]
+    assert '3 : node3' not in difference_graph
+    assert difference_graph.nodes['1 : node1'] == {}
+
+
+def test_remain_by_edge_types_view(bio_graph):
+    view = bio_graph[0].remain_by_edge_types(['test'], view=True)
+    assert view.is_view
+    assert list(view.nodes()) == list(bio_graph[0].remain_by_edge_types(['test']).nodes())
+    assert len(view.edges()) == 3
+    bio_graph[0].nodes['2 : node2']['count'] = 7
+    assert view.nodes['2 : node2']['count'] == 7
+
+    chained_view = view.remain_by_node_types(['genus'], view=True)
+    assert list(chained_view.nodes()) == ['1 : node1', '2 : node2']
+    assert len(chained_view.edges()) == 0
+
+
+def test_get_table_and_to_frames_on_view(bio_graph):
+    view = bio_graph[0].remain_by_edge_types(['test'], view=True)
+    graph = view.materialize()
+    table = view.get_table()
+    assert table == graph.get_table()
+    assert table['2 : node2']['relationship'] == {'test': ['2.1 : node21']}
+    node_frame, edge_frame = view.to_frames()
+    assert list(node_frame.index) == list(graph.nodes)
+    assert edge_frame[['source', 'target']].values.tolist() == [[s_node, e_node] for s_node, e_node in graph.edges()]
+    assert table == BioGraph.table_from_frames(node_frame, edge_frame)
+
+
+def test_threshold_view(bio_graph):
+    view = bio_graph[0].threshold(3, view=True)
+    assert list(view.nodes()) == list(bio_graph[0].threshold(3).nodes())
+    assert list(view.nodes()) == ['1.1 : node11', '2.1 : node21']
+    assert len(view.edges()) == 0
+
+
+def test_materialize(bio_graph):
+    view = bio_graph[0].remain_by_edge_types(['test2'], view=True)
+    graph = view.materialize()
+    assert not graph.is_view
+    graph.add_node('4 : node4', type='genus', count=0)
+    assert '4 : node4' not in bio_graph[0]
+    assert list(graph.edges(data=True)) == [('2 : node2', '2.1 : node21', {'type': 'test2'})]
+
+
+def test_find_roots_and_subgraph_from_roots_on_view(bio_graph):
+    view = bio_graph[0].remain_by_edge_types(['test'], view=True)
+    assert view.find_roots() == ['1 : node1', '2 : node2']
+    assert view.find_leaves(['test']) == ['1.1 : node11', '2.2 : node22']
+    sub_graph = view.subgraph_from_roots(['2 : node2'])
+    assert len(sub_graph.nodes()) == 3
+    assert len(sub_graph.edges()) == 2
+
+
+def test_edge_type_index(bio_graph):
+    graph = bio_graph[0]
+    assert graph.successors_by_types('2 : node2', ['test', 'test2']) == ['2.1 : node21']
+    assert graph.out_degree_by_types('2 : node2', ['test', 'test2']) == 2
+    assert graph.in_degree_by_types('2.1 : node21', ['test2']) == 1
+    assert graph.predecessors_by_types('2.2 : node22', ['test2']) == []
+
+    graph.remove_edge('2 : node2', '2.1 : node21')
+    assert graph.successors_by_types('2 : node2', ['test2']) == []
+    assert graph.find_roots(['test2']) == []
+    graph.add_edge('3 : node3', '2.2 : node22', type='test2')
+    assert graph.find_roots(['test2']) == ['3 : node3']
+    assert graph.find_leaves(['test2']) == ['2.2 : node22']
+    graph.remove_node('2.2 : node22')
+    assert graph.find_roots(['test2']) == []
+    assert not graph.has_edge_types('3 : node3', ['test2'])
+    assert graph.copy().successors_by_types('2 : node2', ['test']) == ['2.1 : node21']
+
+
+def test_join_attrs_from(bio_graph):
+    graph = BioGraph()
+    graph.add_nodes_from(['2 : node2', '2.1 : node21', '4 : node4'])
+    graph.add_edge('2 : node2', '2.1 : node21', key=0)
+    graph.join_attrs_from(bio_graph[0])
+    assert graph.nodes['2.1 : node21'] == {'type': 'Literature', 'count': 3}
+    assert graph.nodes['4 : node4'] == {}
+    assert graph.successors_by_types('2 : node2', ['test']) == ['2.1 : node21']
+
+    graph.nodes['2.1 : node21']['count'] = 10
+    assert bio_graph[0].nodes['2.1 : node21']['count'] == 3
+    assert graph.get_table()['2.1 : node21']['count'] == 10
+    # joined attributes are own dicts: writes to other do not show through, and keys can be deleted
+    bio_graph[0].nodes['2 : node2']['count'] = 99
+    assert type(graph.nodes['2 : node2']) is dict and graph.nodes['2 : node2']['count'] == 0
+    del graph.nodes['2 : node2']['count']
+    assert 'count' in bio_graph[0].nodes['2 : node2']
+    assert type(graph.edges['2 : node2', '2.1 : node21', 0]) is dict
+
+    graph = BioGraph()
+    graph.add_node('2.1 : node21', count=0, name='node21')
+    graph.join_attrs_from(bio_graph[0], ['count'])
+    assert graph.nodes['2.1 : node21'] == {'count': 3, 'name': 'node21'}
+
+
+def test_join_attrs_from_drops_memoized_traversals():
+    graph = BioGraph()
+    graph.add_edge('a', 'b', key=0, type='test')
+    graph.add_edge('b', 'c', key=0)
+    assert list(graph.subgraph_from_roots(['a'], ['test']).nodes()) == ['a', 'b']
+    other = BioGraph()
+    other.add_edge('b', 'c', key=0, type='test')
+    graph.join_attrs_from(other)
+    assert list(graph.subgraph_from_roots(['a'], ['test']).nodes()) == ['a', 'b', 'c']
+
+
+def test_inherit_attr_from(bio_graph):
+    graph = BioGraph()
+    graph.add_edge('2 : node2', '2.1 : node21')
+    inherited = graph.inherit_attr_from(bio_graph[0])
+    assert graph.nodes['2 : node2'] == {}
+    assert inherited.nodes['2 : node2'] == {'type': 'genus', 'count': 0}
+    assert inherited.edges['2 : node2', '2.1 : node21', 0] == {'type': 'test'}
+
+
+def test_subgraphs_from_roots_and_leaves(bio_graph):
+    sub_graphs = bio_graph[0].subgraphs_from_roots([['1 : node1'], ['2 : node2']], max_depth=1)
+    assert list(sub_graphs[0].nodes) == ['1 : node1', '1.1 : node11']
+    assert list(sub_graphs[1].nodes) == ['2 : node2', '2.1 : node21']
+    assert len(sub_graphs[1].edges()) == 2
+
+    sub_graph = bio_graph[0].subgraphs_from_leaves([['2.2 : node22']], ['test'])[0]
+    assert sorted(edge_attr['type'] for _, _, edge_attr in sub_graph.edges(data=True)) == ['test', 'test']
+    assert bio_graph[0].subgraph_from_roots(['1 : node1'], ['test2']).number_of_nodes() == 0
+
+
+def test_nodes_and_edges_from_roots_or_leaves(bio_graph):
+    nodes, edges = BioGraph.nodes_and_edges_from_roots_or_leaves(bio_graph[0], ['2.2 : node22'], 'predecessors')
+    assert len(nodes) == 3
+    assert sorted(edge_attr['type'] for _, _, edge_attr in edges) == ['test', 'test', 'test2']
+
+
+def test_save_and_load(bio_graph, tmp_path):
+    graph = bio_graph[0]
+    graph.graph['keyword'] = 'test'
+    graph.nodes['1 : node1']['lineage'] = ['0 : node0']
+    # a column mixing ints and floats keeps the type of each value
+    for pos, node in enumerate(graph):
+        graph.nodes[node]['score'] = pos if pos % 2 == 0 else pos + 0.5
+    graph.save(str(tmp_path / 'graph.bin'))
+    loaded = BioGraph.load(str(tmp_path / 'graph.bin'))
+    assert list(loaded.nodes(data=True)) == list(graph.nodes(data=True))
+    assert [type(score) for _, score in loaded.nodes(data='score')] == [int, float] * 3
+    assert list(loaded.edges(keys=True, data=True)) == list(graph.edges(keys=True, data=True))
+    assert loaded.graph == {'keyword': 'test'}
+    assert loaded.successors_by_types('2 : node2', ['test2']) == ['2.1 : node21']
+
+
+def test_write_graphml_round_trip(tmp_path):
+    graph = BioGraph()
+    graph.add_node(1, type='genus', count=3, ratio=0.5, leaf=False)
+    graph.add_node(2, type='Literature', count=1, ratio=1.5, leaf=True)
+    graph.add_edge(1, 2, key=0, type='INCLUDES')
+    graph.add_edge(1, 2, key=1, type='CONTAINS')
+    graph.write_graphml(str(tmp_path / 'graph.graphml'))
+    # GraphML ids are strings: integer node ids are read back by node_type
+    loaded = nx.read_graphml(str(tmp_path / 'graph.graphml'), node_type=int)
+    assert list(loaded.nodes(data=True)) == list(graph.nodes(data=True))
+    assert list(loaded.edges(keys=True, data=True)) == list(graph.edges(keys=True, data=True))
+
+
+def test_filtered_graph_attrs_are_own_dicts(bio_graph):
+    sub = bio_graph[0].remain_by_edge_types(['test']).remain_by_edge_types(['test'])
+    bio_graph[0].nodes['2 : node2']['count'] = 99
+    assert sub.nodes['2 : node2'] == {'type': 'genus', 'count': 0}
+    assert json.loads(json.dumps(sub.nodes['2 : node2'])) == {'type': 'genus', 'count': 0}
+    del sub.nodes['2 : node2']['count']
+    assert sub.nodes['2 : node2'] == {'type': 'genus'}
@@ -50,3 +50,9 @@ def test_is_descendant(classyfire_query_result):
     assert classyfiregraph.is_descendant('INCK:ABCDEFG', 'CLFR:0000111') and \
            classyfiregraph.is_descendant('CLFR:0111211', 'CLFR:0000211') and \
            not classyfiregraph.is_descendant('INCK:ABCDEFG', 'INCK:HIJKLMN')
+
+
+def test_is_descendant_many(classyfire_query_result):
+    classyfiregraph = ClassyFireGraph.from_classyfire_entities(classyfire_query_result)
+    pairs = [('INCK:ABCDEFG', 'CLFR:0000111'), ('CLFR:0000211', 'CLFR:0111211'), ('INCK:ABCDEFG', 'INCK:ABCDEFG')]
+    assert classyfiregraph.is_descendant_many(pairs).tolist() == [True, False, True]
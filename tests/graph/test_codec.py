@@ -0,0 +1,29 @@
+import pytest
+
+from chexmix.graph import NodeIdCodec
+
+NODE_IDS = ['TAXO:9606', 'MSHD:D000001', 'MSHC:C565928', 'MSHC:C000000001', 'CLFR:0000111', 'ARTI:332156', 'GENE:0']
+
+
+def test_encode_and_decode():
+    for node_id in NODE_IDS:
+        assert NodeIdCodec.decode(NodeIdCodec.encode(node_id)) == node_id
+    assert NodeIdCodec.encode('TAXO:9606') != NodeIdCodec.encode('ARTI:9606')
+    assert NodeIdCodec.encode('CLFR:0000111') != NodeIdCodec.encode('CLFR:111')
+
+
+def test_encode_many_and_decode_many():
+    codes = NodeIdCodec.encode_many(NODE_IDS)
+    assert codes.tolist() == [NodeIdCodec.encode(node_id) for node_id in NODE_IDS]
+    assert NodeIdCodec.decode_many(codes).tolist() == NODE_IDS
+    assert NodeIdCodec.get_headers(codes).tolist() == ['TAXO', 'MSHD', 'MSHC', 'MSHC', 'CLFR', 'ARTI', 'GENE']
+    assert NodeIdCodec.get_raw_ids(codes).tolist() == [9606, 'D000001', 'C565928', 'C000000001', 111, 332156, 0]
+    assert len(NodeIdCodec.encode_many([])) == 0
+
+
+@pytest.mark.parametrize('node_id', ['INCK:ABCDEFG', 'MUTA:c|SUB|C|1107|G', 'XXXX:1', 'TAXO:', 'TAXO:12a'])
+def test_encode_invalid(node_id):
+    with pytest.raises(ValueError):
+        NodeIdCodec.encode(node_id)
+    with pytest.raises(ValueError):
+        NodeIdCodec.encode_many(['TAXO:9606', node_id])
@@ -0,0 +1,71 @@
+from chexmix.graph import CompactMeSHGraph, CompactTaxonomyGraph, MeSHGraph, TaxonomyGraph, TaxParentType
+
+
+def test_from_table(taxonomy_table):
+    compact_graph = CompactTaxonomyGraph.from_table(taxonomy_table)
+    tax_graph = TaxonomyGraph.from_table(taxonomy_table)
+    assert len(compact_graph) == 3
+    assert compact_graph.number_of_edges() == 2
+    assert dict(compact_graph.nodes.data()) == dict(tax_graph.nodes(data=True))
+    assert sorted(compact_graph.to_graph().edges(data=True)) == sorted(tax_graph.edges(data=True))
+
+
+def test_from_graph(mesh_table):
+    mesh_graph = MeSHGraph.from_table(mesh_table)
+    compact_graph = CompactMeSHGraph.from_graph(mesh_graph)
+    assert dict(compact_graph.nodes.data()) == dict(mesh_graph.nodes(data=True))
+    assert sorted(compact_graph.to_graph().edges(data=True)) == sorted(mesh_graph.edges(data=True))
+
+
+def test_find_roots_and_leaves(mesh_table):
+    compact_graph = CompactMeSHGraph.from_table(mesh_table)
+    mesh_graph = MeSHGraph.from_table(mesh_table)
+    assert set(compact_graph.find_roots()) == set(mesh_graph.find_roots())
+    assert set(compact_graph.find_leaves()) == set(mesh_graph.find_leaves())
+    assert compact_graph.find_roots(['INCLUDES']) == ['MSHD:D050197']
+    assert compact_graph.find_leaves(['CONTAINS']) == ['MSHC:C565928']
+
+
+def test_subgraph_from_roots_and_leaves(mesh_table):
+    compact_graph = CompactMeSHGraph.from_table(mesh_table)
+    sub_graph = compact_graph.subgraph_from_roots(['MSHD:D050197'])
+    assert isinstance(sub_graph, MeSHGraph)
+    assert set(sub_graph.nodes()) == {'MSHD:D050197', 'MSHD:D058729', 'MSHC:C565928'}
+    assert len(sub_graph.edges()) == 2
+    sub_graph = compact_graph.subgraph_from_roots(['MSHD:D050197'], ['INCLUDES'])
+    assert set(sub_graph.nodes()) == {'MSHD:D050197', 'MSHD:D058729'}
+    sub_graph = compact_graph.subgraph_from_leaves(['MSHC:C565928'])
+    assert set(sub_graph.nodes()) == {'MSHD:D050197', 'MSHD:D003920', 'MSHC:C565928'}
+    assert sub_graph.nodes['MSHD:D003920']['tree_numbers'] == ['C18.452.394.750', 'C19.246']
+
+
+def test_opt_in_methods(taxonomy_table, mesh_table):
+    compact_tax_graph = CompactTaxonomyGraph.from_table(taxonomy_table)
+    subgraph = compact_tax_graph.subgraph_from_pubtator_bioentities(taxonomy_table, TaxParentType.Genus, {9606: 1})
+    assert isinstance(subgraph, TaxonomyGraph)
+    assert list(subgraph.nodes()) == ["TAXO:9605", "TAXO:9606", "TAXO:63221"]
+    assert subgraph.nodes['TAXO:9606']['count'] == 1
+    assert compact_tax_graph.is_descendant('TAXO:9606', 'TAXO:9605')
+    assert compact_tax_graph.is_descendant_many([('TAXO:63221', 'TAXO:9605'), ('TAXO:9605', 'TAXO:9605')]).tolist() == [
+        True,
+        False,
+    ]
+
+    compact_mesh_graph = CompactMeSHGraph.from_table(mesh_table)
+    assert compact_mesh_graph.is_descendant('MSHD:D058729', 'MSHC:C565928')
+    assert not compact_mesh_graph.is_descendant('MSHD:D003920', 'MSHD:D050197')
+    assert list(compact_mesh_graph.subgraph_from_pubtator_bioentities({'D058729': 1}).nodes()) == [
+        'MSHD:D050197', 'MSHD:D058729']
+
+
+def test_save_and_load(mesh_table, tmp_path):
+    compact_graph = CompactMeSHGraph.from_table(mesh_table)
+    compact_graph.save(str(tmp_path / 'mesh.bin'))
+    loaded = CompactMeSHGraph.load(str(tmp_path / 'mesh.bin'))
+    assert list(loaded) == list(compact_graph)
+    assert ('MSHD:D003920' in loaded) and ('MSHD:D000000' not in loaded) and (1 not in loaded)
+    assert loaded.nodes['MSHC:C565928'] == compact_graph.nodes['MSHC:C565928']
+    assert loaded.nodes['MSHD:D003920'] == compact_graph.nodes['MSHD:D003920']
+    assert loaded.find_roots() == compact_graph.find_roots()
+    assert loaded.is_descendant('MSHD:D058729', 'MSHC:C565928')
+    assert list(loaded.subgraph_from_leaves(['MSHD:D058729']).nodes()) == ['MSHD:D050197', 'MSHD:D058729']
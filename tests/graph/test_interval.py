@@ -0,0 +1,25 @@
+import numpy as np
+
+from chexmix.graph.interval import IntervalLabelling
+
+
+def test_is_descendant():
+    # a DAG: d has two parents (b, c), e is an alias of d
+    labelling = IntervalLabelling(['a', 'b', 'c', 'd', 'e'], [0, 0, 1, 2], [1, 2, 3, 3], aliases={'e': ['d']})
+    assert labelling.is_descendant('d', 'a') and labelling.is_descendant('d', 'c')
+    assert labelling.is_descendant('b', 'b') and not labelling.is_descendant('b', 'c')
+    assert labelling.is_descendant('e', 'b') and labelling.is_descendant('d', 'e')
+    assert not labelling.is_descendant('d', 'unknown')
+
+    indices = labelling.node_index(['d', 'a', 'e', 'unknown'])
+    assert labelling.is_descendant_many(indices, labelling.node_index(['c', 'd', 'a', 'a'])).tolist() == [
+        True,
+        False,
+        True,
+        False,
+    ]
+
+
+def test_not_reflexive():
+    labelling = IntervalLabelling(['a', 'b'], np.array([0]), np.array([1]), reflexive=False)
+    assert labelling.is_descendant('b', 'a') and not labelling.is_descendant('a', 'a')
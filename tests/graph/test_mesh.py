@@ -16,3 +16,17 @@ def test_is_descendant(mesh_table):
     mesh_graph = MeSHGraph.from_table(mesh_table)
     assert mesh_graph.is_descendant('MSHD:D058729', 'MSHD:D050197')
     assert mesh_graph.is_descendant('MSHD:D058729', 'MSHC:C565928')
+    assert mesh_graph.is_descendant_many(
+        [('MSHC:C565928', 'MSHD:D003920'), ('MSHD:D003920', 'MSHD:D050197'), ('MSHD:D050197', 'MSHD:D050197')]
+    ).tolist() == [True, False, True]
+
+
+def test_is_descendant_without_edges(mesh_table):
+    # ancestors filtered out of the graph are found by the tree numbers
+    mesh_graph = MeSHGraph.from_table(mesh_table)
+    node_graph = MeSHGraph(list(mesh_graph.nodes(data=True)), [])
+    assert node_graph.is_descendant('MSHD:D058729', 'MSHD:D050197')
+    assert not node_graph.is_descendant('MSHD:D050197', 'MSHD:D058729')
+    assert node_graph.is_descendant_many(
+        [('MSHD:D058729', 'MSHD:D050197'), ('MSHD:D003920', 'MSHD:D050197')]
+    ).tolist() == [True, False]
@@ -1,3 +1,7 @@
+import json
+
+import networkx as nx
+
 from chexmix.graph import PubMedGraph
 
 
@@ -12,3 +16,30 @@ def test_get_article_ids(pubmed_table):
     pubmed_graph = PubMedGraph(nodes, edges)
     article_ids = pubmed_graph.get_article_ids()
     assert len(article_ids) == 3
+
+
+def test_write_graphml(pubmed_table, tmp_path):
+    pubmed_table[0]['AuthorList'] = ['A', 'B']
+    pubmed_table[0]['Score'] = 0.5
+    pubmed_table[1]['Score'] = 1
+    nodes, edges = PubMedGraph.nodes_and_edges_from_pubmed('test & <keyword>', pubmed_table)
+    pubmed_graph = PubMedGraph(nodes, edges)
+    pubmed_graph.write_graphml(str(tmp_path / 'pubmed.graphml'))
+    graph = nx.read_graphml(str(tmp_path / 'pubmed.graphml'))
+    assert list(graph.nodes(data=True)) == list(pubmed_graph.to_graphml().nodes(data=True))
+    assert graph.nodes['ARTI:11111'] == {'Id': 11111, 'type': 'Article', 'Score': 0.5}
+    assert graph.nodes['ARTI:22222']['Score'] == 1.0
+    assert sorted(graph.edges()) == sorted(pubmed_graph.edges())
+
+
+def test_write_node_link_json(pubmed_table, tmp_path):
+    nodes, edges = PubMedGraph.nodes_and_edges_from_pubmed('test', pubmed_table)
+    pubmed_graph = PubMedGraph(nodes, edges)
+    pubmed_graph.nodes['test']['tags'] = {'a'}
+    with open(tmp_path / 'pubmed.json', 'w') as f:
+        pubmed_graph.write_node_link_json(f, edges_key='edges')
+    with open(tmp_path / 'pubmed.json') as f:
+        graph = nx.node_link_graph(json.load(f), edges='edges')
+    assert list(graph.nodes) == list(pubmed_graph.nodes)
+    assert graph.nodes['test']['tags'] == ['a']
+    assert list(graph.edges(keys=True, data=True)) == list(pubmed_graph.edges(keys=True, data=True))
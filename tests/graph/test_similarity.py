@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from chexmix.graph import CompactMeSHGraph, MeSHGraph, TaxonomyGraph
+
+
+def test_taxonomy_similarity(taxonomy_table):
+    tax_graph = TaxonomyGraph.from_table(taxonomy_table)
+    tax_graph.add_edge('TAXO:9605', 'TAXO:9999', type='INCLUDES')
+    tax_graph.nodes['TAXO:63221']['count'] = 3
+    tax_graph.nodes['TAXO:9999']['count'] = 1
+    similarity = tax_graph.similarity()
+    assert similarity.is_tree
+    assert similarity.lowest_common_ancestors(
+        [('TAXO:63221', 'TAXO:9999'), ('TAXO:63221', 'TAXO:9606'), ('TAXO:9606', 'TAXO:9606'), ('TAXO:1', 'TAXO:9606')]
+    ) == ['TAXO:9605', 'TAXO:9606', 'TAXO:9606', None]
+    assert similarity.information_content_of(['TAXO:9605'])[0] == 0
+    assert similarity.resnik([('TAXO:63221', 'TAXO:9999')])[0] == 0
+    assert similarity.resnik([('TAXO:63221', 'TAXO:9606')])[0] == pytest.approx(np.log(5 / 4))
+    assert similarity.lin([('TAXO:63221', 'TAXO:63221'), ('TAXO:9999', 'TAXO:63221')]).tolist() == [1.0, 0.0]
+
+
+def test_mesh_similarity(mesh_table):
+    mesh_graph = MeSHGraph.from_table(mesh_table)
+    similarity = mesh_graph.similarity()
+    assert not similarity.is_tree
+    pairs = [('MSHD:D058729', 'MSHC:C565928'), ('MSHD:D003920', 'MSHD:D050197'), ('MSHC:C565928', 'MSHD:D003920')]
+    assert similarity.lowest_common_ancestors(pairs) == ['MSHD:D050197', None, 'MSHD:D003920']
+    assert similarity.similarity(pairs, 'resnik')[1] == 0
+    with pytest.raises(ValueError):
+        similarity.similarity(pairs, 'jaccard')
+
+    compact_similarity = CompactMeSHGraph.from_table(mesh_table).similarity()
+    assert compact_similarity.lowest_common_ancestors(pairs) == ['MSHD:D050197', None, 'MSHD:D003920']
@@ -16,3 +16,25 @@ def test_is_descendant(taxonomy_table):
     tax_graph = TaxonomyGraph.from_table(taxonomy_table)
 
     assert tax_graph.is_descendant('TAXO:9606', 'TAXO:9605') and not tax_graph.is_descendant('TAXO:9605', 'TAXO:63221')
+    assert not tax_graph.is_descendant('TAXO:9606', 'TAXO:9606')
+
+    subgraph = tax_graph.subgraph_from_roots(['TAXO:9606'])
+    assert subgraph.is_descendant('TAXO:63221', 'TAXO:9605')
+    assert subgraph.is_descendant_many([('TAXO:63221', 'TAXO:9606'), ('TAXO:9606', 'TAXO:63221')]).tolist() == [
+        True,
+        False,
+    ]
+
+    tax_graph.add_edge('TAXO:63221', 'TAXO:1', type='INCLUDES')
+    assert tax_graph.is_descendant('TAXO:1', 'TAXO:9605')
+
+
+def test_is_descendant_without_edges(taxonomy_table):
+    # ancestors filtered out of the graph are found by the lineage
+    tax_graph = TaxonomyGraph.from_table(taxonomy_table)
+    node_graph = TaxonomyGraph(list(tax_graph.nodes(data=True)), [])
+    assert node_graph.is_descendant('TAXO:9606', 'TAXO:9605') and not node_graph.is_descendant('TAXO:9605', 'TAXO:9606')
+    assert node_graph.is_descendant_many([('TAXO:63221', 'TAXO:9605'), ('TAXO:9605', 'TAXO:63221')]).tolist() == [
+        True,
+        False,
+    ]
@@ -0,0 +1,25 @@
+import pytest
+
+from chexmix.graph.traversal import Traversal
+
+
+def test_reach(bio_graph):
+    traversal = Traversal(bio_graph[0])
+    assert traversal.reach(['2 : node2']) == ['2 : node2', '2.1 : node21', '2.2 : node22']
+    assert traversal.reach(['2 : node2'], max_depth=1) == ['2 : node2', '2.1 : node21']
+    assert traversal.reach(['unknown']) == []
+    assert Traversal(bio_graph[0], 'predecessors', ['test2']).reach(['2.2 : node22']) == ['2.2 : node22']
+    with pytest.raises(ValueError):
+        Traversal(bio_graph[0], 'children')
+
+
+def test_reach_many_reuses_closures(bio_graph):
+    graph = bio_graph[0]
+    traversal = Traversal(graph)
+    reached = traversal.reach_many([['2.1 : node21'], ['2 : node2', '1 : node1']])
+    assert reached[0] == ['2.1 : node21', '2.2 : node22']
+    assert set(reached[1]) == {'1 : node1', '1.1 : node11', '2 : node2', '2.1 : node21', '2.2 : node22'}
+    assert set(graph._reachability_cache(('successors', None))) == {'2.1 : node21', '2 : node2', '1 : node1'}
+
+    graph.add_edge('2.2 : node22', '3 : node3', type='test')
+    assert Traversal(graph).closure('2 : node2')[-1] == '3 : node3'
@@ -0,0 +1,33 @@
+import numpy as np
+
+from chexmix.bitmap import Bitmap
+
+
+def test_bitmap():
+    rng = np.random.default_rng(0)
+    values1 = set(rng.integers(0, 300000, 20000).tolist()) | set(range(65536, 75000))
+    values2 = set(rng.integers(0, 300000, 3000).tolist())
+    bitmap1, bitmap2 = Bitmap(values1), Bitmap()
+    for value in values2:
+        bitmap2.add(value)
+
+    assert len(bitmap1) == len(values1)
+    assert list(bitmap1) == sorted(values1)
+    assert bitmap1.to_array().tolist() == sorted(values1)
+    assert all(value in bitmap2 for value in values2)
+    assert 300001 not in bitmap2 and -1 not in bitmap2
+    assert list(bitmap1 | bitmap2) == sorted(values1 | values2)
+    assert list(bitmap1 & bitmap2) == sorted(values1 & values2)
+    assert list(bitmap1 - bitmap2) == sorted(values1 - values2)
+    assert list(bitmap2 - bitmap1) == sorted(values2 - values1)
+    assert list(bitmap1 - Bitmap(range(65536, 70000))) == sorted(values1 - set(range(65536, 70000)))
+    assert bitmap1.union_len(bitmap2) == len(values1 | values2)
+    assert bitmap1.intersection_len(bitmap2) == len(values1 & values2)
+    assert bitmap1 == Bitmap(sorted(values1)) and bitmap1 != bitmap2
+
+    copied = bitmap2.copy()
+    copied |= bitmap1
+    assert len(bitmap2) == len(values2) and len(copied) == len(values1 | values2)
+    for value in [0, 65536, 70000, 299999]:
+        copied.discard(value)
+    assert list(copied) == sorted((values1 | values2) - {0, 65536, 70000, 299999})
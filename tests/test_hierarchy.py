@@ -0,0 +1,285 @@
+import io
+import json
+
+import pytest
+
+from chexmix import types
+from chexmix.hierarchy import MeSHHierarchy, PublicationSet, TaxonomyHierarchy, default_registry
+
+
+@pytest.fixture
+def meshs():
+    return [
+        types.MeSH('MESH:D1', 'Diseases', 'Descriptor', ['C01'], None),
+        types.MeSH('MESH:D2', 'Vascular Diseases', 'Descriptor', ['C01.100'], None),
+        types.MeSH('MESH:D3', 'Metabolic Diseases', 'Descriptor', ['C01.200'], None),
+        types.MeSH('MESH:D4', 'Diabetic Angiopathies', 'Descriptor', ['C01.100.300', 'C01.200.300'], None),
+        types.MeSH('MESH:D5', 'Diabetic Foot', 'Descriptor', ['C01.100.300.400', 'C01.200.300.400'], None),
+    ]
+
+
+def publication(pmid, *entity_ids, year=None):
+    mentions = [types.Mention(0, 0, '', 'Disease', types.Entity(_id, '', 'Disease')) for _id in entity_ids]
+    return types.PubTator(pmid, f'title {pmid}', f'abstract {pmid}', mentions, year)
+
+
+@pytest.fixture
+def publications():
+    return [
+        publication('1', 'MESH:D5'),
+        publication('2', 'MESH:D4', 'MESH:D2'),
+        publication('3', 'MESH:D3', 'MESH:X0'),
+        publication('4'),
+    ]
+
+
+def test_attach_publications(meshs, publications):
+    bulk = MeSHHierarchy(meshs)
+    bulk.attach_publications(publications)
+    one_by_one = MeSHHierarchy(meshs)
+    for publ in publications:
+        one_by_one.attach_publication(publ)
+
+    for node in bulk.nodes:
+        other = one_by_one.get_node(node.id)
+        assert node.publications == other.publications
+        assert node.subpublications == other.subpublications
+
+    assert {p.id for p in bulk.get_node('MESH:D1').subpublications} == {'1', '2', '3'}
+    assert {p.id for p in bulk.get_node('MESH:D2').subpublications} == {'1', '2'}
+    assert {p.id for p in bulk.get_node('MESH:D4').publications} == {'2'}
+    assert bulk.get_node('MESH:D5').subpublications == set()
+
+    bulk.attach_publications([publication('5', 'MESH:D5')])
+    assert {p.id for p in bulk.get_node('C01.200').subpublications} == {'1', '2', '5'}
+
+
+def test_attach_publications_in_parallel(meshs, publications):
+    publs = publications + [publication('5', 'C01.100.300.400', year=2001), publication('6', 'MESH:D3', year=1999)]
+    serial = MeSHHierarchy(meshs)
+    serial.attach_publications(publs[:3])
+    serial.attach_publications(publs[3:])
+    parallel = MeSHHierarchy(meshs)
+    parallel.attach_publications(publs[:3], n_jobs=2, chunk_size=2)
+    parallel.attach_publications(publs[3:], n_jobs=2, chunk_size=1)
+
+    for node in serial.nodes:
+        other = parallel.get_node(node.id)
+        assert node.publications == other.publications
+        assert node.subpublications == other.subpublications
+        assert serial.year_histogram(node)[1].tolist() == parallel.year_histogram(other)[1].tolist()
+    assert {p.id for p in parallel.get_node('MESH:D1').subpublications} == {'1', '2', '3', '5', '6'}
+
+
+def test_year_histogram(meshs):
+    publs = [
+        publication('y1', 'MESH:D5', year=2001),
+        publication('y2', 'MESH:D4', 'MESH:D2', year=2003),
+        publication('y3', 'MESH:D3', 'MESH:D5', year=2003),
+        publication('y4', 'MESH:D1'),
+    ]
+    bulk = MeSHHierarchy(meshs)
+    bulk.attach_publications(publs)
+    one_by_one = MeSHHierarchy(meshs)
+    for publ in publs:
+        one_by_one.attach_publication(publ)
+
+    for hierarchy in [bulk, one_by_one]:
+        years, counts = hierarchy.year_histogram(hierarchy.get_node('MESH:D1'))
+        assert years.tolist() == [2001, 2002, 2003] and counts.tolist() == [1, 0, 2]
+        assert hierarchy.year_histogram(hierarchy.get_node('MESH:D2'), 2000, 2002)[1].tolist() == [0, 1, 0]
+        assert hierarchy.count_publications(hierarchy.get_node('MESH:D4'), 2002) == 2
+        assert hierarchy.count_publications(hierarchy.get_node('MESH:D5'), 2004, 2010) == 0
+
+    # attaching a publication again does not count it twice, and earlier years extend the histograms
+    bulk.attach_publications([publs[0], publication('y5', 'MESH:D4', year=1999)])
+    years, counts = bulk.year_histogram(bulk.get_node('MESH:D1'))
+    assert years.tolist() == [1999, 2000, 2001, 2002, 2003] and counts.tolist() == [1, 0, 1, 0, 2]
+
+
+def test_publication_set(publications):
+    publ_set = PublicationSet(publications[:2])
+    publ_set.add(publications[0])
+    assert len(publ_set) == 2
+    assert publications[1] in publ_set and publications[2] not in publ_set
+    assert publ_set == set(publications[:2])
+    assert publ_set.union_len(PublicationSet(publications[1:])) == 4
+    assert set(publ_set | set(publications[2:3])) == set(publications[:3])
+    publ_set.discard(publications[0])
+    assert list(publ_set) == [publications[1]]
+
+    # publications are compared as tuples, not by id
+    revised = publications[1]._replace(title='revised')
+    assert revised not in publ_set
+    publ_set.add(revised)
+    assert len(publ_set) == 2 and publ_set == {publications[1], revised}
+
+
+def test_publication_registries(meshs, publications):
+    hierarchy, other = MeSHHierarchy(meshs), MeSHHierarchy(meshs)
+    assert hierarchy.registry is not other.registry
+    hierarchy.attach_publications(publications)
+    assert len(hierarchy.registry) == 3 and len(other.registry) == 0
+    assert hierarchy.get_node('MESH:D5').publications.registry is hierarchy.registry
+
+    shared = [MeSHHierarchy(meshs, registry=default_registry), MeSHHierarchy(meshs, registry=default_registry)]
+    assert shared[0].registry is shared[1].registry is default_registry
+
+
+def test_to_dict(meshs, publications):
+    hierarchy = MeSHHierarchy(meshs)
+    hierarchy.attach_publications(publications)
+    tree = hierarchy.to_dict(sort_by='total_publications')
+    assert list(tree) == ['Diseases (0/3)']
+    assert list(tree['Diseases (0/3)']) == ['Metabolic Diseases (1/3)', 'Vascular Diseases (1/2)']
+
+
+def test_to_dict_pruned(meshs, publications):
+    hierarchy = MeSHHierarchy(meshs)
+    hierarchy.attach_publications(publications)
+    assert hierarchy.to_dict(max_depth=0) == {'Diseases (0/3)': {}}
+    assert hierarchy.to_dict(sort_by='total_publications', max_depth=1, top_k=1) == {
+        'Diseases (0/3)': {'Metabolic Diseases (1/3)': {}}
+    }
+    assert hierarchy.to_dict(min_publications=2) == {'Diseases (0/3)': {
+        'Vascular Diseases (1/2)': {'Diabetic Angiopathies (1/2)': {}},
+        'Metabolic Diseases (1/3)': {'Diabetic Angiopathies (1/2)': {}},
+    }}
+    assert hierarchy.to_dict(min_publications=4) == {}
+
+    hierarchy.attach_publications([publication('5', 'MESH:D5')])
+    assert 'Diseases (0/4)' in hierarchy.to_dict()
+
+
+def test_write_json(meshs, publications):
+    hierarchy = MeSHHierarchy(meshs)
+    hierarchy.attach_publications(publications)
+    for kwargs in [{}, {'sort_by': 'publications', 'top_k': 1}, {'min_publications': 2}, {'min_publications': 9}]:
+        f = io.StringIO()
+        hierarchy.write_json(f, **kwargs)
+        assert json.loads(f.getvalue()) == hierarchy.to_dict(**kwargs)
+
+
+def test_get_nodes_by_name(meshs, publications):
+    hierarchy = MeSHHierarchy(meshs)
+    assert [n.id for n in hierarchy.get_nodes_by_name('Diseases')] == ['MESH:D1', 'MESH:D2', 'MESH:D3']
+    hierarchy.attach_publications(publications)
+    assert [n.id for n in hierarchy.get_nodes_by_name('Diseases')] == ['MESH:D1', 'MESH:D3', 'MESH:D2']
+    assert [n.id for n in hierarchy.get_nodes_by_name('diabetic', 'prefix', ignore_case=True)] == [
+        'MESH:D4', 'MESH:D5'
+    ]
+    assert hierarchy.get_nodes_by_name('Foot Ulcer, Diabetic', 'exact', synonyms=True) == []
+
+    hierarchy.add_entry_terms({'MESH:D5': ['Foot Ulcer, Diabetic', 'Diabetic Feet']})
+    assert [n.id for n in hierarchy.get_nodes_by_name('Foot Ulcer, Diabetic', 'exact', synonyms=True)] == ['MESH:D5']
+    assert [n.id for n in hierarchy.get_nodes_by_name('Diabetic Fe', synonyms=True)] == ['MESH:D5']
+
+
+def test_add_nodes_in_batches(meshs):
+    hierarchy = MeSHHierarchy(meshs[3:])
+    assert [n.id for n in hierarchy.roots] == ['MESH:D4']
+    hierarchy.add_nodes(meshs[1:3])
+    hierarchy.add_nodes(meshs)
+
+    whole = MeSHHierarchy(meshs)
+    assert [n.id for n in hierarchy.roots] == ['MESH:D1']
+    for node in whole.nodes:
+        batched = hierarchy.get_node(node.id)
+        assert [p.id for p in batched.parents] == [p.id for p in node.parents]
+        assert sorted(c.id for c in batched.children) == sorted(c.id for c in node.children)
+    assert [p.id for p in hierarchy.get_node('MESH:D5').parents] == ['MESH:D4']
+    assert [p.id for p in hierarchy.get_node('MESH:D4').parents] == ['MESH:D2', 'MESH:D3']
+    assert [c.id for c in hierarchy.get_node('MESH:D1').children] == ['MESH:D2', 'MESH:D3']
+
+
+def test_save_and_load(meshs, publications, tmp_path):
+    hierarchy = MeSHHierarchy(meshs[1:])
+    hierarchy.add_entry_terms({'MESH:D5': ['Foot Ulcer, Diabetic']})
+    hierarchy.attach_publications(publications + [publication('s1', 'MESH:D4', year=2001)])
+    hierarchy.save(str(tmp_path / 'mesh.bin'))
+    loaded = MeSHHierarchy.load(str(tmp_path / 'mesh.bin'))
+
+    assert loaded.to_dict() == hierarchy.to_dict()
+    for node in hierarchy.nodes:
+        other = loaded.get_node(node.id)
+        assert other.entity == node.entity
+        assert [p.id for p in other.parents] == [p.id for p in node.parents]
+        assert [c.id for c in other.children] == [c.id for c in node.children]
+        assert other.publications == node.publications and other.subpublications == node.subpublications
+        assert loaded.year_histogram(other)[1].tolist() == hierarchy.year_histogram(node)[1].tolist()
+    assert loaded.get_node('C01.100.300').id == 'MESH:D4'
+    assert [n.id for n in loaded.get_nodes_by_name('Foot Ulcer', synonyms=True)] == ['MESH:D5']
+
+    # a parent added after loading links its children added before saving
+    for h in [hierarchy, loaded]:
+        h.add_nodes(meshs[:1])
+        h.attach_publications([publication('s2', 'MESH:D4', year=2002)])
+    assert loaded.to_dict() == hierarchy.to_dict()
+    assert loaded.count_publications(loaded.get_node('MESH:D4'), 2001, 2002) == 2
+
+    # publications saved from a registry are the same publications when loaded into it
+    shared = MeSHHierarchy.load(str(tmp_path / 'mesh.bin'), registry=hierarchy.registry)
+    n_registered = len(hierarchy.registry)
+    MeSHHierarchy.load(str(tmp_path / 'mesh.bin'), registry=hierarchy.registry)
+    assert len(hierarchy.registry) == n_registered
+    assert shared.get_node('MESH:D5').publications.bitmap == hierarchy.get_node('MESH:D5').publications.bitmap
+
+    with pytest.raises(ValueError):
+        TaxonomyHierarchy.load(str(tmp_path / 'mesh.bin'))
+
+
+def test_taxonomy_hierarchy_from_table(tmp_path):
+    table = {
+        'TAXO:1': {'id': 'TAXO:1', 'name': 'root', 'parent_id': 'TAXO:1'},
+        'TAXO:9605': {'id': 'TAXO:9605', 'name': 'Homo', 'parent_id': 'TAXO:1'},
+        'TAXO:9606': {'id': 'TAXO:9606', 'name': 'Homo sapiens', 'parent_id': 'TAXO:9605'},
+        'TAXO:63221': {'id': 'TAXO:63221', 'name': 'Homo sapiens neanderthalensis', 'parent_id': 'TAXO:9606'},
+    }
+    hierarchy = TaxonomyHierarchy.from_table(table)
+    assert [n.id for n in hierarchy.roots] == ['TAXO:1']
+    assert hierarchy.get_node('TAXO:63221').parents == [hierarchy.get_node('TAXO:9606')]
+    assert hierarchy.get_node('TAXO:63221').children == ()
+    assert hierarchy.get_node('TAXO:63221').entity is table['TAXO:63221']
+
+    hierarchy.attach_publications([publication('1', 'TAXO:63221'), publication('2', 'TAXO:9605')])
+    assert hierarchy.to_dict() == {'root (0/2)': {'Homo (1/2)': {'Homo sapiens (0/1)': {
+        'Homo sapiens neanderthalensis (1/1)': {}
+    }}}}
+
+    hierarchy.save(str(tmp_path / 'taxonomy.bin'))
+    loaded = TaxonomyHierarchy.load(str(tmp_path / 'taxonomy.bin'))
+    assert loaded.to_dict() == hierarchy.to_dict()
+    assert loaded.get_node('TAXO:63221').parent is loaded.get_node('TAXO:9606')
+
+    homo = types.Taxonomy('TAXO:9605', 'Homo', 'genus', [])
+    sapiens = types.Taxonomy('TAXO:9606', 'Homo sapiens', 'species', [homo])
+    hierarchy = TaxonomyHierarchy([homo])
+    hierarchy.add_nodes([sapiens])
+    assert [n.id for n in hierarchy.get_node('TAXO:9605').children] == ['TAXO:9606']
+
+
+def test_enrichment(meshs):
+    publs = [publication(f'e{i}', 'MESH:D5' if i < 4 else 'MESH:D3') for i in range(10)]
+    hierarchy = MeSHHierarchy(meshs)
+    hierarchy.attach_publications(publs)
+
+    ret = hierarchy.enrichment(publs[:4], correction=None)
+    # the query is exactly the publications of D5 and its ancestors up to the two branches
+    assert set(ret['id'][:3]) == {'MESH:D2', 'MESH:D4', 'MESH:D5'}
+    row = ret[ret['id'] == 'MESH:D5'].iloc[0]
+    assert (row['count'], row['background_count']) == (4, 4)
+    assert row['fold_change'] == pytest.approx(2.5) and row['p_value'] == pytest.approx(1 / 210)
+    # every publication is a publication of the root
+    root = ret[ret['id'] == 'MESH:D1'].iloc[0]
+    assert root['p_value'] == pytest.approx(1.0) and root['fold_change'] == pytest.approx(1.0)
+
+    ret = hierarchy.enrichment(publs[:4], background=publs[:6], min_count=4)
+    assert set(ret['id']) == {'MESH:D1', 'MESH:D2', 'MESH:D3', 'MESH:D4', 'MESH:D5'}
+    assert ret.iloc[0]['p_value'] == pytest.approx(1 / 15)
+
+    # publications attached to no node are counted, but not registered
+    unattached = [publication(f'u{i}') for i in range(4)]
+    ret = hierarchy.enrichment(publs[:4] + unattached[:1], background=publs + unattached, correction=None)
+    assert len(hierarchy.registry) == 10
+    row = ret[ret['id'] == 'MESH:D5'].iloc[0]
+    assert row['fold_change'] == pytest.approx(4 / 5 / (4 / 14))
@@ -0,0 +1,20 @@
+import pytest
+
+from chexmix.name_index import NameIndex
+
+
+def test_name_index():
+    names = ['Homo sapiens', 'Homo', 'homo erectus', 'Pan troglodytes', 'Ho', 'Σίσυφος']
+    index = NameIndex(names)
+    assert index.search('omo') == [0, 1, 2]
+    assert index.search('Homo') == [0, 1]
+    assert index.search('HOMO', ignore_case=True) == [0, 1, 2]
+    assert index.search('o') == [0, 1, 2, 3, 4]
+    assert index.search('sapiens x') == []
+    assert index.search('ΣΊΣ', ignore_case=True) == [5]
+    assert index.search('Homo', 'prefix') == [0, 1]
+    assert index.search('ho', 'prefix', ignore_case=True) == [0, 1, 2, 4]
+    assert index.search('homo', 'exact', ignore_case=True) == [1]
+    assert index.search('homo', 'exact') == []
+    with pytest.raises(ValueError):
+        index.search('homo', 'regex')
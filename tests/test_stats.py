@@ -0,0 +1,64 @@
+import math
+from fractions import Fraction
+
+import numpy as np
+import pytest
+
+from chexmix import stats
+
+
+def comb(n, k):
+    # math.comb is Python 3.8+. each partial product is the binomial coefficient C(n - k + j, j), so it stays exact
+    if not 0 <= k <= n:
+        return 0
+    k = min(k, n - k)
+    ret = 1
+    for j in range(1, k + 1):
+        ret = ret * (n - k + j) // j
+    return ret
+
+
+def exact_sf(k, K, n, N):
+    # C(K, i) * C(N - K, n - i) of each i from the one before, by the exact integer ratio of consecutive terms
+    i = max(k, 0, n + K - N)
+    term, total = comb(K, i) * comb(N - K, n - i), 0
+    for i in range(i, min(n, K) + 1):
+        total += term
+        term = term * (K - i) * (n - i) // ((i + 1) * (N - K - n + i + 1))
+    return float(Fraction(total, comb(N, n)))
+
+
+def test_log_factorial():
+    x = np.array([0, 1, 10, 255, 256, 1000, 10 ** 7])
+    assert np.allclose(stats.log_factorial(x), [math.lgamma(v + 1) for v in x.tolist()], rtol=1e-14, atol=0)
+
+
+def test_hypergeom_sf():
+    rng = np.random.default_rng(0)
+    N = rng.integers(1, 200, 500)
+    K, n = rng.integers(0, N + 1), rng.integers(0, N + 1)
+    k = rng.integers(0, np.minimum(n, K) + 2)
+    expected = [exact_sf(*args) for args in zip(k.tolist(), K.tolist(), n.tolist(), N.tolist())]
+    assert np.allclose(stats.hypergeom_sf(k, K, n, N), expected, rtol=1e-9, atol=1e-15)
+
+    # P(X <= k) = 1 - P(X >= k + 1)
+    assert np.allclose(stats.hypergeom_cdf(k, K, n, N), 1 - stats.hypergeom_sf(k + 1, K, n, N), atol=1e-12)
+    # long tails of a large population
+    assert stats.hypergeom_sf(60, 5000, 1000, 10 ** 6) == pytest.approx(exact_sf(60, 5000, 1000, 10 ** 6), rel=1e-9)
+
+
+def test_adjust_p_values():
+    p_values = np.array([0.01, 0.04, 0.03, 0.2])
+    assert stats.benjamini_hochberg(p_values).tolist() == pytest.approx([0.04, 0.16 / 3, 0.16 / 3, 0.2])
+    assert stats.adjust_p_values(p_values, stats.BONFERRONI).tolist() == pytest.approx([0.04, 0.16, 0.12, 0.8])
+    with pytest.raises(ValueError):
+        stats.adjust_p_values(p_values, 'holm')
+
+
+def test_over_representation():
+    fold_changes, p_values, adjusted = stats.over_representation([5, 1, 0], [10, 50, 0], 20, 1000)
+    assert fold_changes[:2].tolist() == pytest.approx([25.0, 1.0]) and np.isnan(fold_changes[2])
+    assert p_values[0] == pytest.approx(exact_sf(5, 10, 20, 1000))
+    assert p_values[2] == 1.0
+    # the node without background publications is not tested
+    assert adjusted.tolist() == pytest.approx([min(p_values[0] * 2, 1.0), min(p_values[1], 1.0), 1.0])
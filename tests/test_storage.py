@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from chexmix.storage import decode_column, encode_column, load_blocks, save_blocks
+
+
+def test_save_and_load_blocks(tmp_path):
+    path = str(tmp_path / 'blocks.bin')
+    save_blocks(path, {'a': np.arange(10), 'b': np.zeros((2, 3)), 'empty': np.zeros(0)}, {'name': 'test'})
+    for mmap in [True, False]:
+        blocks, meta = load_blocks(path, mmap)
+        assert meta == {'name': 'test'}
+        assert blocks['a'].tolist() == list(range(10))
+        assert blocks['b'].shape == (2, 3) and len(blocks['empty']) == 0
+
+    with open(path, 'wb') as f:
+        f.write(b'not a block file')
+    with pytest.raises(ValueError):
+        load_blocks(path)
+
+
+@pytest.mark.parametrize(
+    'values, kind',
+    [
+        ([True, False], 'bool'),
+        ([1, 2, 3], 'int'),
+        ([1.0, 2.5], 'float'),
+        ([1, 2.5], 'pickle'),
+        (['a', 'b', 'a', 'a'], 'category'),
+        (['MSHD:D000001', 'MSHC:C000002', '한글'], 'str'),
+        ([['a'], {'b': 1}, None], 'pickle'),
+        ([2 ** 70], 'pickle'),
+    ],
+)
+def test_encode_column(values, kind):
+    encoded_kind, parts = encode_column(values)
+    assert encoded_kind == kind
+    column = decode_column(kind, parts)
+    assert list(column.tolist()) == values
+    assert list(map(type, column.tolist())) == list(map(type, values))
+    assert column[-1] == values[-1]
+
+
+def test_encode_column_with_mask():
+    kind, parts = encode_column([1, None, 3], np.array([True, False, True]))
+    assert kind == 'int'
+    assert decode_column(kind, parts).tolist() == [1, 0, 3]